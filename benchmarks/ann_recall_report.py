@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Recall-vs-latency report for the approximate index types in src/index_factory.py.
+
+Every index type is compared against the exact flat baseline on the same
+vectors, sweeping nprobe (IVF) and efSearch (HNSW), so an operating point
+can be picked with evidence. Vectors come from an existing segment store or
+are generated synthetically.
+
+    python benchmarks/ann_recall_report.py --store-dir src/memory_store
+    python benchmarks/ann_recall_report.py --synthetic 100000 --output ann_report.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# Importing src loads the agent; benchmarks do not want its background warm-up.
+os.environ.setdefault('WARM_UP_ON_START', 'false')
+
+from src.index_factory import build_index, search_parameters  # noqa: E402
+from src.segment_store import SegmentStore  # noqa: E402
+
+NPROBE_SWEEP = [1, 4, 16, 64]
+EF_SEARCH_SWEEP = [16, 32, 64, 128]
+
+
+def load_vectors(args) -> np.ndarray:
+    if args.store_dir:
+        segments = SegmentStore(args.store_dir).open_segments()
+        if not segments:
+            raise SystemExit(f"No segments found in {args.store_dir}")
+        return np.concatenate([np.asarray(segment.vectors) for segment in segments])
+    rng = np.random.default_rng(0)
+    # Clustered data is closer to sentence embeddings than uniform noise.
+    centers = rng.normal(size=(max(1, args.synthetic // 500), args.dim)).astype(np.float32)
+    labels = rng.integers(0, len(centers), size=args.synthetic)
+    return centers[labels] + 0.3 * rng.normal(size=(args.synthetic, args.dim)).astype(np.float32)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row_found) & set(row_truth)) for row_found, row_truth in zip(found, truth))
+    return hits / truth.size
+
+
+def timed_search(index, queries: np.ndarray, k: int, params=None):
+    start = time.perf_counter()
+    _, found = index.search(queries, k, params=params)
+    elapsed = time.perf_counter() - start
+    return found, elapsed * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store-dir', help='segment store to read vectors from')
+    parser.add_argument('--synthetic', type=int, default=50000, help='number of synthetic vectors')
+    parser.add_argument('--dim', type=int, default=384, help='dimension of synthetic vectors')
+    parser.add_argument('--queries', type=int, default=500, help='number of held-out queries')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--output', help='write the report as JSON to this path')
+    args = parser.parse_args()
+
+    vectors = np.ascontiguousarray(load_vectors(args), dtype=np.float32)
+    rng = np.random.default_rng(1)
+    query_rows = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = vectors[query_rows] + 0.01 * rng.normal(size=(len(query_rows), vectors.shape[1])).astype(np.float32)
+
+    flat = build_index(vectors, 'flat', storage='float32')
+    truth, flat_ms = timed_search(flat, queries, args.k)
+    rows = [{"index": "flat", "param": None, "recall": 1.0, "ms_per_query": flat_ms, "build_s": 0.0}]
+
+    for index_type, sweep, param_name in (('ivf_flat', NPROBE_SWEEP, 'nprobe'),
+                                          ('ivf_pq', NPROBE_SWEEP, 'nprobe'),
+                                          ('hnsw', EF_SEARCH_SWEEP, 'efSearch')):
+        start = time.perf_counter()
+        try:
+            index = build_index(vectors, index_type)
+        except (ValueError, RuntimeError) as e:
+            print(f"Skipping {index_type}: {e}")
+            continue
+        build_s = time.perf_counter() - start
+        for value in sweep:
+            if param_name == 'nprobe':
+                params = search_parameters(index, nprobe=value)
+            else:
+                params = search_parameters(index, ef_search=value)
+            found, ms = timed_search(index, queries, args.k, params)
+            rows.append({"index": index_type, "param": f"{param_name}={value}",
+                         "recall": recall_at_k(found, truth), "ms_per_query": ms, "build_s": build_s})
+
+    print(f"\n{len(vectors)} vectors, dim {vectors.shape[1]}, {len(queries)} queries, recall@{args.k} vs flat")
+    print(f"{'index':<10} {'param':<14} {'recall':>8} {'ms/query':>10} {'speedup':>9} {'build s':>9}")
+    for row in rows:
+        print(f"{row['index']:<10} {row['param'] or '-':<14} {row['recall']:>8.3f} "
+              f"{row['ms_per_query']:>10.4f} {flat_ms / row['ms_per_query']:>8.1f}x {row['build_s']:>9.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"num_vectors": len(vectors), "dimension": int(vectors.shape[1]),
+                       "k": args.k, "results": rows}, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    faiss.omp_set_num_threads(1)
+    main()
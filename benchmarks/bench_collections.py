@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Latency of searches over more collections than MAX_OPEN_COLLECTIONS.
+
+A library of --collections subject collections (plus some empty ones) is
+written with the hashing stub embedder, then queried in rounds that mix
+searches over every collection with searches scoped to a few hot ones, as
+an agent serving several subjects does. Reported per kind of query:
+p50/p99 latency, how many collections were opened during the timed
+rounds and the most held open at once. No more than --max-open may stay
+open: unscoped searches open the remaining non-empty collections for the
+duration of one search, the hot ones must never be reopened, and empty
+collections must never be opened.
+
+    python benchmarks/bench_collections.py
+    python benchmarks/bench_collections.py --collections 16 --max-open 4 --queries 300 --output collections.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+# Importing src loads the agent; benchmarks do not want its background warm-up.
+os.environ.setdefault('WARM_UP_ON_START', 'false')
+
+from benchmarks.synthetic_pdf import WORDS  # noqa: E402
+
+
+def percentiles_ms(seconds) -> dict:
+    ms = sorted(s * 1000 for s in seconds)
+    return {"p50_ms": round(statistics.median(ms), 3), "p99_ms": round(ms[int(0.99 * (len(ms) - 1))], 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--collections', type=int, default=12, help='non-empty collections')
+    parser.add_argument('--empty', type=int, default=4, help='collections with every document removed')
+    parser.add_argument('--chunks', type=int, default=2000, help='chunks per collection')
+    parser.add_argument('--max-open', type=int, default=4, help='MAX_OPEN_COLLECTIONS')
+    parser.add_argument('--queries', type=int, default=200, help='queries per kind')
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-collections-")
+    os.environ.update({
+        "EMBEDDING_BACKEND": "stub",
+        "MEMORY_STORE_DIR": os.path.join(workdir, "store"),
+        "COLLECTIONS_DIR": os.path.join(workdir, "collections"),
+        "EMBEDDING_CACHE_PATH": "",
+        "QUERY_CACHE_SIZE": "0",
+        "MAX_OPEN_COLLECTIONS": str(args.max_open),
+        "COLLECTION_IDLE_SECONDS": "0",
+    })
+    from src import sharded_memory
+    from src.memory import VectorMemory
+
+    rng = random.Random(5)
+    sentence = lambda: " ".join(rng.choice(WORDS) for _ in range(40))  # noqa: E731
+    results = {"collections": args.collections, "empty": args.empty, "max_open": args.max_open,
+               "chunks_per_collection": args.chunks}
+    try:
+        memory = VectorMemory()
+        shards = sharded_memory.ShardedMemory(memory)
+        subjects = [f"subject{i:02d}" for i in range(args.collections)]
+        for name in subjects:
+            collection = shards.get(name)
+            collection.add_chunks([sentence() for _ in range(args.chunks)], doc_id=f"{name}.pdf")
+            collection.store.wait_for_compaction()
+        for i in range(args.empty):
+            empty = shards.get(f"empty{i:02d}")
+            empty.add_chunks([sentence()], doc_id="gone.pdf")
+            empty.remove_document("gone.pdf")
+
+        # A fresh view of the library, as after a restart: nothing is open yet.
+        shards = sharded_memory.ShardedMemory(memory)
+        opened = []
+        new_memory = shards._new_memory
+        shards._new_memory = lambda name: (opened.append(name), new_memory(name))[1]
+        questions = [sentence()[:80] for _ in range(args.queries)]
+        hot = subjects[:max(1, args.max_open - 1)]
+        shards.search_hits_batch(questions[:1], args.k)  # untimed: the first unscoped search opens every shard
+        results["opened_by_first_search"] = len(opened)
+        empty_opened = {name for name in opened if name.startswith("empty")}
+        opened.clear()
+        latencies = {"unscoped": [], "scoped": []}
+        most_open = 0
+        for i, question in enumerate(questions):
+            start = time.perf_counter()
+            shards.search_hits_batch([question], args.k)
+            latencies["unscoped"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            shards.search_hits_batch([question], args.k, collections=[hot[i % len(hot)]])
+            latencies["scoped"].append(time.perf_counter() - start)
+            most_open = max(most_open, len(shards.open_collections()))
+        for kind, seconds in latencies.items():
+            results[kind] = percentiles_ms(seconds)
+        empty_opened.update(name for name in opened if name.startswith("empty"))
+        results["empty_opened"] = sorted(empty_opened)
+        results["opened_per_unscoped_query"] = len(opened) / len(questions)
+        results["hot_reopened"] = sum(name in hot for name in opened)
+        results["most_open"] = most_open
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for kind in ("unscoped", "scoped"):
+        print(f"{kind:<9} p50 {results[kind]['p50_ms']:>8} ms  p99 {results[kind]['p99_ms']:>8} ms")
+    print(f"collections opened by the first search: {results['opened_by_first_search']}; "
+          f"per unscoped query afterwards: {results['opened_per_unscoped_query']:.1f} "
+          f"(hot reopened: {results['hot_reopened']}, empty: {len(results['empty_opened'])}); "
+          f"most open at once: {results['most_open']} of {args.max_open}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if results["most_open"] > args.max_open or results["hot_reopened"] or results["empty_opened"]:
+        print("❌ more collections stayed open than allowed, hot ones were reopened or empty ones opened")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
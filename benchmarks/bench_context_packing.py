@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Prompt size and answer evidence with and without context packing.
+
+A synthetic corpus is indexed twice over (every document also loaded as a
+second "edition", so retrieval returns near-duplicates as real libraries
+do). Each question of the fixed eval set is built from the content words
+of one sentence of the corpus, its gold sentence. For every question the
+context from ContextRetriever.get_context_with_sources is measured with
+packing off and with it on: estimated prompt tokens, latency, and whether
+the gold sentence is still in the context. Packing should cut tokens while
+keeping gold recall; the stub LLM cannot grade answers, so the gold
+sentence stands in for the evidence an answer needs.
+
+    python benchmarks/bench_context_packing.py
+    python benchmarks/bench_context_packing.py --k 5 --budget 800 --questions 200 --embedder model
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault('WARM_UP_ON_START', 'false')
+
+from benchmarks.synthetic_pdf import synthetic_page_text, write_synthetic_pdf  # noqa: E402
+
+
+def eval_set(documents: int, pages: int, count: int, seed: int = 11) -> list:
+    """(question, gold sentence) pairs drawn from the synthetic corpus."""
+    rng = random.Random(seed)
+    pairs = []
+    while len(pairs) < count:
+        doc_seed, page = rng.randint(1, documents), rng.randint(1, pages)
+        sentences = [s for s in synthetic_page_text(page, seed=doc_seed).split(". ") if s]
+        gold = rng.choice(sentences).rstrip(".") + "."
+        words = list(dict.fromkeys(word for word in gold.lower().rstrip(".").split() if len(word) > 3))
+        if len(words) >= 3:
+            pairs.append((f"Explain {' and '.join(words)}.", gold))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--questions', type=int, default=100)
+    parser.add_argument('--k', type=int, default=5, help='chunks per context (analysis tasks use 5)')
+    parser.add_argument('--budget', type=int, default=800, help='CONTEXT_TOKEN_BUDGET for the packed run')
+    parser.add_argument('--embedder', choices=('stub', 'model'), default='stub')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-packing-")
+    os.environ.update({
+        "LLM_BACKEND": "stub",
+        "EMBEDDING_BACKEND": "stub" if args.embedder == 'stub' else "sentence-transformers",
+        "MEMORY_STORE_DIR": os.path.join(workdir, "store"),
+        "COLLECTIONS_DIR": os.path.join(workdir, "collections"),
+        "DOCUMENT_REGISTRY_PATH": os.path.join(workdir, "registry.json"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite"),
+        "CONTEXT_TOKEN_BUDGET": str(args.budget),
+    })
+    from src.context_retriever import ContextRetriever
+    from src.tracing import estimate_tokens
+
+    try:
+        books = os.path.join(workdir, "books")
+        os.makedirs(books)
+        for seed in range(1, args.documents + 1):
+            for edition in (1, 2):
+                write_synthetic_pdf(os.path.join(books, f"doc{seed:02d}-ed{edition}.pdf"), args.pages, seed=seed)
+        retriever = ContextRetriever(books)
+        for name in sorted(os.listdir(books)):
+            retriever.load_pdf(name)
+        retriever.memory.store.wait_for_compaction()
+        tokenizer = retriever.memory.tokenizer
+        normalise = lambda text: " ".join(tokenizer.convert_tokens_to_string(tokenizer.tokenize(text)).split())  # noqa: E731
+
+        pairs = eval_set(args.documents, args.pages, args.questions)
+        packer = retriever.packer
+        results = {"k": args.k, "budget": args.budget, "questions": len(pairs), "runs": {}}
+        for label, active in (("unpacked", None), ("packed", packer)):
+            retriever.packer = active
+            for question, _ in pairs[:10]:
+                retriever.get_context_with_sources(question, k=args.k)  # untimed warm-up
+            tokens, latencies, found = [], [], 0
+            for question, gold in pairs:
+                start = time.perf_counter()
+                context, _ = retriever.get_context_with_sources(question, k=args.k)
+                latencies.append(time.perf_counter() - start)
+                tokens.append(estimate_tokens(context))
+                found += normalise(gold) in normalise(context)
+            latencies.sort()
+            results["runs"][label] = {
+                "mean_context_tokens": round(statistics.mean(tokens), 1),
+                "gold_recall": round(found / len(pairs), 3),
+                "p50_ms": round(statistics.median(latencies) * 1000, 3),
+                "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 3),
+            }
+        if packer is not None:
+            results["packer"] = packer.stats()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'':<10} {'tokens':>8} {'gold recall':>12} {'p50 ms':>8} {'p95 ms':>8}")
+    for label, run in results["runs"].items():
+        print(f"{label:<10} {run['mean_context_tokens']:>8} {run['gold_recall']:>12.1%} "
+              f"{run['p50_ms']:>8} {run['p95_ms']:>8}")
+    unpacked, packed = results["runs"]["unpacked"], results["runs"]["packed"]
+    if unpacked["mean_context_tokens"]:
+        saved = 1 - packed["mean_context_tokens"] / unpacked["mean_context_tokens"]
+        print(f"packing saves {saved:.0%} of context tokens; "
+              f"gold recall {packed['gold_recall'] - unpacked['gold_recall']:+.1%}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Encodes per second and latency of concurrent query encodes, calling the
+model directly versus going through src/encoder_service.py.
+
+Each client thread encodes one query at a time, as concurrent agent
+requests do. Directly, every call is a batch of one; through the service,
+calls arriving within ENCODER_MAX_WAIT_MS share a batch. Optionally an
+ingestion thread encodes chunk batches at the same time, to show that
+queries keep priority over it.
+
+    python benchmarks/bench_encoder_service.py --clients 16
+    python benchmarks/bench_encoder_service.py --clients 16 --ingest --output encoder.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# Importing src loads the agent; benchmarks do not want its background warm-up.
+os.environ.setdefault('WARM_UP_ON_START', 'false')
+
+from src.config import get_config  # noqa: E402
+from src.encoder_service import INGEST, QUERY, EncoderService  # noqa: E402
+
+Config = get_config()
+
+QUESTIONS = [
+    "How does energy change when force is applied?",
+    "Explain the structure of a cell membrane.",
+    "What is the relationship between mass and acceleration?",
+    "Describe how temperature affects reaction rate.",
+]
+CHUNK = " ".join(["The lesson describes forces, energy and matter in everyday situations."] * 20)
+
+
+def percentile(latencies, q) -> float:
+    return float(np.percentile(latencies, q) * 1000) if latencies else 0.0
+
+
+def run(encode, clients: int, seconds: float, ingest=None):
+    """Run ``clients`` query threads (and ``ingest``, if given) for ``seconds``; return their stats."""
+    latencies = [[] for _ in range(clients)]
+    ingested = [0]
+    stop = threading.Event()
+
+    def client(i: int):
+        n = i
+        while not stop.is_set():
+            start = time.perf_counter()
+            encode([QUESTIONS[n % len(QUESTIONS)] + f" ({n})"])
+            latencies[i].append(time.perf_counter() - start)
+            n += clients
+
+    def ingester():
+        while not stop.is_set():
+            ingest([CHUNK] * Config.ENCODE_BATCH_SIZE)
+            ingested[0] += Config.ENCODE_BATCH_SIZE
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    if ingest is not None:
+        threads.append(threading.Thread(target=ingester))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    flat = [latency for per_client in latencies for latency in per_client]
+    return {
+        "encodes": len(flat),
+        "encodes_per_second": round(len(flat) / seconds, 1),
+        "p50_ms": round(percentile(flat, 50), 2),
+        "p99_ms": round(percentile(flat, 99), 2),
+        "chunks_ingested": ingested[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16, help='concurrent query threads')
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration of each run')
+    parser.add_argument('--ingest', action='store_true', help='also encode chunk batches in the background')
+    parser.add_argument('--max-batch', type=int, default=Config.ENCODER_MAX_BATCH)
+    parser.add_argument('--max-wait-ms', type=float, default=Config.ENCODER_MAX_WAIT_MS)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    import sentence_transformers
+    model = sentence_transformers.SentenceTransformer(Config.EMBEDDING_MODEL)
+    model.encode(["warm up"], convert_to_numpy=True)
+
+    def direct(texts):
+        return model.encode(texts, convert_to_numpy=True)
+
+    service = EncoderService(lambda: model, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    results = {
+        "clients": args.clients,
+        "max_batch": args.max_batch,
+        "max_wait_ms": args.max_wait_ms,
+        "direct": run(direct, args.clients, args.seconds, direct if args.ingest else None),
+        "service": run(lambda texts: service.encode(texts, QUERY), args.clients, args.seconds,
+                       (lambda texts: service.encode(texts, INGEST)) if args.ingest else None),
+    }
+    results["service"].update(service.stats())
+    service.close()
+
+    print(f"{'mode':>8} {'encodes/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'chunks':>8}")
+    for mode in ("direct", "service"):
+        r = results[mode]
+        print(f"{mode:>8} {r['encodes_per_second']:>10.1f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['chunks_ingested']:>8}")
+    print(f"mean batch size through the service: {results['service']['mean_batch_size']}")
+    if results["direct"]["encodes_per_second"]:
+        speedup = results["service"]["encodes_per_second"] / results["direct"]["encodes_per_second"]
+        print(f"speed-up: {speedup:.1f}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
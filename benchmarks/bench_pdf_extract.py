@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Pages/second of src.pdf_retriever.iter_pdf_pages as the worker count grows.
+
+    python benchmarks/bench_pdf_extract.py --pages 400
+    python benchmarks/bench_pdf_extract.py --pdf src/books/book1.pdf --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# Importing src loads the agent; benchmarks do not want its background warm-up.
+os.environ.setdefault('WARM_UP_ON_START', 'false')
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf  # noqa: E402
+from src.pdf_retriever import iter_pdf_pages  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pdf', help='PDF to extract (a synthetic one is generated otherwise)')
+    parser.add_argument('--pages', type=int, default=400, help='pages in the synthetic PDF')
+    parser.add_argument('--workers', type=int, nargs='+', help='worker counts to try')
+    parser.add_argument('--batch-size', type=int, default=8)
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if pdf_path is None:
+            pdf_path = os.path.join(tmp, 'synthetic.pdf')
+            write_synthetic_pdf(pdf_path, args.pages)
+
+        print(f"{'workers':>8} {'pages':>7} {'seconds':>9} {'pages/s':>9} {'speedup':>8}")
+        baseline = None
+        for workers in worker_counts:
+            start = time.perf_counter()
+            pages = sum(1 for _ in iter_pdf_pages(pdf_path, workers=workers, batch_size=args.batch_size))
+            elapsed = time.perf_counter() - start
+            rate = pages / elapsed
+            baseline = baseline or rate
+            print(f"{workers:>8} {pages:>7} {elapsed:>9.2f} {rate:>9.1f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory of src/prefork_server.py as workers are added.
+
+For each worker count the server is started on a synthetic curriculum with
+the stub LLM (LLM_BACKEND=stub, so no network), driven by concurrent
+/ask clients for a fixed time, and then inspected through /proc: the
+supervisor's RSS is what one standalone process costs today, and each
+worker's private memory is what an extra worker really adds on top of the
+pages it shares with the supervisor. Linux only.
+
+    python benchmarks/bench_prefork.py --workers 1 2 4
+    python benchmarks/bench_prefork.py --workers 1 2 4 8 --clients 32 --output prefork.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf  # noqa: E402
+
+QUESTIONS = [
+    "How does energy change when force is applied?",
+    "Explain the structure of a cell membrane.",
+    "What is the relationship between mass and acceleration?",
+    "Describe how temperature affects reaction rate.",
+]
+
+
+def memory_kb(pid: int) -> dict:
+    """RSS, PSS and private (unshared) memory of a process, from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {"rss": fields.get("Rss", 0), "pss": fields.get("Pss", 0),
+            "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)}
+
+
+def children(pid: int) -> list:
+    pids = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return pids
+
+
+def post(url: str, body: dict) -> dict:
+    request = urllib.request.Request(url, data=json.dumps(body).encode('utf-8'), method='POST')
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.load(response)
+
+
+def wait_for(url: str, timeout: float = 300.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=5):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+def drive(base: str, clients: int, seconds: float) -> dict:
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def client(i: int):
+        n = i
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                # A distinct question each time, so the response caches do not answer it.
+                post(f"{base}/ask", {"question": f"{QUESTIONS[n % len(QUESTIONS)]} ({n})"})
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                return
+            with lock:
+                latencies.append(time.perf_counter() - start)
+            n += clients
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    p99 = latencies[int(0.99 * (len(latencies) - 1))] * 1000 if latencies else 0.0
+    return {"questions_per_second": round(len(latencies) / seconds, 2), "p99_ms": round(p99, 1),
+            "errors": errors[:5]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=16, help='concurrent /ask clients')
+    parser.add_argument('--seconds', type=float, default=10.0, help='load duration per worker count')
+    parser.add_argument('--pages', type=int, default=100, help='pages in the synthetic curriculum')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='seconds per stub LLM call')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-prefork-")
+    books = os.path.join(workdir, "src", "books")
+    os.makedirs(books)
+    write_synthetic_pdf(os.path.join(books, "book1.pdf"), args.pages, seed=1)
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])),
+        "LLM_BACKEND": "stub",
+        "STUB_LLM_LATENCY": str(args.llm_latency),
+        "SEMANTIC_CACHE_ENABLED": "false",
+        "RESPONSE_CACHE_PATH": "",
+        "QUERY_CACHE_SIZE": "0",
+    }
+    base = f"http://127.0.0.1:{args.port}"
+
+    results = {"clients": args.clients, "pages": args.pages, "runs": []}
+    try:
+        for workers in args.workers:
+            server = subprocess.Popen(
+                [sys.executable, "-m", "src.prefork_server", "--port", str(args.port), "--workers", str(workers)],
+                cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+            )
+            try:
+                wait_for(f"{base}/health")
+                load = drive(base, args.clients, args.seconds)
+                supervisor = memory_kb(server.pid)
+                # The writer is idle and small; workers are the processes that scale.
+                per_process = [memory_kb(pid) for pid in children(server.pid)]
+            finally:
+                server.terminate()
+                server.wait()
+            private = sorted(m["private"] for m in per_process)
+            run = {"workers": workers, **load, "supervisor_rss_kb": supervisor["rss"],
+                   "child_private_kb": private, "child_pss_kb": [m["pss"] for m in per_process]}
+            results["runs"].append(run)
+            print(f"{workers:>3} workers: {load['questions_per_second']:>8.2f} q/s  p99 {load['p99_ms']:>8.1f} ms  "
+                  f"supervisor RSS {supervisor['rss'] / 1024:.0f} MiB  "
+                  f"max private per child {max(private, default=0) / 1024:.0f} MiB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    runs = results["runs"]
+    if len(runs) > 1 and runs[0]["questions_per_second"]:
+        for run in runs[1:]:
+            scaling = run["questions_per_second"] / runs[0]["questions_per_second"] / (run["workers"] / runs[0]["workers"])
+            print(f"scaling efficiency at {run['workers']} workers: {scaling:.0%}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
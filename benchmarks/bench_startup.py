@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Agent startup: import time, time-to-ready and first-query latency.
+
+Each measurement runs in a fresh interpreter against a scratch working
+directory holding a synthetic src/books/book1.pdf, with the stub LLM so no
+API key is needed. The store is built once up front, so the numbers are
+for a restart with the curriculum already indexed.
+
+Modes:
+    warm       warm-up thread on; wait until ready, then ask
+    immediate  warm-up thread on; ask right after import
+    cold       warm-up off; the first question loads everything itself
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --pages 200 --runs 5 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf  # noqa: E402
+
+HEAVY_MODULES = ('faiss', 'sentence_transformers', 'google.generativeai', 'PyPDF2')
+MODES = ('warm', 'immediate', 'cold')
+RESULT_PREFIX = "startup-result: "
+
+
+def child(mode: str, question: str):
+    """Measure one startup in this (fresh) process and print the results as JSON."""
+    start = time.perf_counter()
+    import src.agent as agent
+    import_seconds = time.perf_counter() - start
+    heavy_loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    ready_seconds = None
+    if mode == 'warm':
+        agent.wait_until_ready()
+        ready_seconds = time.perf_counter() - start
+
+    query_start = time.perf_counter()
+    result = agent.ask_curriculum_question(question)
+    first_query_seconds = time.perf_counter() - query_start
+    if ready_seconds is None:
+        ready_seconds = time.perf_counter() - start
+
+    # One write call, so warm-up thread output cannot land mid-line.
+    sys.stdout.write(RESULT_PREFIX + json.dumps({
+        "mode": mode,
+        "import_seconds": import_seconds,
+        "ready_seconds": ready_seconds,
+        "first_query_seconds": first_query_seconds,
+        "heavy_modules_at_import": heavy_loaded,
+        "status": result["status"],
+    }) + "\n")
+
+
+def run_child(workdir: str, mode: str, question: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": REPO_ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+        "LLM_BACKEND": "stub",
+        "WARM_UP_ON_START": "false" if mode == 'cold' else "true",
+        "MEMORY_STORE_DIR": os.path.join(workdir, "store"),
+        "DOCUMENT_REGISTRY_PATH": os.path.join(workdir, "registry.json"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite"),
+        "RESPONSE_CACHE_PATH": "",
+        "QUERY_CACHE_PATH": "",
+    })
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, "--question", question],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    # The agent (and its warm-up thread) print progress messages too.
+    line = next(line for line in output.splitlines() if line.startswith(RESULT_PREFIX))
+    return json.loads(line[len(RESULT_PREFIX):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=100, help='pages in the synthetic curriculum')
+    parser.add_argument('--runs', type=int, default=3, help='runs per mode (median is reported)')
+    parser.add_argument('--question', default='Explain how force relates to mass and acceleration.')
+    parser.add_argument('--output', help='write the raw measurements to this JSON file')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.question)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, "src", "books"))
+        write_synthetic_pdf(os.path.join(workdir, "src", "books", "book1.pdf"), args.pages)
+        print("Indexing the synthetic curriculum...")
+        run_child(workdir, 'warm', args.question)
+
+        results = {mode: [run_child(workdir, mode, args.question) for _ in range(args.runs)] for mode in MODES}
+
+    print(f"{'mode':>10} {'import s':>9} {'ready s':>9} {'1st query s':>12}  heavy modules at import")
+    for mode, runs in results.items():
+        median = {key: statistics.median(run[key] for run in runs)
+                  for key in ("import_seconds", "ready_seconds", "first_query_seconds")}
+        heavy = ', '.join(runs[0]["heavy_modules_at_import"]) or '-'
+        print(f"{mode:>10} {median['import_seconds']:>9.3f} {median['ready_seconds']:>9.3f} "
+              f"{median['first_query_seconds']:>12.3f}  {heavy}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Memory and recall report for the vector storage and metric options in
+src/index_factory.py (METRIC and VECTOR_STORAGE).
+
+Each combination of metric (l2, cosine) and storage (float32, float16,
+int8) is built as a flat index over the same vectors and compared with the
+current index, exact float32 L2. Recall is reported both against that
+baseline and against exact search with the same metric, so the cost of
+quantisation is separated from the change of metric.
+
+"MiB" is the index searched in memory. A quantised segment also keeps its
+float32 vectors on disk as the source for later migrations ("disk MiB");
+queries, filtered ones included, read only the codes, so those pages are
+not touched by search.
+
+    python benchmarks/quantization_report.py --store-dir src/memory_store
+    python benchmarks/quantization_report.py --synthetic 200000 --output quantization.json
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# Importing src loads the agent; benchmarks do not want its background warm-up.
+os.environ.setdefault('WARM_UP_ON_START', 'false')
+
+from benchmarks.ann_recall_report import load_vectors, recall_at_k, timed_search  # noqa: E402
+from src.index_factory import METRICS, VECTOR_STORAGES, build_index  # noqa: E402
+
+
+def index_bytes(index) -> int:
+    return int(faiss.serialize_index(index).size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store-dir', help='segment store to read vectors from')
+    parser.add_argument('--synthetic', type=int, default=50000, help='number of synthetic vectors')
+    parser.add_argument('--dim', type=int, default=384, help='dimension of synthetic vectors')
+    parser.add_argument('--queries', type=int, default=500, help='number of held-out queries')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--output', help='write the report as JSON to this path')
+    args = parser.parse_args()
+
+    vectors = np.ascontiguousarray(load_vectors(args), dtype=np.float32)
+    rng = np.random.default_rng(1)
+    query_rows = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = vectors[query_rows] + 0.01 * rng.normal(size=(len(query_rows), vectors.shape[1])).astype(np.float32)
+
+    baseline = build_index(vectors, 'flat', metric='l2', storage='float32')
+    baseline_truth, baseline_ms = timed_search(baseline, queries, args.k)
+    baseline_bytes = index_bytes(baseline)
+
+    rows = []
+    for metric in METRICS:
+        metric_vectors, metric_queries = vectors, queries
+        if metric == 'cosine':
+            metric_vectors, metric_queries = vectors.copy(), queries.copy()
+            faiss.normalize_L2(metric_vectors)
+            faiss.normalize_L2(metric_queries)
+        exact_truth = None
+        for storage in VECTOR_STORAGES:
+            index = build_index(metric_vectors, 'flat', metric=metric, storage=storage)
+            found, ms = timed_search(index, metric_queries, args.k)
+            if storage == 'float32':
+                exact_truth = found
+            size = index_bytes(index)
+            # Exact float32 segments are searched straight from the .npy, without an index file.
+            disk = vectors.nbytes + (size if storage != 'float32' else 0)
+            rows.append({
+                "metric": metric, "storage": storage, "bytes": size,
+                "bytes_per_vector": size / len(vectors), "compression": baseline_bytes / size,
+                "disk_bytes": disk,
+                "recall_vs_current": recall_at_k(found, baseline_truth),
+                "recall_vs_exact_same_metric": recall_at_k(found, exact_truth),
+                "ms_per_query": ms,
+            })
+
+    print(f"\n{len(vectors)} vectors, dim {vectors.shape[1]}, {len(queries)} queries, recall@{args.k}; "
+          f"current index is l2/float32 ({baseline_bytes / 2**20:.1f} MiB, {baseline_ms:.3f} ms/query)")
+    print(f"{'metric':<7} {'storage':<8} {'MiB':>8} {'B/vec':>7} {'smaller':>8} {'disk MiB':>9} "
+          f"{'recall/cur':>11} {'recall/exact':>13} {'ms/query':>9}")
+    for row in rows:
+        print(f"{row['metric']:<7} {row['storage']:<8} {row['bytes'] / 2**20:>8.1f} {row['bytes_per_vector']:>7.0f} "
+              f"{row['compression']:>7.1f}x {row['disk_bytes'] / 2**20:>9.1f} {row['recall_vs_current']:>11.3f} "
+              f"{row['recall_vs_exact_same_metric']:>13.3f} {row['ms_per_query']:>9.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"num_vectors": len(vectors), "dimension": int(vectors.shape[1]), "k": args.k,
+                       "baseline": {"metric": "l2", "storage": "float32", "bytes": baseline_bytes},
+                       "results": rows}, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    faiss.omp_set_num_threads(1)
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite: ingestion, retrieval and end-to-end question
+answering on a synthetic corpus, compared against a stored baseline.
+
+Nothing touches the network: the corpus is generated, answers come from
+the stub LLM (LLM_BACKEND=stub) and, by default, embeddings from the
+hashing stub (EMBEDDING_BACKEND=stub); pass --embedder model to measure
+the real embedding model instead. Caches are disabled so every number is
+for the uncached path. Stages and metrics:
+
+    extract   pages/s through pdf_retriever.iter_pdf_pages
+    ingest    pages/s and chunks/s through ContextRetriever.load_pdf
+    embed     chunks/s through VectorMemory.encode
+    index     seconds for VectorMemory.migrate_index to build --index-type
+    query     p50/p95/p99 ms of ContextRetriever.search_context per mode
+    answer    p50/p95/p99 ms of TaskPlanner.plan + TaskExecutor.execute_task
+    resources peak RSS of the run and on-disk size of the store
+
+With --baseline the metrics are compared against an earlier --output
+file; any metric more than --tolerance worse fails the run (exit 1).
+
+    python benchmarks/run_suite.py --output results.json
+    python benchmarks/run_suite.py --baseline benchmarks/baseline.json --output results.json
+    python benchmarks/run_suite.py --documents 8 --pages 200 --embedder model
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+# Importing src loads the agent; benchmarks do not want its background warm-up.
+os.environ.setdefault('WARM_UP_ON_START', 'false')
+
+from benchmarks.synthetic_pdf import WORDS, write_synthetic_pdf  # noqa: E402
+
+SEARCH_MODES = ('vector', 'lexical', 'hybrid')
+# Metrics where a larger value is better; for all others smaller is better.
+HIGHER_IS_BETTER = {"extract_pages_per_second", "ingest_pages_per_second", "ingest_chunks_per_second",
+                    "embed_chunks_per_second"}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def directory_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / (1024 * 1024)
+
+
+def percentiles(seconds) -> dict:
+    ms = sorted(s * 1000 for s in seconds)
+    if not ms:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    at = lambda q: ms[min(len(ms) - 1, int(round(q * (len(ms) - 1))))]  # noqa: E731
+    return {"p50": round(statistics.median(ms), 3), "p95": round(at(0.95), 3), "p99": round(at(0.99), 3)}
+
+
+def make_questions(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    templates = ["What is {} and how does it relate to {}?", "Explain {} in terms of {}.",
+                 "Describe the role of {} in {}.", "How does {} affect {}?"]
+    content = [word for word in WORDS if len(word) > 3]
+    return [rng.choice(templates).format(rng.choice(content), rng.choice(content)) for _ in range(count)]
+
+
+def configure_environment(workdir: str, args):
+    """Point every store and cache at ``workdir`` and switch to offline backends; before importing src."""
+    os.environ.update({
+        "LLM_BACKEND": "stub",
+        "STUB_LLM_LATENCY": str(args.llm_latency),
+        "EMBEDDING_BACKEND": "stub" if args.embedder == 'stub' else "sentence-transformers",
+        "MEMORY_STORE_DIR": os.path.join(workdir, "store"),
+        "COLLECTIONS_DIR": os.path.join(workdir, "collections"),
+        "DOCUMENT_REGISTRY_PATH": os.path.join(workdir, "registry.json"),
+        "FAISS_INDEX_PATH": os.path.join(workdir, "legacy.faiss"),
+        "CHUNK_METADATA_PATH": os.path.join(workdir, "legacy.pkl"),
+        "EMBEDDING_CACHE_PATH": "",
+        "RESPONSE_CACHE_PATH": "",
+        "QUERY_CACHE_SIZE": "0",
+        "QUERY_CACHE_PATH": "",
+        "SEMANTIC_CACHE_ENABLED": "false",
+    })
+
+
+def run_suite(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench-suite-")
+    configure_environment(workdir, args)
+    from src.context_retriever import ContextRetriever
+    from src.executor import create_executor
+    from src.pdf_retriever import iter_pdf_pages
+    from src.planner import create_planner
+
+    metrics = {}
+    try:
+        books = os.path.join(workdir, "books")
+        os.makedirs(books)
+        names = [f"doc{i:02d}.pdf" for i in range(args.documents)]
+        for seed, name in enumerate(names, 1):
+            write_synthetic_pdf(os.path.join(books, name), args.pages, seed=seed)
+        total_pages = args.documents * args.pages
+
+        start = time.perf_counter()
+        extracted = sum(1 for name in names for _ in iter_pdf_pages(os.path.join(books, name)))
+        metrics["extract_pages_per_second"] = round(extracted / (time.perf_counter() - start), 2)
+
+        retriever = ContextRetriever(books)
+        retriever.memory.warm_up()  # model load is startup cost, not ingestion
+        start = time.perf_counter()
+        for name in names:
+            if not retriever.load_pdf(name):
+                raise RuntimeError(f"loading {name} failed")
+        seconds = time.perf_counter() - start
+        retriever.memory.store.wait_for_compaction()
+        chunks = len(retriever.memory)
+        metrics["ingest_pages_per_second"] = round(total_pages / seconds, 2)
+        metrics["ingest_chunks_per_second"] = round(chunks / seconds, 2)
+
+        texts = [retriever.memory.chunks[i] for i in range(min(chunks, args.embed_sample))]
+        start = time.perf_counter()
+        retriever.memory.encode(texts)
+        metrics["embed_chunks_per_second"] = round(len(texts) / (time.perf_counter() - start), 2)
+
+        start = time.perf_counter()
+        retriever.memory.migrate_index(args.index_type)
+        metrics["index_build_seconds"] = round(time.perf_counter() - start, 3)
+
+        questions = make_questions(args.queries)
+        for mode in SEARCH_MODES:
+            for question in questions[:10]:
+                retriever.search_context(question, k=args.k, mode=mode)  # untimed warm-up
+            latencies = []
+            for question in questions:
+                start = time.perf_counter()
+                retriever.search_context(question, k=args.k, mode=mode)
+                latencies.append(time.perf_counter() - start)
+            for name, value in percentiles(latencies).items():
+                metrics[f"query_{mode}_{name}_ms"] = value
+
+        planner, executor = create_planner(), create_executor()
+        executor.set_context_retriever(retriever)
+        latencies = []
+        for question in questions[:args.answers]:
+            start = time.perf_counter()
+            plan = planner.plan(question)
+            executor.execute_task(plan['task_type'], question)
+            latencies.append(time.perf_counter() - start)
+        for name, value in percentiles(latencies).items():
+            metrics[f"answer_{name}_ms"] = value
+
+        metrics["peak_rss_mb"] = round(peak_rss_mb(), 1)
+        metrics["store_disk_mb"] = round(directory_mb(retriever.memory.store_dir), 3)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "config": {"documents": args.documents, "pages_per_document": args.pages, "chunks": chunks,
+                   "queries": args.queries, "answers": args.answers, "k": args.k,
+                   "index_type": args.index_type, "embedder": args.embedder, "llm_latency": args.llm_latency},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "metrics": metrics,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_change_ms: float) -> list:
+    """Print each metric next to the baseline; return the names of those that regressed.
+
+    Latencies only count as regressed if they also grew by ``min_change_ms``,
+    since sub-millisecond tails are mostly scheduling noise.
+    """
+    if baseline.get("config") != results["config"]:
+        print("⚠️  baseline was measured with a different configuration; comparing anyway")
+    regressions = []
+    print(f"{'metric':<32} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, value in results["metrics"].items():
+        old = baseline.get("metrics", {}).get(name)
+        if not old:
+            print(f"{name:<32} {'-':>12} {value:>12} {'':>8}")
+            continue
+        change = (value - old) / old
+        worse = -change if name in HIGHER_IS_BETTER else change
+        noise = name.endswith("_ms") and abs(value - old) < min_change_ms
+        flag = "  REGRESSION" if worse > tolerance and not noise else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<32} {old:>12} {value:>12} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=4, help='synthetic PDFs in the corpus')
+    parser.add_argument('--pages', type=int, default=50, help='pages per synthetic PDF')
+    parser.add_argument('--queries', type=int, default=200, help='retrieval queries per search mode')
+    parser.add_argument('--answers', type=int, default=50, help='end-to-end questions')
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--embed-sample', type=int, default=2000, help='chunks re-encoded for embed chunks/s')
+    parser.add_argument('--index-type', default='flat', help="index built by the index stage ('flat', 'hnsw', ...)")
+    parser.add_argument('--embedder', choices=('stub', 'model'), default='stub',
+                        help="'stub' needs no download; 'model' uses EMBEDDING_MODEL")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='seconds per stub LLM call')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression per metric')
+    parser.add_argument('--min-change-ms', type=float, default=1.0,
+                        help='latency changes smaller than this never count as regressions')
+    args = parser.parse_args()
+
+    results = run_suite(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if not args.baseline:
+        for name, value in results["metrics"].items():
+            print(f"{name:<32} {value:>12}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; save one with --output {args.baseline}")
+        sys.exit(1)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.min_change_ms)
+    if regressions:
+        print(f"❌ {len(regressions)} metrics regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"✅ no metric regressed by more than {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Search throughput and snapshot consistency while a large book is ingested.
+
+Reader threads query the retriever continuously through three phases:
+
+    baseline   only a small document is loaded
+    ingest     a synthetic book (500 pages by default) is loaded
+    loaded     the book is loaded and nothing is being written
+    reindex    the book changes and is re-indexed in place
+
+Every query also records how many rows of the book its snapshot holds.
+Readers must only ever see none of the book or all of one version of it;
+during re-indexing they must never see it missing. Queries per second are
+reported per phase; ingestion backs off while searches run, so throughput
+should stay at --min-ratio or more of the idle phase over the same index
+(ingest against baseline, reindex against loaded).
+The script exits with status 1 if a snapshot is inconsistent, a reader
+fails, or throughput drops below that ratio.
+
+    python benchmarks/stress_concurrent_ingest.py
+    python benchmarks/stress_concurrent_ingest.py --pages 200 --readers 8 --min-ratio 0.9 --output stress.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+# Importing src loads the agent; benchmarks do not want its background warm-up.
+os.environ.setdefault('WARM_UP_ON_START', 'false')
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf  # noqa: E402
+
+BOOK = "book.pdf"
+QUESTIONS = [
+    "How does energy change when force is applied?",
+    "Explain the structure of a cell membrane.",
+    "What is the relationship between mass and acceleration?",
+    "Describe how temperature affects reaction rate.",
+]
+
+
+class Readers:
+    """Query threads that count searches per phase and the book sizes they observe."""
+
+    def __init__(self, retriever, count: int):
+        self.retriever = retriever
+        self.phase = "baseline"
+        self.queries = {}
+        self.seen = {}
+        self.errors = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self._run, args=(i,), daemon=True) for i in range(count)]
+
+    def _book_rows(self) -> int:
+        snapshot = self.retriever.memory.store.snapshot()
+        return sum(count for entry in snapshot.entries for doc_id, _, count in entry.get("docs", [])
+                   if doc_id == BOOK)
+
+    def _run(self, worker: int):
+        i = worker
+        while not self._stop.is_set():
+            phase = self.phase
+            try:
+                rows = self._book_rows()
+                self.retriever.search_context(QUESTIONS[i % len(QUESTIONS)], k=5)
+            except Exception as e:  # report, do not hide, reader failures
+                with self._lock:
+                    self.errors.append(f"{type(e).__name__}: {e}")
+                return
+            with self._lock:
+                self.queries[phase] = self.queries.get(phase, 0) + 1
+                self.seen.setdefault(phase, set()).add(rows)
+            i += 1
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=500, help='pages in the book ingested under load')
+    parser.add_argument('--readers', type=int, default=4, help='concurrent query threads')
+    parser.add_argument('--baseline-seconds', type=float, default=3.0)
+    parser.add_argument('--min-ratio', type=float, default=0.8,
+                        help='lowest acceptable queries/s while writing, as a fraction of the idle rate')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="stress-ingest-")
+    os.environ.update({
+        "MEMORY_STORE_DIR": os.path.join(workdir, "store"),
+        "COLLECTIONS_DIR": os.path.join(workdir, "collections"),
+        "DOCUMENT_REGISTRY_PATH": os.path.join(workdir, "registry.json"),
+        "EMBEDDING_CACHE_PATH": "",
+        "FAISS_INDEX_PATH": os.path.join(workdir, "legacy.faiss"),
+        "CHUNK_METADATA_PATH": os.path.join(workdir, "legacy.pkl"),
+    })
+    from src.context_retriever import ContextRetriever
+
+    try:
+        books = os.path.join(workdir, "books")
+        os.makedirs(books)
+        write_synthetic_pdf(os.path.join(books, "intro.pdf"), 20, seed=1)
+        retriever = ContextRetriever(books)
+        retriever.load_pdf("intro.pdf")
+
+        readers = Readers(retriever, args.readers)
+        durations = {}
+        readers.start()
+        time.sleep(args.baseline_seconds)
+        durations["baseline"] = args.baseline_seconds
+
+        counts = {}
+        for phase, seed in (("ingest", 2), ("reindex", 3)):
+            write_synthetic_pdf(os.path.join(books, BOOK), args.pages, seed=seed)
+            readers.phase = phase
+            start = time.perf_counter()
+            if not retriever.load_pdf(BOOK):
+                raise RuntimeError(f"loading {BOOK} failed")
+            durations[phase] = time.perf_counter() - start
+            counts[phase] = retriever.list_loaded_pdfs()[BOOK]
+            if phase == "ingest":
+                # Searches over the book cost more than over the small document alone,
+                # so re-indexing is compared with an idle run over the same index.
+                retriever.memory.store.wait_for_compaction()
+                readers.phase = "loaded"
+                time.sleep(args.baseline_seconds)
+                durations["loaded"] = args.baseline_seconds
+        readers.phase = "after"
+        time.sleep(0.5)
+        readers.stop()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    allowed = {
+        "baseline": {0},
+        "ingest": {0, counts["ingest"]},
+        "loaded": {counts["ingest"]},
+        "reindex": {counts["ingest"], counts["reindex"]},
+    }
+    violations = {phase: sorted(readers.seen.get(phase, set()) - ok) for phase, ok in allowed.items()}
+    violations = {phase: sizes for phase, sizes in violations.items() if sizes}
+
+    results = {"pages": args.pages, "readers": args.readers, "chunks": counts, "phases": {}}
+    print(f"{'phase':>9} {'seconds':>8} {'queries':>8} {'queries/s':>10}  book rows seen")
+    for phase in ("baseline", "ingest", "loaded", "reindex"):
+        queries = readers.queries.get(phase, 0)
+        qps = queries / durations[phase] if durations[phase] else 0.0
+        seen = sorted(readers.seen.get(phase, set()))
+        results["phases"][phase] = {"seconds": durations[phase], "queries": queries, "qps": qps,
+                                    "book_rows_seen": seen}
+        print(f"{phase:>9} {durations[phase]:>8.2f} {queries:>8} {qps:>10.1f}  {seen}")
+    ratios = {}
+    for phase, baseline in (("ingest", "baseline"), ("reindex", "loaded")):
+        baseline_qps = results["phases"][baseline]["qps"]
+        ratios[phase] = results["phases"][phase]["qps"] / baseline_qps if baseline_qps else 0.0
+        print(f"throughput during {phase}: {ratios[phase]:.0%} of {baseline}")
+    slow = {phase: ratio for phase, ratio in ratios.items() if ratio < args.min_ratio}
+    results["throughput_ratios"] = ratios
+
+    results["errors"] = readers.errors
+    results["violations"] = violations
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    for error in readers.errors:
+        print(f"reader error: {error}")
+    for phase, sizes in violations.items():
+        print(f"inconsistent snapshot during {phase}: saw {sizes} rows of {BOOK}, expected {sorted(allowed[phase])}")
+    for phase, ratio in slow.items():
+        print(f"throughput during {phase} fell to {ratio:.0%} of the idle rate (minimum {args.min_ratio:.0%})")
+    if readers.errors or violations or slow:
+        sys.exit(1)
+    print("OK: readers only ever saw complete versions of the book and kept their throughput")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Minimal, dependency-free writer for synthetic text PDFs used by the benchmarks.
+"""
+
+import random
+from typing import List
+
+WORDS = (
+    "force mass acceleration velocity energy momentum friction gravity inertia "
+    "newton joule watt power work displacement vector scalar equilibrium torque "
+    "cell mitosis enzyme protein membrane nucleus photosynthesis respiration "
+    "atom electron proton neutron molecule bond reaction catalyst solution acid "
+    "the a of and to in is that for with as by on which this are be from"
+).split()
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def synthetic_page_text(page_number: int, words_per_page: int = 400, seed: int = 0) -> str:
+    """Return deterministic pseudo-textbook text for one page."""
+    rng = random.Random(seed * 100003 + page_number)
+    sentences, words = [], 0
+    while words < words_per_page:
+        length = rng.randint(8, 20)
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        words += length
+    return " ".join(sentences)
+
+
+def write_pdf(path: str, pages: List[str], line_width: int = 90):
+    """Write ``pages`` of plain text to ``path`` as a PDF with one Helvetica text block per page."""
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")
+    kids = []
+    for text in pages:
+        lines, line = [], ""
+        for word in text.split():
+            if line and len(line) + len(word) + 1 > line_width:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        lines.append(line)
+        ops = [f"BT /F1 9 Tf 11 TL 36 770 Td"]
+        ops.extend(f"({_escape(item)}) Tj T*" for item in lines)
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 612 792] /Contents {content_id} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>".encode()
+        ))
+    objects[pages_id - 1] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>".encode()
+    )
+    catalog_id = add(f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode())
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_synthetic_pdf(path: str, num_pages: int, words_per_page: int = 400, seed: int = 0):
+    """Write a synthetic textbook of ``num_pages`` pages to ``path``."""
+    write_pdf(path, [synthetic_page_text(page, words_per_page, seed) for page in range(1, num_pages + 1)])
@@ -1,79 +1,251 @@
 from google.adk.agents import Agent
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, List, Optional
 from .planner import create_planner
 from .executor import create_executor
 from .context_retriever import create_context_retriever, load_context_pdf
+from .config import get_config
+from .tracing import span
+import asyncio
+import multiprocessing
 import os
+import threading
+import time
+
+Config = get_config()
 
 # Initialize the RAG assistant
 rag_assistant = None
+# Tools and the warm-up thread may initialize concurrently.
+_init_lock = threading.Lock()
+_default_curriculum_lock = threading.Lock()
+_default_curriculum_checked = False
+_warm_up_thread = None
 
 def initialize_rag_assistant():
-    """Initialize the RAG assistant if not already done."""
+    """Initialize the RAG assistant if not already done.
+    
+    This only creates the components; the embedding model is loaded on
+    first use (or by ``warm_up``) and the default curriculum by
+    ``load_default_curriculum``.
+    """
     global rag_assistant
-    if rag_assistant is None:
-        # Create components
-        planner = create_planner()
-        executor = create_executor()
-        context_retriever = create_context_retriever()
-        
-        # Connect executor to context retriever
-        executor.set_context_retriever(context_retriever)
-        
-        # Create assistant object
-        rag_assistant = {
-            'planner': planner,
-            'executor': executor,
-            'context_retriever': context_retriever,
-            'loaded_documents': {}
-        }
-        
-        # Load the default curriculum
+    with _init_lock:
+        if rag_assistant is None:
+            # Create components
+            planner = create_planner()
+            executor = create_executor()
+            context_retriever = create_context_retriever()
+            
+            # Connect executor to context retriever
+            executor.set_context_retriever(context_retriever)
+            
+            # Create assistant object; documents indexed by earlier runs stay loaded
+            rag_assistant = {
+                'planner': planner,
+                'executor': executor,
+                'context_retriever': context_retriever,
+                'loaded_documents': {name: True for name in context_retriever.list_loaded_pdfs()}
+            }
+    return rag_assistant
+
+def load_default_curriculum():
+    """Load the default curriculum once (a no-op if it is already indexed and unchanged)."""
+    global _default_curriculum_checked
+    with _default_curriculum_lock:
+        if _default_curriculum_checked:
+            return
         pdf_filename = "book1.pdf"
         if os.path.exists(f"src/books/{pdf_filename}"):
             load_curriculum_document(pdf_filename)
         else:
             print(f"⚠️  Warning: {pdf_filename} not found in src/books/")
-    return rag_assistant
+        _default_curriculum_checked = True
+
+def _assistant_for_questions():
+    # Questions need the default curriculum; if warm-up is loading it, this waits for it.
+    assistant = initialize_rag_assistant()
+    load_default_curriculum()
+    return assistant
+
+def warm_up():
+    """Create the assistant, load the embedding model and index, then the default curriculum."""
+    start = time.perf_counter()
+    try:
+        assistant = initialize_rag_assistant()
+        assistant['context_retriever'].memory.warm_up()
+        load_default_curriculum()
+        print(f"✅ RAG assistant ready in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        print(f"⚠️  Warm-up failed: {e}")
+
+def start_warm_up() -> threading.Thread:
+    """Run ``warm_up`` in a background thread (once) and return the thread."""
+    global _warm_up_thread
+    with _init_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=warm_up, name="rag-warm-up", daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    """Block until warm-up has finished, starting it if needed; False on timeout."""
+    thread = start_warm_up()
+    thread.join(timeout)
+    return not thread.is_alive()
+
+def reload_published_documents() -> bool:
+    """Adopt documents loaded or removed by another process; True if the index changed.
+    
+    Prefork workers call this when the writer process publishes an update.
+    """
+    assistant = initialize_rag_assistant()
+    retriever = assistant['context_retriever']
+    changed = retriever.refresh()
+    assistant['loaded_documents'] = {name: True for name in retriever.list_loaded_pdfs()}
+    if changed:
+        assistant['executor'].clear_semantic_cache()
+    return changed
+
+def _scope(documents: Optional[List[str]], collections: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+    """Retrieval filters for the executor, or None to search everything."""
+    if documents is None and collections is None:
+        return None
+    return {"documents": documents, "collections": collections}
 
-def ask_curriculum_question(question: str) -> Dict[str, Any]:
+def _with_timings(result: Dict[str, Any], trace) -> Dict[str, Any]:
+    """Add the per-stage ``timings`` of a finished trace to a tool result (only while tracing is enabled)."""
+    timings = trace.timings()
+    if timings is not None:
+        result["timings"] = timings
+    return result
+
+def ask_curriculum_question(question: str, documents: Optional[List[str]] = None,
+                            collections: Optional[List[str]] = None) -> Dict[str, Any]:
     """Ask a question about the curriculum using RAG.
     
     Args:
         question: The question to ask about the curriculum
+        documents: Optional list of PDF filenames to restrict the search to
+        collections: Optional list of collections to search (default: all)
         
     Returns:
-        dict: A dictionary containing the response and metadata
+        dict: A dictionary containing the response and metadata, and the
+        per-stage ``timings`` when tracing is enabled
     """
-    assistant = initialize_rag_assistant()
+    with span("ask_curriculum_question") as trace:
+        with span("wait_ready"):
+            assistant = _assistant_for_questions()
+        
+        # Plan the query
+        with span("plan"):
+            plan = assistant['planner'].plan(question)
+        trace.set(task_type=plan['task_type'])
+        
+        # Execute the query
+        response = assistant['executor'].execute_task(plan['task_type'], question,
+                                                      scope=_scope(documents, collections))
+    
+    return _with_timings({
+        "status": "success",
+        "response": response,
+        "task_type": plan['task_type'],
+        "steps_taken": len(plan['sub_tasks'])
+    }, trace)
+
+async def ask_curriculum_question_async(question: str, documents: Optional[List[str]] = None,
+                                        collections: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Ask a question about the curriculum using RAG.
     
-    # Plan the query
-    plan = assistant['planner'].plan(question)
+    Async variant of ask_curriculum_question: the LLM call does not block
+    the agent's event loop, so concurrent sessions are served in parallel.
     
-    # Execute the query
-    response = assistant['executor'].execute_task(plan['task_type'], question)
+    Args:
+        question: The question to ask about the curriculum
+        documents: Optional list of PDF filenames to restrict the search to
+        collections: Optional list of collections to search (default: all)
+        
+    Returns:
+        dict: A dictionary containing the response and metadata, and the
+        per-stage ``timings`` when tracing is enabled
+    """
+    with span("ask_curriculum_question") as trace:
+        # May wait for the default curriculum to load; keep that off the event loop.
+        with span("wait_ready"):
+            assistant = await asyncio.to_thread(_assistant_for_questions)
+        
+        # Plan the query
+        with span("plan"):
+            plan = assistant['planner'].plan(question)
+        trace.set(task_type=plan['task_type'])
+        
+        # Execute the query
+        response = await assistant['executor'].execute_task_async(plan['task_type'], question,
+                                                                  scope=_scope(documents, collections))
     
-    return {
+    return _with_timings({
         "status": "success",
         "response": response,
         "task_type": plan['task_type'],
         "steps_taken": len(plan['sub_tasks'])
+    }, trace)
+
+async def ask_curriculum_question_stream(question: str, documents: Optional[List[str]] = None,
+                                         collections: Optional[List[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Ask a question about the curriculum and stream the answer as it is generated.
+    
+    Args:
+        question: The question to ask about the curriculum
+        documents: Optional list of PDF filenames to restrict the search to
+        collections: Optional list of collections to search (default: all)
+        
+    Yields:
+        dict: Partial answer text as it arrives, then a final message with
+        the complete response and its first-token and total latencies
+        (plus the per-stage timings of the whole request when tracing is enabled)
+    """
+    parts, timings = [], {}
+    with span("ask_curriculum_question_stream") as trace:
+        with span("wait_ready"):
+            assistant = await asyncio.to_thread(_assistant_for_questions)
+        with span("plan"):
+            plan = assistant['planner'].plan(question)
+        trace.set(task_type=plan['task_type'])
+        executor = assistant['executor']
+        
+        async for text in executor.execute_task_stream_async(plan['task_type'], question, timings=timings,
+                                                             scope=_scope(documents, collections)):
+            parts.append(text)
+            yield {"status": "streaming", "partial_response": text}
+    
+    # The trace covers the whole request; the stream's own total_seconds is the generation alone.
+    trace_timings = trace.timings()
+    if trace_timings is not None:
+        timings.update({**trace_timings, "generation_seconds": timings.get("total_seconds")})
+    
+    yield {
+        "status": "success",
+        "response": ''.join(parts),
+        "task_type": plan['task_type'],
+        "steps_taken": len(plan['sub_tasks']),
+        "timings": timings
     }
 
-def load_curriculum_document(filename: str) -> Dict[str, Any]:
+def load_curriculum_document(filename: str, collection: Optional[str] = None) -> Dict[str, Any]:
     """Load a curriculum document into the RAG assistant.
     
     Args:
         filename: The PDF filename to load (should be in src/books/)
+        collection: Optional collection (e.g. a subject) to add it to
         
     Returns:
         dict: A dictionary containing the load status
     """
     assistant = initialize_rag_assistant()
-    success = load_context_pdf(assistant['context_retriever'], filename)
+    retriever = assistant['context_retriever']
+    success = load_context_pdf(retriever, filename, collection)
     
     if success:
-        assistant['loaded_documents'][filename] = True
+        assistant['loaded_documents'][retriever.document_key(filename, collection)] = True
         return {
             "status": "success",
             "message": f"Successfully loaded curriculum: {filename}",
@@ -98,7 +270,29 @@ def get_loaded_documents() -> Dict[str, Any]:
     return {
         "status": "success",
         "loaded_documents": list(documents.keys()),
-        "count": len(documents)
+        "count": len(documents),
+        "collections": assistant['context_retriever'].list_collections()
+    }
+
+def remove_curriculum_document(filename: str, collection: Optional[str] = None) -> Dict[str, Any]:
+    """Remove one curriculum document; other loaded documents are kept.
+    
+    Args:
+        filename: The PDF filename to remove
+        collection: The collection it was loaded into, if any
+        
+    Returns:
+        dict: A dictionary containing the removal status
+    """
+    assistant = initialize_rag_assistant()
+    retriever = assistant['context_retriever']
+    removed = retriever.remove_pdf(filename, collection)
+    assistant['loaded_documents'].pop(retriever.document_key(filename, collection), None)
+    
+    return {
+        "status": "success" if removed else "error",
+        "message": f"Removed {removed} chunks of {filename}" if removed else f"{filename} is not loaded",
+        "loaded_documents": list(assistant['loaded_documents'].keys())
     }
 
 def clear_memory() -> Dict[str, Any]:
@@ -116,20 +310,56 @@ def clear_memory() -> Dict[str, Any]:
         "message": "Memory cleared successfully"
     }
 
+def get_cache_stats() -> Dict[str, Any]:
+    """Get hit-rate metrics for the LLM response and semantic answer caches,
+    and the prompt tokens saved by context packing.
+    
+    Returns:
+        dict: A dictionary containing the cache statistics
+    """
+    assistant = initialize_rag_assistant()
+    
+    return {
+        "status": "success",
+        **assistant['executor'].cache_stats(),
+        "streaming": assistant['executor'].stream_stats(),
+        "context_packing": assistant['context_retriever'].packing_stats()
+    }
+
+_DESCRIPTION = "A RAG-powered teaching assistant that can answer questions about curriculum documents loaded from PDFs."
+_INSTRUCTION = """You are a RAG-powered teaching assistant. You can:
+
+1. Answer questions about curriculum documents loaded from PDFs
+2. Load new curriculum documents, optionally into a named collection (for example one per subject)
+3. Show which documents are currently loaded
+4. Remove a single document, or clear memory when needed
+
+When a user asks a question about curriculum content, use the {ask_tool} tool to get relevant information from the loaded documents. If the user names specific documents, pass their filenames as documents to search only those; if they name a subject or grade that has its own collection, pass it in collections.{ask_note}
+
+Be helpful, accurate, and educational in your responses."""
+_DOCUMENT_TOOLS = [load_curriculum_document, get_loaded_documents, remove_curriculum_document, clear_memory]
+
 # Create the ADK agent
 root_agent = Agent(
     name="rag_teaching_assistant",
     model="gemini-2.0-flash",
-    description="A RAG-powered teaching assistant that can answer questions about curriculum documents loaded from PDFs.",
-    instruction="""You are a RAG-powered teaching assistant. You can:
+    description=_DESCRIPTION,
+    instruction=_INSTRUCTION.format(ask_tool="ask_curriculum_question_async", ask_note=""),
+    tools=[ask_curriculum_question_async, *_DOCUMENT_TOOLS]
+)
 
-1. Answer questions about curriculum documents loaded from PDFs
-2. Load new curriculum documents
-3. Show which documents are currently loaded
-4. Clear memory when needed
-
-When a user asks a question about curriculum content, use the ask_curriculum_question tool to get relevant information from the loaded documents.
+# Streaming tools (async generators) only run in live sessions (Runner.run_live), so they are
+# registered on a separate agent for those; regular sessions use root_agent.
+live_agent = Agent(
+    name="rag_teaching_assistant_live",
+    model="gemini-2.0-flash",
+    description=_DESCRIPTION,
+    instruction=_INSTRUCTION.format(ask_tool="ask_curriculum_question_stream",
+                                    ask_note=" Its answer streams, so long answers reach the user as they are generated."),
+    tools=[ask_curriculum_question_stream, *_DOCUMENT_TOOLS]
+)
 
-Be helpful, accurate, and educational in your responses.""",
-    tools=[ask_curriculum_question, load_curriculum_document, get_loaded_documents, clear_memory]
-) 
\ No newline at end of file
+# Load the model, index and default curriculum while the agent starts serving
+# (not in PDF extraction workers, which may re-import this package).
+if Config.WARM_UP_ON_START and multiprocessing.parent_process() is None:
+    start_warm_up()
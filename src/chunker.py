@@ -0,0 +1,114 @@
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+_HYPHENATED_LINE_BREAK = re.compile(r'(\w)-\n(\w)')
+
+
+class Chunk(NamedTuple):
+    """A chunk of document text and the (1-based) pages it spans."""
+    text: str
+    page_start: int
+    page_end: int
+
+
+class _Unit(NamedTuple):
+    text: str
+    page_start: int
+    page_end: int
+    tokens: int
+    ends_paragraph: bool
+
+
+def _sentences(pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, int, str, bool]]:
+    """Yield (page_start, page_end, sentence, ends_paragraph) from (page_number, text) pairs.
+
+    A sentence cut off by a page break is joined with its continuation on
+    the next page, so it spans both pages.
+    """
+    carry, carry_page = "", None
+    for page, text in pages:
+        text = _HYPHENATED_LINE_BREAK.sub(r'\1\2', text)
+        paragraphs = [' '.join(p.split()) for p in _PARAGRAPH_BREAK.split(text)]
+        paragraphs = [p for p in paragraphs if p]
+        for i, paragraph in enumerate(paragraphs):
+            sentences = _SENTENCE_END.split(paragraph)
+            if carry:
+                sentences[0] = f"{carry} {sentences[0]}"
+            sentence_pages = [carry_page if carry else page] + [page] * (len(sentences) - 1)
+            carry, carry_page = "", None
+            last_paragraph = i == len(paragraphs) - 1
+            if last_paragraph and not sentences[-1].endswith(('.', '!', '?', ':')):
+                carry, carry_page = sentences.pop(), sentence_pages.pop()
+            for j, (sentence, sentence_page) in enumerate(zip(sentences, sentence_pages)):
+                yield sentence_page, page, sentence, j == len(sentences) - 1 and not carry
+    if carry:
+        yield carry_page, page, carry, True
+
+
+def _units(pages: Iterable[Tuple[int, str]], tokenizer, max_tokens: int) -> Iterator[_Unit]:
+    """Split pages into sentences, each tokenized exactly once.
+
+    Sentences longer than ``max_tokens`` are cut into token windows so that
+    no unit can overflow a chunk on its own.
+    """
+    for page_start, page_end, sentence, ends_paragraph in _sentences(pages):
+        tokens = tokenizer.tokenize(sentence)
+        if len(tokens) <= max_tokens:
+            yield _Unit(sentence, page_start, page_end, len(tokens), ends_paragraph)
+            continue
+        for start in range(0, len(tokens), max_tokens):
+            window = tokens[start:start + max_tokens]
+            last = start + max_tokens >= len(tokens)
+            yield _Unit(tokenizer.convert_tokens_to_string(window), page_start, page_end,
+                        len(window), ends_paragraph and last)
+
+
+def iter_token_chunks(pages: Iterable[Tuple[int, str]], tokenizer, max_tokens: int,
+                      overlap_tokens: int = 0, min_fill: float = 0.75) -> Iterator[Chunk]:
+    """Yield chunks of at most ``max_tokens`` tokens from (page_number, text) pairs.
+
+    Chunks are built from whole sentences and close early at a paragraph
+    boundary once they are ``min_fill`` full. Each chunk starts with the
+    trailing sentences of the previous one, up to ``overlap_tokens`` tokens.
+    ``tokenizer`` only needs ``tokenize`` and ``convert_tokens_to_string``,
+    as provided by the embedding model's Hugging Face tokenizer, so chunk
+    sizes match what the model will actually embed.
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+    current: List[_Unit] = []
+    size = 0
+    fresh = 0  # units in ``current`` that are not overlap from the previous chunk
+
+    def emit() -> Chunk:
+        return Chunk(' '.join(unit.text for unit in current),
+                     current[0].page_start, current[-1].page_end)
+
+    def overlap() -> List[_Unit]:
+        tail, total = [], 0
+        for unit in reversed(current):
+            if total + unit.tokens > overlap_tokens:
+                break
+            tail.insert(0, unit)
+            total += unit.tokens
+        return tail
+
+    for unit in _units(pages, tokenizer, max_tokens):
+        if fresh and size + unit.tokens > max_tokens:
+            yield emit()
+            current, fresh = overlap(), 0
+            size = sum(u.tokens for u in current)
+        # Drop overlap that would not leave room for the next sentence.
+        while current and size + unit.tokens > max_tokens:
+            size -= current.pop(0).tokens
+        current.append(unit)
+        size += unit.tokens
+        fresh += 1
+        if unit.ends_paragraph and size >= min_fill * max_tokens:
+            yield emit()
+            current, fresh = overlap(), 0
+            size = sum(u.tokens for u in current)
+    if fresh:
+        yield emit()
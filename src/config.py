@@ -11,19 +11,101 @@ class Config:
     # Google API Configuration
     GEMINI_API_KEY: Optional[str] = os.getenv('GEMINI_API_KEY')
     GEMINI_MODEL: str = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+    LLM_BACKEND: str = os.getenv('LLM_BACKEND', 'gemini')  # 'gemini' or 'stub' (offline, deterministic)
+    STUB_LLM_LATENCY: float = float(os.getenv('STUB_LLM_LATENCY', '0'))  # seconds per stub call
+    WARM_UP_ON_START: bool = os.getenv('WARM_UP_ON_START', 'true').lower() == 'true'
+    ASYNC_WORKERS: int = int(os.getenv('ASYNC_WORKERS', '4'))  # threads for encoding/search in async tools
     
     # PDF Configuration
     PDF_FOLDER: str = os.getenv('PDF_FOLDER', 'src/books')
     DEFAULT_CHUNK_SIZE: int = int(os.getenv('DEFAULT_CHUNK_SIZE', '500'))
+    CHUNK_MAX_TOKENS: int = int(os.getenv('CHUNK_MAX_TOKENS', '0'))  # 0 = embedding model's limit
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv('CHUNK_OVERLAP_TOKENS', '32'))
+    PDF_EXTRACT_WORKERS: int = int(os.getenv('PDF_EXTRACT_WORKERS', str(os.cpu_count() or 1)))
+    
+    # Ingestion Pipeline Configuration
+    INGEST_QUEUE_SIZE: int = int(os.getenv('INGEST_QUEUE_SIZE', '256'))
+    ENCODE_BATCH_SIZE: int = int(os.getenv('ENCODE_BATCH_SIZE', '64'))
+    ENCODE_WORKERS: int = int(os.getenv('ENCODE_WORKERS', '1'))
+    WRITE_BATCH_SIZE: int = int(os.getenv('WRITE_BATCH_SIZE', '1024'))
+    INGEST_QUERY_YIELD: float = float(os.getenv('INGEST_QUERY_YIELD', '8'))  # back-off per second of work while searches run; 0 = off
+    
+    # Encoder Service Configuration (concurrent encodes share micro-batches on one model)
+    ENCODER_BATCHING: bool = os.getenv('ENCODER_BATCHING', 'true').lower() == 'true'
+    ENCODER_MAX_BATCH: int = int(os.getenv('ENCODER_MAX_BATCH', '64'))
+    ENCODER_MAX_WAIT_MS: float = float(os.getenv('ENCODER_MAX_WAIT_MS', '5'))  # window for a batch to fill
     
     # Memory Configuration
     FAISS_INDEX_PATH: str = os.getenv('FAISS_INDEX_PATH', 'src/faiss_index.faiss')
     CHUNK_METADATA_PATH: str = os.getenv('CHUNK_METADATA_PATH', 'src/chunk_metadata.pkl')
     EMBEDDING_MODEL: str = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+    EMBEDDING_BACKEND: str = os.getenv('EMBEDDING_BACKEND', 'sentence-transformers')  # or 'stub' (offline, hashed)
+    MEMORY_STORE_DIR: str = os.getenv('MEMORY_STORE_DIR', 'src/memory_store')
+    DOCUMENT_REGISTRY_PATH: str = os.getenv('DOCUMENT_REGISTRY_PATH', 'src/document_registry.json')
+    MAX_SEGMENTS: int = int(os.getenv('MAX_SEGMENTS', '8'))
+    SEGMENT_MERGE_FACTOR: int = int(os.getenv('SEGMENT_MERGE_FACTOR', '4'))
+    EMBEDDING_CACHE_PATH: str = os.getenv('EMBEDDING_CACHE_PATH', 'src/embedding_cache.sqlite')
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '200000'))
+    QUERY_CACHE_SIZE: int = int(os.getenv('QUERY_CACHE_SIZE', '10000'))  # 0 disables the cache
+    QUERY_CACHE_PATH: str = os.getenv('QUERY_CACHE_PATH', '')  # set to persist across restarts
+    
+    # Collection Configuration (named shards, each a memory store under COLLECTIONS_DIR)
+    COLLECTIONS_DIR: str = os.getenv('COLLECTIONS_DIR', 'src/collections')
+    MAX_OPEN_COLLECTIONS: int = int(os.getenv('MAX_OPEN_COLLECTIONS', '4'))
+    COLLECTION_IDLE_SECONDS: float = float(os.getenv('COLLECTION_IDLE_SECONDS', '600'))  # 0 never closes idle ones
+    SHARD_SEARCH_WORKERS: int = int(os.getenv('SHARD_SEARCH_WORKERS', '4'))
+    
+    # Prefork Serving Configuration (python -m src.prefork_server)
+    PREFORK_HOST: str = os.getenv('PREFORK_HOST', '127.0.0.1')
+    PREFORK_PORT: int = int(os.getenv('PREFORK_PORT', '8080'))
+    PREFORK_WORKERS: int = int(os.getenv('PREFORK_WORKERS', '0'))  # 0 = one per CPU core
+    PREFORK_INFERENCE_THREADS: int = int(os.getenv('PREFORK_INFERENCE_THREADS', '1'))  # per worker
+    
+    # Index Configuration ('flat', 'ivf_flat', 'ivf_pq' or 'hnsw')
+    INDEX_TYPE: str = os.getenv('INDEX_TYPE', 'flat')
+    ANN_MIN_SEGMENT_SIZE: int = int(os.getenv('ANN_MIN_SEGMENT_SIZE', '10000'))
+    INDEX_TRAIN_SAMPLE: int = int(os.getenv('INDEX_TRAIN_SAMPLE', '50000'))
+    IVF_NLIST: int = int(os.getenv('IVF_NLIST', '1024'))
+    PQ_M: int = int(os.getenv('PQ_M', '48'))
+    PQ_NBITS: int = int(os.getenv('PQ_NBITS', '8'))
+    HNSW_M: int = int(os.getenv('HNSW_M', '32'))
+    HNSW_EF_CONSTRUCTION: int = int(os.getenv('HNSW_EF_CONSTRUCTION', '80'))
+    NPROBE: int = int(os.getenv('NPROBE', '16'))
+    EF_SEARCH: int = int(os.getenv('EF_SEARCH', '64'))
+    METRIC: str = os.getenv('METRIC', 'l2')  # 'l2' or 'cosine' (normalised inner product)
+    VECTOR_STORAGE: str = os.getenv('VECTOR_STORAGE', 'float32')  # 'float32', 'float16' or 'int8'
+    
+    # Retrieval Configuration ('vector', 'lexical' or 'hybrid' = BM25 and vectors fused by RRF)
+    SEARCH_MODE: str = os.getenv('SEARCH_MODE', 'vector')
+    BM25_K1: float = float(os.getenv('BM25_K1', '1.2'))
+    BM25_B: float = float(os.getenv('BM25_B', '0.75'))
+    RRF_K: int = int(os.getenv('RRF_K', '60'))
+    HYBRID_CANDIDATES: int = int(os.getenv('HYBRID_CANDIDATES', '20'))  # per leg, before fusion
+    LEXICAL_SEARCH_WORKERS: int = int(os.getenv('LEXICAL_SEARCH_WORKERS', '4'))
+    
+    # Context Packing Configuration (prompt context fitted to a token budget; 0 disables packing)
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv('CONTEXT_TOKEN_BUDGET', '800'))
+    CONTEXT_DEDUP_THRESHOLD: float = float(os.getenv('CONTEXT_DEDUP_THRESHOLD', '0.92'))  # near-duplicate cosine
+    CONTEXT_MMR_LAMBDA: float = float(os.getenv('CONTEXT_MMR_LAMBDA', '0.7'))  # 1.0 = relevance only
+    
+    # LLM Response and Semantic Answer Cache Configuration
+    RESPONSE_CACHE_PATH: str = os.getenv('RESPONSE_CACHE_PATH', 'src/response_cache.sqlite')  # '' disables
+    RESPONSE_CACHE_TTL: int = int(os.getenv('RESPONSE_CACHE_TTL', str(7 * 24 * 3600)))
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '10000'))
+    # Opt-in: a paraphrase above the threshold gets the cached answer verbatim, and
+    # questions that differ only in a detail ("2019" vs "2020") can score above it.
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true'
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.92'))
+    SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '5000'))
     
     # Logging Configuration
     LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
     
+    # Tracing Configuration (per-stage spans; exporters: 'log', 'ring', 'prometheus')
+    TRACING_ENABLED: bool = os.getenv('TRACING_ENABLED', 'false').lower() == 'true'
+    TRACE_EXPORTERS: str = os.getenv('TRACE_EXPORTERS', 'ring,prometheus')
+    TRACE_RING_SIZE: int = int(os.getenv('TRACE_RING_SIZE', '1000'))
+    
     @classmethod
     def validate(cls) -> bool:
         """Validate that required configuration is present."""
@@ -38,13 +120,17 @@ class Config:
         """Print current configuration (without sensitive data)."""
         print("🔧 Current Configuration:")
         print(f"   GEMINI_MODEL: {cls.GEMINI_MODEL}")
+        print(f"   LLM_BACKEND: {cls.LLM_BACKEND}")
         print(f"   PDF_FOLDER: {cls.PDF_FOLDER}")
         print(f"   DEFAULT_CHUNK_SIZE: {cls.DEFAULT_CHUNK_SIZE}")
         print(f"   EMBEDDING_MODEL: {cls.EMBEDDING_MODEL}")
+        print(f"   EMBEDDING_BACKEND: {cls.EMBEDDING_BACKEND}")
+        print(f"   MEMORY_STORE_DIR: {cls.MEMORY_STORE_DIR}")
+        print(f"   INDEX_TYPE: {cls.INDEX_TYPE}")
         print(f"   LOG_LEVEL: {cls.LOG_LEVEL}")
         print(f"   GEMINI_API_KEY: {'✅ Set' if cls.GEMINI_API_KEY else '❌ Not set'}")
 
 # Convenience function to get config
 def get_config() -> Config:
     """Get the configuration instance."""
-    return Config 
\ No newline at end of file
+    return Config
\ No newline at end of file
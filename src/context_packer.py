@@ -0,0 +1,163 @@
+import re
+import threading
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+import numpy as np
+
+from .tracing import estimate_tokens
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Tokens of the "Context i (Relevance: x):" header and blank lines around each chunk in the prompt.
+ENTRY_OVERHEAD_TOKENS = 10
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def context_tokens(results: List[Dict[str, Any]]) -> int:
+    """Estimated prompt tokens of ``results`` once formatted as context."""
+    return sum(estimate_tokens(result["content"]) + ENTRY_OVERHEAD_TOKENS for result in results)
+
+
+class ContextPacker:
+    """Packs retrieved chunks into a prompt context of at most ``token_budget`` tokens.
+
+    Chunks are picked from the candidates by maximal marginal relevance:
+    each next one maximises ``mmr_lambda`` * similarity to the query minus
+    (1 - ``mmr_lambda``) * similarity to the chunks already picked, and a
+    candidate at least ``dedup_threshold`` similar to a picked chunk is
+    dropped as a near-duplicate (overlapping chunks, a passage repeated in
+    two editions). If the picked chunks still exceed the budget, their
+    sentences are ranked by similarity to the query and the best ones are
+    kept, in their original order, until the budget is spent. Chunks keep
+    the candidates' relevance order. Token counts are estimates, like the
+    prompt token counts reported by tracing.
+    """
+
+    def __init__(self, encode_query: Callable[[List[str]], np.ndarray],
+                 encode_passages: Callable[[List[str]], np.ndarray], token_budget: int = 800,
+                 dedup_threshold: float = 0.92, mmr_lambda: float = 0.7):
+        self.encode_query = encode_query
+        self.encode_passages = encode_passages
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.mmr_lambda = mmr_lambda
+        self.requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.duplicates_dropped = 0
+        self.chunks_trimmed = 0
+        self._lock = threading.Lock()
+
+    def pack(self, query: str, candidates: List[Dict[str, Any]], k: int) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """Pick up to ``k`` of ``candidates`` (sorted by relevance) and fit them to the budget.
+
+        Returns the packed results and a report of this request's context
+        tokens, tokens saved against the plain top ``k``, near-duplicates
+        dropped and chunks trimmed.
+        """
+        before = context_tokens(candidates[:k])
+        results, duplicates, trimmed = candidates[:k], 0, 0
+        if candidates:
+            query_vector = _normalize(self.encode_query([query]))[0]
+            picked, duplicates = self._select(query_vector, candidates, k)
+            results = [candidates[i] for i in picked]
+            if context_tokens(results) > self.token_budget:
+                results, trimmed = self._trim(query_vector, results)
+        after = context_tokens(results)
+        with self._lock:
+            self.requests += 1
+            self.tokens_before += before
+            self.tokens_after += after
+            self.duplicates_dropped += duplicates
+            self.chunks_trimmed += trimmed
+        return results, {"context_tokens": after, "context_saved_tokens": before - after,
+                         "duplicates_dropped": duplicates, "chunks_trimmed": trimmed}
+
+    def _select(self, query_vector: np.ndarray, candidates: List[Dict[str, Any]], k: int) -> Tuple[List[int], int]:
+        """MMR selection; returns the picked candidate positions in relevance order and the duplicates dropped."""
+        if all(candidate.get("embedding") is not None for candidate in candidates):
+            # The vectors stored with the chunks at ingestion; nothing is encoded on the query path.
+            vectors = _normalize(np.vstack([candidate["embedding"] for candidate in candidates]))
+        else:
+            vectors = _normalize(self.encode_passages([candidate["content"] for candidate in candidates]))
+        relevance = vectors @ query_vector
+        remaining = list(range(len(candidates)))
+        picked: List[int] = []
+        duplicates = 0
+        while remaining and len(picked) < k:
+            if picked:
+                redundancy = (vectors[remaining] @ vectors[picked].T).max(axis=1)
+                duplicate = redundancy >= self.dedup_threshold
+                duplicates += int(duplicate.sum())
+                remaining = [i for i, dup in zip(remaining, duplicate) if not dup]
+                redundancy = redundancy[~duplicate]
+                if not remaining:
+                    break
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            scores = self.mmr_lambda * relevance[remaining] - (1.0 - self.mmr_lambda) * redundancy
+            picked.append(remaining.pop(int(np.argmax(scores))))
+        return sorted(picked), duplicates
+
+    def _trim(self, query_vector: np.ndarray, results: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """Keep the sentences most similar to the query that fit the budget; returns results and chunks trimmed."""
+        sentences = [(position, sentence) for position, result in enumerate(results)
+                     for sentence in split_sentences(result["content"])]
+        if not sentences:
+            return results, 0
+        scores = _normalize(self.encode_passages([sentence for _, sentence in sentences])) @ query_vector
+        keep: Set[int] = set()
+        opened: Set[int] = set()
+        used = 0
+        for i in np.argsort(-scores, kind='stable'):
+            position, sentence = sentences[i]
+            cost = estimate_tokens(sentence) + 1 + (0 if position in opened else ENTRY_OVERHEAD_TOKENS)
+            if used + cost <= self.token_budget:
+                keep.add(int(i))
+                opened.add(position)
+                used += cost
+        if not keep:
+            # Even the best sentence is over budget; a context of one sentence beats none.
+            keep.add(int(np.argmax(scores)))
+
+        packed, trimmed, previous = [], 0, {}
+        parts: Dict[int, List[str]] = {}
+        for i, (position, sentence) in enumerate(sentences):
+            if i not in keep:
+                continue
+            # Sentences that were not adjacent in the chunk are joined with an ellipsis.
+            gap = position in previous and previous[position] != i - 1
+            parts.setdefault(position, []).append(f"... {sentence}" if gap else sentence)
+            previous[position] = i
+        for position, result in enumerate(results):
+            if position not in parts:
+                trimmed += 1
+                continue
+            content = " ".join(parts[position])
+            if len(parts[position]) < len(split_sentences(result["content"])):
+                trimmed += 1
+                result = {**result, "content": content, "trimmed": True}
+            packed.append(result)
+        return packed, trimmed
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            saved = self.tokens_before - self.tokens_after
+            return {
+                "token_budget": self.token_budget,
+                "requests": self.requests,
+                "context_tokens": self.tokens_after,
+                "tokens_saved": saved,
+                "saved_fraction": saved / self.tokens_before if self.tokens_before else 0.0,
+                "duplicates_dropped": self.duplicates_dropped,
+                "chunks_trimmed": self.chunks_trimmed,
+            }
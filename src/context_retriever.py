@@ -1,16 +1,126 @@
-from typing import List, Dict, Any
-from .pdf_retriever import load_and_prepare_pdf
-from .memory import VectorMemory
+from typing import Callable, List, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from .context_packer import ContextPacker
+from .ingest_pipeline import IngestionPipeline, QueryLoad
+from .memory import LEGACY_DOCUMENT, SearchHit, VectorMemory
+from .sharded_memory import DEFAULT_COLLECTION, ShardedMemory
+from .document_registry import DocumentRegistry
+from .config import get_config
+from .forking import reinit_after_fork
+from .tracing import copy_context_call, span
+import numpy as np
 import os
+import threading
+
+Config = get_config()
+
+SEARCH_MODES = ('vector', 'lexical', 'hybrid')
 
 class ContextRetriever:
+    """Loads PDFs into memory and retrieves context for queries.
+    
+    Reads and writes follow a single-writer design: loads, removals and
+    clears are serialised by a write lock, while searches take no lock and
+    run against the store's published snapshot. A document being ingested
+    is staged and swapped in whole, so concurrent queries see either the
+    old version of it or the new one, never a partial one.
+    """
+    
     def __init__(self, pdf_folder: str = "src/books"):
         self.pdf_folder = pdf_folder
         self.memory = VectorMemory()
-        self.loaded_pdfs = {}
+        # Named collections (subjects, grades) beside the default one, opened on demand.
+        self.collections = ShardedMemory(self.memory)
+        self.overlap_tokens = Config.CHUNK_OVERLAP_TOKENS
+        self.registry = DocumentRegistry(Config.DOCUMENT_REGISTRY_PATH)
+        self._document_listeners: List[Callable[[Optional[str]], None]] = []
+        self._write_lock = threading.RLock()
+        # Searches in flight; ingestion backs off while there are any.
+        self.query_load = QueryLoad()
+        # Runs the BM25 leg of hybrid searches alongside the vector leg.
+        self._lexical_pool = self._new_lexical_pool()
+        reinit_after_fork(self._after_fork)
+        self.packer: Optional[ContextPacker] = None
+        if Config.CONTEXT_TOKEN_BUDGET > 0:
+            self.packer = ContextPacker(self.memory.embed_queries, self.memory.embed_passages,
+                                        Config.CONTEXT_TOKEN_BUDGET, Config.CONTEXT_DEDUP_THRESHOLD,
+                                        Config.CONTEXT_MMR_LAMBDA)
+        # Documents indexed by earlier runs are already in the persisted store.
+        self.loaded_pdfs = self._indexed_documents()
+    
+    @staticmethod
+    def _new_lexical_pool() -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=max(1, Config.LEXICAL_SEARCH_WORKERS),
+                                  thread_name_prefix="lexical-search")
+    
+    def _after_fork(self):
+        # Pool threads do not survive a fork.
+        self._write_lock = threading.RLock()
+        self.query_load = QueryLoad()
+        self._lexical_pool = self._new_lexical_pool()
+    
+    def _indexed_documents(self) -> Dict[str, int]:
+        """Registry entries whose chunks are in the store, with their chunk counts."""
+        indexed = set(self.memory.document_ids())
+        documents = {}
+        for doc_id, entry in self.registry.documents.items():
+            collection, _, name = doc_id.rpartition('/')
+            # Other collections are not opened here; their registry entries are trusted.
+            if (not collection and name in indexed) or (collection and self.collections.exists(collection)):
+                documents[doc_id] = entry["chunks"]
+        return documents
+    
+    def refresh(self) -> bool:
+        """Pick up documents another process has loaded or removed; True if the index changed.
+        
+        Used by read-only retrievers that share their stores with a single
+        writer process (see prefork_server); listeners are not notified,
+        since the writer already invalidated the shared caches.
+        """
+        changed = self.collections.refresh()
+        self.registry.reload()
+        self.loaded_pdfs = self._indexed_documents()
+        return changed
+    
+    @property
+    def max_tokens(self) -> int:
+        # Chunks are sized in the embedding model's own tokens so nothing is truncated.
+        return min(Config.CHUNK_MAX_TOKENS or self.memory.max_tokens, self.memory.max_tokens)
+    
+    def add_document_listener(self, listener: Callable[[Optional[str]], None]):
+        """Register ``listener(doc_id)`` to be called when a document's chunks change.
         
-    def load_pdf(self, pdf_filename: str) -> bool:
-        """Load a PDF file and add its chunks to memory."""
+        ``doc_id`` is None when all documents are cleared.
+        """
+        self._document_listeners.append(listener)
+    
+    def _notify_document_changed(self, doc_id: Optional[str]):
+        for listener in self._document_listeners:
+            listener(doc_id)
+    
+    @staticmethod
+    def document_key(pdf_filename: str, collection: Optional[str]) -> str:
+        """Registry key of a PDF: its filename, prefixed by the collection outside the default one."""
+        if collection in (None, DEFAULT_COLLECTION):
+            return pdf_filename
+        return f"{collection}/{pdf_filename}"
+    
+    def _index_params(self) -> Dict[str, Any]:
+        """Parameters that change the chunks or vectors produced for a document."""
+        return {
+            "chunker": "tokens",
+            "max_tokens": self.max_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "embedding_model": self.memory.model_name,
+        }
+        
+    def load_pdf(self, pdf_filename: str, collection: Optional[str] = None) -> bool:
+        """Load a PDF file and add its chunks to memory.
+        
+        Unchanged documents that are already indexed are skipped; changed
+        documents are re-indexed and replace their old chunks in one swap.
+        ``collection`` names the shard to add it to (default: the main one).
+        """
         pdf_path = os.path.join(self.pdf_folder, pdf_filename)
         
         if not os.path.exists(pdf_path):
@@ -18,51 +128,212 @@ class ContextRetriever:
             return False
             
         try:
-            # Extract and chunk the PDF
-            chunks = load_and_prepare_pdf(pdf_path, chunk_size=500)
-            
-            # Add chunks to memory
-            self.memory.add_chunks(chunks)
-            self.loaded_pdfs[pdf_filename] = len(chunks)
-            
-            print(f"Successfully loaded {pdf_filename} with {len(chunks)} chunks")
-            return True
-            
+            with self._write_lock, span("load_pdf", document=self.document_key(pdf_filename, collection)):
+                return self._load_pdf(pdf_filename, pdf_path, collection)
         except Exception as e:
             print(f"Error loading PDF {pdf_filename}: {e}")
             return False
     
-    def search_context(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
-        """Search for relevant context content based on query."""
-        results = self.memory.search(query, k=k)
-        
-        formatted_results = []
-        for chunk, distance in results:
-            formatted_results.append({
-                "content": chunk,
-                "relevance_score": 1.0 / (1.0 + distance),  # Convert distance to similarity score
-                "source": "context_pdf"
-            })
-            
-        return formatted_results
+    def _load_pdf(self, pdf_filename: str, pdf_path: str, collection: Optional[str]) -> bool:
+        memory = self.collections.get(collection)
+        key = self.document_key(pdf_filename, collection)
+        params = self._index_params()
+        with span("registry_check"):
+            indexed = pdf_filename in memory.document_ids()
+            current = indexed and self.registry.is_current(key, pdf_path, params)
+        if current:
+            self.loaded_pdfs[key] = self.registry.get(key)["chunks"]
+            print(f"{key} is already indexed and unchanged, skipping")
+            return True
+        
+        # Extract, chunk, embed and write the PDF as overlapping pipeline stages.
+        # Queries keep using the previous snapshot until the whole document is swapped in.
+        # Chunks imported from a legacy index have no source and would duplicate this document's,
+        # so the first ingest after an upgrade replaces them too.
+        replaces = [pdf_filename] if indexed else []
+        if LEGACY_DOCUMENT in memory.document_ids():
+            replaces.append(LEGACY_DOCUMENT)
+        pipeline = IngestionPipeline(memory, self.max_tokens, self.overlap_tokens, query_load=self.query_load)
+        with span("ingest") as ingest:
+            with memory.staged(replaces=replaces) as stage:
+                chunk_count = pipeline.run(pdf_path, doc_id=pdf_filename)
+            # The stages overlap on their own threads, so their busy time is reported rather than nested.
+            ingest.set(chunks=chunk_count, bottleneck=pipeline.bottleneck(),
+                       **{f"{name}_busy_seconds": round(stats.busy, 6) for name, stats in pipeline.stats.items()})
+        if replaces:
+            print(f"{key} replaced {stage.removed} old chunks ({', '.join(replaces)})")
+        with span("registry_record"):
+            self.registry.record(key, pdf_path, params, chunk_count)
+        self.loaded_pdfs[key] = chunk_count
+        for doc_id in dict.fromkeys([pdf_filename, *replaces]):
+            self._notify_document_changed(doc_id)
+        
+        print(f"Successfully loaded {key} with {chunk_count} chunks "
+              f"in {pipeline.elapsed:.1f}s (bottleneck: {pipeline.bottleneck()})")
+        return True
+    
+    def search_context(self, query: str, k: int = 3, mode: Optional[str] = None,
+                       documents: Optional[List[str]] = None,
+                       collections: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Search for relevant context content based on query.
+        
+        ``mode`` is 'vector', 'lexical' (BM25) or 'hybrid' (both, fused by
+        reciprocal rank); it defaults to ``Config.SEARCH_MODE``.
+        ``documents`` restricts the search to those PDFs and ``collections``
+        to those collections (default: all of them).
+        """
+        return self.search_context_batch([query], k=k, mode=mode, documents=documents, collections=collections)[0]
+    
+    def search_context_batch(self, queries: List[str], k: int = 3, mode: Optional[str] = None,
+                             documents: Optional[List[str]] = None,
+                             collections: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
+        """Search for context for many queries with one encode call and one index pass per collection.
+        
+        Results hold no vectors, so they are JSON-serialisable and keep no
+        segment mapped once the caller drops the snapshot.
+        """
+        return [[self._public(result) for result in results]
+                for results in self._search(queries, k, mode, documents, collections)]
+    
+    def _search(self, queries: List[str], k: int, mode: Optional[str], documents: Optional[List[str]],
+                collections: Optional[List[str]]) -> List[List[Dict[str, Any]]]:
+        with self.query_load.query():
+            return self._search_context_batch(queries, k, mode, documents, collections)
     
-    def get_context_for_query(self, query: str, k: int = 3) -> str:
+    @staticmethod
+    def _public(result: Dict[str, Any]) -> Dict[str, Any]:
+        # The stored embedding is only for the context packer.
+        return {key: value for key, value in result.items() if key != "embedding"}
+    
+    def _search_context_batch(self, queries: List[str], k: int, mode: Optional[str],
+                              documents: Optional[List[str]],
+                              collections: Optional[List[str]]) -> List[List[Dict[str, Any]]]:
+        mode = mode or Config.SEARCH_MODE
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {mode!r}; expected one of {SEARCH_MODES}")
+        
+        if mode == 'lexical':
+            with span("lexical_search"):
+                return [[self._format_hit(hit, -hit.distance)
+                         for hit in self.collections.search_hits_lexical(query, k, documents, collections)]
+                        for query in queries]
+        
+        if mode == 'hybrid':
+            # Both legs over-fetch; the lexical one runs in the pool while this thread encodes and searches.
+            candidates = max(k, Config.HYBRID_CANDIDATES)
+            lexical = self._lexical_pool.submit(copy_context_call(self._lexical_candidates, queries, candidates,
+                                                                  documents, collections))
+            dense = self.collections.search_hits_batch(queries, candidates, documents, collections)
+            lexical_hits = lexical.result()
+            with span("fuse"):
+                return [self._fuse(vector_hits, hits, k) for vector_hits, hits in zip(dense, lexical_hits)]
+        
+        results = self.collections.search_hits_batch(queries, k, documents, collections)
+        
+        # Convert all distances to similarity scores in one vectorised step, each under the metric
+        # of the collection it came from; with cosine the score is the cosine similarity itself.
+        distances = np.array([hit.distance for hits in results for hit in hits], dtype=np.float64)
+        cosine = np.array([hit.metric == 'cosine' for hits in results for hit in hits], dtype=bool)
+        # Quantised codes can land marginally outside [-1, 1].
+        similarities = np.where(cosine, np.clip(1.0 - distances, -1.0, 1.0), 1.0 / (1.0 + distances))
+        scores = iter(similarities.tolist())
+        
+        return [[self._format_hit(hit, next(scores)) for hit in hits] for hits in results]
+    
+    def _lexical_candidates(self, queries: List[str], candidates: int, documents: Optional[List[str]],
+                            collections: Optional[List[str]]) -> List[List[SearchHit]]:
+        with span("lexical_search"):
+            return [self.collections.search_hits_lexical(query, candidates, documents, collections)
+                    for query in queries]
+    
+    def _format_hit(self, hit: SearchHit, score: float) -> Dict[str, Any]:
+        return {
+            "content": hit.text,
+            "relevance_score": score,
+            "source": "context_pdf",
+            "document": hit.doc_id,
+            "pages": (hit.page_start, hit.page_end),
+            "chunk": hit.chunk_index,
+            "embedding": hit.vector
+        }
+    
+    def _fuse(self, vector_hits: List[SearchHit], lexical_hits: List[SearchHit], k: int) -> List[Dict[str, Any]]:
+        """Reciprocal rank fusion: each chunk scores sum(1 / (RRF_K + rank)) over the rankings it is in.
+        
+        The reported relevance is that sum divided by its maximum, so a
+        chunk ranked first by both legs scores 1.0 rather than 0.033.
+        """
+        fused: Dict[Tuple, List] = {}
+        for ranking in (vector_hits, lexical_hits):
+            for rank, hit in enumerate(ranking, 1):
+                key = (hit.doc_id, hit.page_start, hit.text)
+                entry = fused.setdefault(key, [hit, 0.0])
+                entry[1] += 1.0 / (Config.RRF_K + rank)
+        best = sorted(fused.values(), key=lambda entry: -entry[1])[:k]
+        top_score = 2.0 / (Config.RRF_K + 1)
+        return [self._format_hit(hit, score / top_score) for hit, score in best]
+    
+    def get_context_for_query(self, query: str, k: int = 3, documents: Optional[List[str]] = None,
+                              collections: Optional[List[str]] = None) -> str:
         """Get formatted context from documents for a query."""
-        results = self.search_context(query, k=k)
+        return self.get_context_with_sources(query, k=k, documents=documents, collections=collections)[0]
+    
+    def get_context_with_sources(self, query: str, k: int = 3, documents: Optional[List[str]] = None,
+                                 collections: Optional[List[str]] = None) -> Tuple[str, List[str]]:
+        """Get formatted context for a query and the ids of the documents it came from.
+        
+        With a packer, twice ``k`` candidates are retrieved so that dropping
+        near-duplicates still leaves ``k`` chunks, and the context is fitted
+        to ``Config.CONTEXT_TOKEN_BUDGET``.
+        """
+        fetch = 2 * k if self.packer is not None else k
+        # Internal results keep each chunk's stored embedding, so the packer need not re-encode them.
+        results = self._search([query], fetch, None, documents, collections)[0]
         
         if not results:
-            return "No relevant context content found."
+            return "No relevant context content found.", []
         
-        context_parts = []
-        for i, result in enumerate(results, 1):
-            context_parts.append(f"Context {i} (Relevance: {result['relevance_score']:.3f}):\n{result['content']}\n")
+        if self.packer is not None:
+            with span("pack_context", candidates=len(results)) as packing:
+                results, report = self.packer.pack(query, results, k)
+                packing.set(**report)
         
-        return "\n".join(context_parts)
+        with span("format_context", chunks=len(results)):
+            context_parts = []
+            for i, result in enumerate(results, 1):
+                context_parts.append(f"Context {i} (Relevance: {result['relevance_score']:.3f}):\n{result['content']}\n")
+            
+            documents = list(dict.fromkeys(r["document"] for r in results if r["document"] is not None))
+            return "\n".join(context_parts), documents
+    
+    def packing_stats(self) -> Dict[str, Any]:
+        """Tokens saved by context packing so far."""
+        if self.packer is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.packer.stats()}
+    
+    def remove_pdf(self, pdf_filename: str, collection: Optional[str] = None) -> int:
+        """Remove one PDF's chunks from memory; the rest of the library stays indexed."""
+        key = self.document_key(pdf_filename, collection)
+        with self._write_lock:
+            removed = self.collections.get(collection).remove_document(pdf_filename)
+            self.registry.remove(key)
+            self.loaded_pdfs.pop(key, None)
+            self._notify_document_changed(pdf_filename)
+        print(f"Removed {removed} chunks of {key} from memory")
+        return removed
+    
+    def list_collections(self) -> List[str]:
+        """Return the names of all collections on disk, starting with the default one."""
+        return self.collections.names()
     
     def clear_memory(self):
-        """Clear all loaded context from memory."""
-        self.memory.clear()
-        self.loaded_pdfs.clear()
+        """Clear all loaded context from memory, in every collection."""
+        with self._write_lock:
+            self.collections.clear()
+            self.registry.clear()
+            self.loaded_pdfs.clear()
+            self._notify_document_changed(None)
         print("Context memory cleared.")
     
     def list_loaded_pdfs(self) -> Dict[str, int]:
@@ -74,10 +345,10 @@ def create_context_retriever(pdf_folder: str = "src/books") -> ContextRetriever:
     """Create and return a context retriever instance."""
     return ContextRetriever(pdf_folder)
 
-def load_context_pdf(retriever: ContextRetriever, pdf_filename: str) -> bool:
+def load_context_pdf(retriever: ContextRetriever, pdf_filename: str, collection: Optional[str] = None) -> bool:
     """Load a specific PDF into the context retriever."""
-    return retriever.load_pdf(pdf_filename)
+    return retriever.load_pdf(pdf_filename, collection)
 
 def query_context(retriever: ContextRetriever, question: str, k: int = 3) -> str:
     """Query the context and return relevant information."""
-    return retriever.get_context_for_query(question, k=k) 
\ No newline at end of file
+    return retriever.get_context_for_query(question, k=k)
\ No newline at end of file
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+
+def file_sha256(path: str) -> str:
+    """Return the SHA-256 hex digest of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DocumentRegistry:
+    """Persisted manifest of the documents that have been indexed.
+
+    Each entry records the file's hash, size and mtime together with the
+    chunking parameters and embedding model it was indexed with, so a
+    restart can tell an unchanged document from one that needs re-indexing.
+    Updates from concurrent loads are serialised, so the file always holds
+    a complete JSON document.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.reload()
+
+    def reload(self):
+        """Re-read the registry file, e.g. after another process has recorded documents."""
+        documents = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                documents = json.load(f)
+        with self._lock:
+            self.documents = documents
+
+    def _save(self):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.documents, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        return self.documents.get(doc_id)
+
+    def is_current(self, doc_id: str, path: str, params: Dict[str, Any]) -> bool:
+        """Return True if ``path`` was already indexed as ``doc_id`` with ``params``.
+
+        The file is only hashed when its size or mtime changed, so checking
+        an untouched document costs a single ``stat``.
+        """
+        entry = self.documents.get(doc_id)
+        if entry is None or entry.get("params") != params:
+            return False
+        stat = os.stat(path)
+        if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return True
+        if entry["size"] != stat.st_size or entry["sha256"] != file_sha256(path):
+            return False
+        # Touched but identical: remember the new mtime to skip hashing next time.
+        with self._lock:
+            entry["mtime"] = stat.st_mtime
+            self._save()
+        return True
+
+    def record(self, doc_id: str, path: str, params: Dict[str, Any], chunk_count: int):
+        """Record that ``path`` has been indexed as ``doc_id``."""
+        stat = os.stat(path)
+        entry = {
+            "sha256": file_sha256(path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "params": params,
+            "chunks": chunk_count,
+        }
+        with self._lock:
+            self.documents[doc_id] = entry
+            self._save()
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            if self.documents.pop(doc_id, None) is not None:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self.documents = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
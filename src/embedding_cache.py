@@ -0,0 +1,222 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .forking import reinit_after_fork
+
+# SQLite limits the number of bound parameters per statement.
+_BATCH = 500
+
+
+class EmbeddingCache:
+    """Persistent, content-addressed cache of chunk embeddings.
+
+    Entries are keyed by a SHA-256 of (model name, chunk text) and stored as
+    raw float32 bytes in a single SQLite file. When the cache grows past
+    ``max_entries`` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_entries: int = 200000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        reinit_after_fork(self._reconnect)
+
+    def _reconnect(self):
+        # A SQLite connection must not be used across fork.
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    @staticmethod
+    def key(model_name: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model_name}\0{text}".encode('utf-8')).digest()
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Return the cached embedding for each text, or None where it is missing."""
+        keys = [self.key(model_name, text) for text in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(keys), _BATCH):
+                batch = keys[start:start + _BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        results = [found.get(key) for key in keys]
+        hits = sum(result is not None for result in results)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model_name: str, texts: List[str], vectors: np.ndarray):
+        """Store embeddings for ``texts`` and evict old entries if over capacity."""
+        now = time.time()
+        rows = [
+            (self.key(model_name, text), int(vector.shape[0]),
+             np.ascontiguousarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dim, vector, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN"
+                " (SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)", (excess,)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+
+def encode_with_cache(model, model_name: str, texts: List[str], cache: Optional[EmbeddingCache]) -> np.ndarray:
+    """Encode ``texts`` with ``model``, running the model only on cache misses."""
+    if cache is None:
+        return model.encode(texts, convert_to_numpy=True).astype(np.float32)
+    cached = cache.get_many(model_name, texts)
+    missing = [i for i, vector in enumerate(cached) if vector is None]
+    if missing:
+        encoded = model.encode([texts[i] for i in missing], convert_to_numpy=True).astype(np.float32)
+        cache.put_many(model_name, [texts[i] for i in missing], encoded)
+        for i, vector in zip(missing, encoded):
+            cached[i] = vector
+    return np.vstack(cached).astype(np.float32, copy=False)
+
+
+class QueryEmbeddingCache:
+    """Bounded, thread-safe LRU cache of query text -> embedding.
+
+    Queries are normalised (case-folded, whitespace collapsed) before lookup
+    so trivial variations of a repeated question share one entry. If
+    ``path`` is set the cache can be saved and is reloaded on start.
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 10000, path: Optional[str] = None):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return ' '.join(query.casefold().split())
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        key = self.normalize(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, query: str, vector: np.ndarray):
+        key = self.normalize(query)
+        with self._lock:
+            self._entries[key] = np.asarray(vector, dtype=np.float32)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                saved = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"Ignoring unreadable query cache {self.path}: {e}")
+            return
+        if saved.get("model_name") != self.model_name:
+            return
+        for key, vector in zip(saved["keys"][-self.max_entries:], saved["vectors"][-self.max_entries:]):
+            self._entries[key] = vector
+
+    def save(self):
+        """Write the cache to ``path`` (oldest entries first) if persistence is enabled."""
+        if not self.path:
+            return
+        with self._lock:
+            keys = list(self._entries)
+            vectors = np.vstack(list(self._entries.values())) if keys else np.zeros((0, 0), np.float32)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({"model_name": self.model_name, "keys": keys, "vectors": vectors}, f)
+        os.replace(tmp_path, self.path)
+
+
+def encode_queries(model, queries: List[str], cache: Optional[QueryEmbeddingCache]) -> np.ndarray:
+    """Encode queries, skipping the model for queries already in ``cache``."""
+    if cache is None:
+        return model.encode(list(queries), convert_to_numpy=True).astype(np.float32)
+    vectors = [cache.get(query) for query in queries]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        encoded = model.encode([queries[i] for i in missing], convert_to_numpy=True).astype(np.float32)
+        for i, vector in zip(missing, encoded):
+            cache.put(queries[i], vector)
+            vectors[i] = vector
+    return np.vstack(vectors).astype(np.float32, copy=False)
@@ -0,0 +1,212 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+from .config import get_config
+from .forking import reinit_after_fork
+
+Config = get_config()
+
+QUERY = "query"
+INGEST = "ingest"
+PRIORITIES = (QUERY, INGEST)
+
+
+class _Request:
+    """One ``submit`` call: its texts are encoded in pieces and gathered into one array."""
+
+    def __init__(self, count: int):
+        self.future: Future = Future()
+        self.created = time.monotonic()
+        self.vectors: Optional[np.ndarray] = None
+        self.count = count
+        self.remaining = 0
+        self._lock = threading.Lock()
+
+    def fill(self, start: int, vectors: np.ndarray):
+        with self._lock:
+            if self.future.done():
+                return
+            if self.vectors is None:
+                self.vectors = np.empty((self.count, vectors.shape[1]), dtype=np.float32)
+            self.vectors[start:start + len(vectors)] = vectors
+            self.remaining -= 1
+            if self.remaining == 0:
+                self.future.set_result(self.vectors)
+
+    def fail(self, error: BaseException):
+        with self._lock:
+            if not self.future.done():
+                self.future.set_exception(error)
+
+
+class _Piece:
+    """A slice of a request's texts, at most one batch long."""
+
+    __slots__ = ("request", "start", "texts")
+
+    def __init__(self, request: _Request, start: int, texts: List[str]):
+        self.request = request
+        self.start = start
+        self.texts = texts
+
+
+class EncoderService:
+    """One embedding model shared by every caller, fed in micro-batches.
+
+    Callers ``submit`` texts and get a future back. A single worker thread
+    gathers pending requests into batches of up to ``max_batch`` texts,
+    waiting at most ``max_wait_ms`` for a batch to fill while requests are
+    arriving concurrently, and runs the model once per batch, so concurrent
+    single-query encodes share one forward pass instead of each paying the
+    per-call overhead.
+
+    Query requests take priority: whenever queries are waiting the next
+    batch holds only queries, and ingestion batches are formed only when
+    none are. Large requests are split into batch-sized pieces, so a query
+    never waits behind more than one ingestion batch.
+    """
+
+    def __init__(self, load_model: Callable[[], Any], max_batch: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None):
+        self._load_model = load_model
+        self.max_batch = max(1, max_batch or Config.ENCODER_MAX_BATCH)
+        wait_ms = Config.ENCODER_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms
+        self.max_wait = max(0.0, wait_ms) / 1000.0
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[_Piece]] = {priority: deque() for priority in PRIORITIES}
+        self._pending = 0
+        self._closed = False
+        self._last_batch_pieces = 0
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.texts = 0
+        self.model_seconds = 0.0
+        reinit_after_fork(self._after_fork)
+
+    def _after_fork(self):
+        # The worker thread did not survive the fork; requests queued by the parent belong to it.
+        self._cond = threading.Condition()
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        self._pending = 0
+        self._thread = None
+
+    def submit(self, texts: List[str], priority: str = QUERY) -> Future:
+        """Queue ``texts`` for encoding; the future resolves to a float32 array, one row per text."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}; expected one of {PRIORITIES}")
+        texts = list(texts)
+        request = _Request(len(texts))
+        if not texts:
+            request.future.set_result(np.empty((0, 0), dtype=np.float32))
+            return request.future
+        pieces = [_Piece(request, start, texts[start:start + self.max_batch])
+                  for start in range(0, len(texts), self.max_batch)]
+        request.remaining = len(pieces)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("EncoderService is closed")
+            self._queues[priority].extend(pieces)
+            self._pending += len(texts)
+            self._ensure_worker()
+            self._cond.notify()
+        return request.future
+
+    def encode(self, texts: List[str], priority: str = QUERY) -> np.ndarray:
+        """Encode ``texts`` and wait for the result."""
+        return self.submit(texts, priority).result()
+
+    def client(self, priority: str) -> "EncoderClient":
+        """A model-like view whose ``encode`` goes through this service at ``priority``."""
+        return EncoderClient(self, priority)
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="encoder-service", daemon=True)
+            self._thread.start()
+
+    def _take_batch(self) -> List[_Piece]:
+        # Queries go first and are never mixed with ingestion, which would slow them down.
+        queue = self._queues[QUERY] or self._queues[INGEST]
+        batch = [queue.popleft()]
+        size = len(batch[0].texts)
+        while queue and size + len(queue[0].texts) <= self.max_batch:
+            piece = queue.popleft()
+            batch.append(piece)
+            size += len(piece.texts)
+        self._pending -= size
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # Give concurrent callers up to max_wait to join a batch that is not yet full;
+                # a lone caller with no traffic around it is served at once.
+                queued = sum(len(queue) for queue in self._queues.values())
+                concurrent = queued > 1 or self._last_batch_pieces > 1
+                oldest = min(queue[0].request.created for queue in self._queues.values() if queue)
+                deadline = oldest + self.max_wait
+                while concurrent and self._pending < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take_batch()
+                self._last_batch_pieces = len(batch)
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch: List[_Piece]):
+        texts = [text for piece in batch for text in piece.texts]
+        start = time.perf_counter()
+        try:
+            vectors = self._load_model().encode(texts, convert_to_numpy=True).astype(np.float32)
+        except Exception as e:
+            for piece in batch:
+                piece.request.fail(e)
+            return
+        self.model_seconds += time.perf_counter() - start
+        self.batches += 1
+        self.texts += len(texts)
+        offset = 0
+        for piece in batch:
+            piece.request.fill(piece.start, vectors[offset:offset + len(piece.texts)])
+            offset += len(piece.texts)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "model_seconds": round(self.model_seconds, 3),
+            "pending": self._pending,
+        }
+
+    def close(self):
+        """Finish the queued requests and stop the worker thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+
+class EncoderClient:
+    """Stands in for a SentenceTransformer where only ``encode`` is needed."""
+
+    def __init__(self, service: EncoderService, priority: str):
+        self.service = service
+        self.priority = priority
+
+    def encode(self, texts: List[str], convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        return self.service.encode(texts, self.priority)
@@ -1,10 +1,129 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Iterator, AsyncIterator
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from .context_retriever import ContextRetriever
-import google.generativeai as genai
+from .response_cache import ResponseCache
+from .semantic_cache import SemanticCache
+from .stub_llm import StubGenerativeModel
+from .tracing import copy_context_call, estimate_tokens, record as record_span, span
+import asyncio
 import os
+import threading
+import time
 from .config import get_config
+from .lazy_import import lazy_import
 
 Config = get_config()
+genai = lazy_import('google.generativeai')
+
+# Generation prompt and number of context chunks to retrieve, per task type.
+TASK_PROMPTS = {
+    'explain': ("""
+        Based on the provided context, please explain: {query}
+        
+        Your explanation should:
+        1. Be clear and easy to understand
+        2. Use the context information provided
+        3. Include key concepts and definitions
+        4. Provide examples if helpful
+        5. Summarize the main points
+        """, 3),
+    'compare': ("""
+        Based on the provided context, please compare the items mentioned in: {query}
+        
+        Your comparison should:
+        1. Identify the items being compared
+        2. List key characteristics of each
+        3. Highlight similarities and differences
+        4. Present the comparison in a structured format
+        5. Provide a balanced analysis
+        """, 3),
+    'analyze': ("""
+        Based on the provided context, please analyze: {query}
+        
+        Your analysis should:
+        1. Break down the subject into components
+        2. Evaluate each component systematically
+        3. Identify patterns, trends, or relationships
+        4. Provide evidence from the context
+        5. Synthesize findings into coherent conclusions
+        """, 5),
+    'solve': ("""
+        Based on the provided context, please solve: {query}
+        
+        Your solution should:
+        1. Clearly state the problem
+        2. Identify the appropriate method or approach
+        3. Show step-by-step solution process
+        4. Verify the result
+        5. Explain the reasoning behind each step
+        """, 3),
+    'general': ("""
+        Please answer the following question: {query}
+        
+        Your response should:
+        1. Be accurate and based on the provided context
+        2. Be comprehensive and well-structured
+        3. Address all aspects of the question
+        4. Be clear and easy to understand
+        """, 3),
+}
+
+class StreamTimings:
+    """First-token and total latencies of recent streamed generations."""
+    
+    def __init__(self, max_samples: int = 1000):
+        self.first_token = deque(maxlen=max_samples)
+        self.total = deque(maxlen=max_samples)
+        self.counts = {"completed": 0, "cancelled": 0, "failed": 0}
+        self._lock = threading.Lock()
+    
+    def record(self, first_token: Optional[float], total: float, status: str):
+        with self._lock:
+            if first_token is not None:
+                self.first_token.append(first_token)
+            self.total.append(total)
+            self.counts[status] += 1
+    
+    @staticmethod
+    def _percentile(samples, q: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.counts,
+                "first_token_p50": self._percentile(self.first_token, 0.5),
+                "first_token_p95": self._percentile(self.first_token, 0.95),
+                "total_p50": self._percentile(self.total, 0.5),
+                "total_p95": self._percentile(self.total, 0.95),
+            }
+
+class _StreamRun:
+    """Bookkeeping for one streamed generation: timings and the text so far."""
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.parts: List[str] = []
+    
+    def add(self, chunk) -> str:
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. only safety metadata).
+            return ""
+        if text and self.first_token is None:
+            self.first_token = time.perf_counter() - self.start
+        self.parts.append(text)
+        return text
+    
+    def timings(self, status: str) -> Dict[str, Any]:
+        return {"status": status, "first_token_seconds": self.first_token,
+                "total_seconds": time.perf_counter() - self.start}
 
 class TaskExecutor:
     """Executor that handles calling LLMs and tools to fulfill sub-tasks."""
@@ -13,6 +132,24 @@ class TaskExecutor:
         self.model_name = model or Config.GEMINI_MODEL
         self.context_retriever = None
         self.llm = None
+        self.response_cache = None
+        self.semantic_cache = None
+        self.stream_timings = StreamTimings()
+        if Config.RESPONSE_CACHE_PATH:
+            self.response_cache = ResponseCache(
+                Config.RESPONSE_CACHE_PATH,
+                ttl_seconds=Config.RESPONSE_CACHE_TTL,
+                max_entries=Config.RESPONSE_CACHE_MAX_ENTRIES,
+            )
+        
+        # Encoding and FAISS search are blocking, so async callers run them here.
+        self._pool = ThreadPoolExecutor(max_workers=max(1, Config.ASYNC_WORKERS),
+                                        thread_name_prefix="executor")
+        
+        if Config.LLM_BACKEND == 'stub':
+            # Offline, deterministic answers for tests and load experiments.
+            self.llm = StubGenerativeModel(self.model_name, latency=Config.STUB_LLM_LATENCY)
+            return
         
         # Initialize Gemini API
         if api_key:
@@ -26,34 +163,73 @@ class TaskExecutor:
                 print("Warning: No API key provided. Set GEMINI_API_KEY in .env file or environment.")
         
         try:
-            self.llm = genai.GenerativeModel(model)
+            self.llm = genai.GenerativeModel(self.model_name)
         except Exception as e:
             print(f"Error initializing LLM: {e}")
     
     def set_context_retriever(self, retriever: ContextRetriever):
         """Set the context retriever for this executor."""
         self.context_retriever = retriever
+        if Config.SEMANTIC_CACHE_ENABLED:
+            # Reuses the retrieval model (and its query cache) to embed questions.
+            self.semantic_cache = SemanticCache(
+                retriever.memory.encode_queries,
+                threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+                max_entries=Config.SEMANTIC_CACHE_MAX_ENTRIES,
+            )
+        # Cached answers built from a reloaded or cleared document are stale.
+        retriever.add_document_listener(self._on_document_changed)
     
-    def execute_context_retrieval(self, query: str, k: int = 3) -> str:
-        """Execute context retrieval from loaded documents."""
+    def _on_document_changed(self, doc_id: Optional[str]):
+        # Semantic hits skip retrieval, so any change to the documents voids them.
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
+        if self.response_cache is None:
+            return
+        if doc_id is None:
+            self.response_cache.clear()
+        else:
+            self.response_cache.invalidate_document(doc_id)
+    
+    def clear_semantic_cache(self):
+        """Forget answers matched by meaning, e.g. after another process changed the documents."""
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return hit-rate metrics for the LLM response and semantic answer caches."""
+        stats = {"response_cache": {"enabled": False}, "semantic_cache": {"enabled": False}}
+        if self.response_cache is not None:
+            stats["response_cache"] = {"enabled": True, **self.response_cache.stats()}
+        if self.semantic_cache is not None:
+            stats["semantic_cache"] = {"enabled": True, **self.semantic_cache.stats()}
+        return stats
+    
+    def stream_stats(self) -> Dict[str, Any]:
+        """Return first-token and total latency percentiles of streamed answers."""
+        return self.stream_timings.stats()
+    
+    def _retrieve_context(self, query: str, k: int = 3, scope: Optional[Dict[str, Any]] = None) -> Tuple[str, List[str]]:
+        """Retrieve formatted context and the ids of the documents it came from.
+        
+        ``scope`` limits retrieval: keyword arguments of
+        ``get_context_with_sources`` such as ``documents`` or ``collections``.
+        """
         if not self.context_retriever:
-            return "No context retriever available."
+            return "No context retriever available.", []
         
         try:
-            context = self.context_retriever.get_context_for_query(query, k=k)
-            return context
+            return self.context_retriever.get_context_with_sources(query, k=k, **(scope or {}))
         except Exception as e:
-            return f"Error retrieving context: {e}"
+            return f"Error retrieving context: {e}", []
     
-    def execute_llm_generation(self, prompt: str, context: str = "") -> str:
-        """Execute LLM generation with optional context."""
-        if not self.llm:
-            print("test")
-            return "LLM not available. Please check API configuration."
-        
-        try:
-            # Combine context and prompt
-            full_prompt = f"""
+    def execute_context_retrieval(self, query: str, k: int = 3) -> str:
+        """Execute context retrieval from loaded documents."""
+        return self._retrieve_context(query, k=k)[0]
+    
+    def _full_prompt(self, prompt: str, context: str) -> str:
+        # Combine context and prompt
+        return f"""
             Context Information:
             {context}
             
@@ -62,118 +238,315 @@ class TaskExecutor:
             
             Please provide a clear, accurate, and helpful response based on the context provided.
             """
+    
+    def execute_llm_generation(self, prompt: str, context: str = "", task_type: str = "general",
+                               documents: Optional[List[str]] = None, question: Optional[str] = None) -> str:
+        """Execute LLM generation with optional context.
+        
+        Responses are cached by (model, task type, full prompt); ``documents``
+        are the ids the context came from, used to invalidate the entry.
+        A successful answer is also stored in the semantic cache under the
+        user's ``question``, if given.
+        """
+        if not self.llm:
+            print("test")
+            return "LLM not available. Please check API configuration."
+        
+        try:
+            full_prompt = self._full_prompt(prompt, context)
             
-            response = self.llm.generate_content(full_prompt)
+            with span("response_cache"):
+                cached = self._cached_response(full_prompt, task_type, question)
+            if cached is not None:
+                return cached
+            
+            with span("generate") as generation:
+                response = self.llm.generate_content(full_prompt)
+                generation.set(**self._token_counts(full_prompt, response))
+            self._store_response(full_prompt, task_type, response.text, documents, question)
             return response.text
         except Exception as e:
             return f"Error generating response: {e}"
     
-    def execute_explanation_task(self, query: str) -> str:
-        """Execute explanation sub-tasks."""
+    @staticmethod
+    def _token_counts(full_prompt: str, response) -> Dict[str, Any]:
+        """Prompt and response token counts, from Gemini's usage metadata when it reports them."""
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None and getattr(usage, 'prompt_token_count', None):
+            return {"prompt_tokens": usage.prompt_token_count,
+                    "response_tokens": getattr(usage, 'candidates_token_count', 0) or 0}
+        return {"prompt_tokens": estimate_tokens(full_prompt), "response_tokens": estimate_tokens(response.text),
+                "tokens_estimated": True}
+    
+    # The caches only save work: a failing lookup is treated as a miss and a failing
+    # store is skipped, so e.g. a locked SQLite file never costs the user an answer.
+    
+    def _cached_response(self, full_prompt: str, task_type: str, question: Optional[str]) -> Optional[str]:
+        if self.response_cache is None:
+            return None
+        try:
+            cached = self.response_cache.get(self.model_name, task_type, full_prompt)
+        except Exception as e:
+            print(f"⚠️  Response cache lookup failed, calling the LLM: {e}")
+            return None
+        if cached is not None:
+            self._remember_answer(question, task_type, cached)
+        return cached
+    
+    def _store_response(self, full_prompt: str, task_type: str, answer: str,
+                        documents: Optional[List[str]], question: Optional[str]):
+        if self.response_cache is not None:
+            try:
+                self.response_cache.put(self.model_name, task_type, full_prompt, answer, documents or [])
+            except Exception as e:
+                print(f"⚠️  Could not cache the response: {e}")
+        self._remember_answer(question, task_type, answer)
+    
+    def _remember_answer(self, question: Optional[str], task_type: str, answer: str):
+        if not question or self.semantic_cache is None:
+            return
+        try:
+            self.semantic_cache.store(question, task_type, answer)
+        except Exception as e:
+            print(f"⚠️  Could not store the answer in the semantic cache: {e}")
+    
+    def _task_prompt(self, task_type: str, query: str) -> Tuple[str, int]:
+        """Return the generation prompt for ``task_type`` and how many chunks to retrieve."""
+        template, k = TASK_PROMPTS.get(task_type, TASK_PROMPTS['general'])
+        return template.format(query=query), k
+    
+    def _semantic_lookup(self, query: str, task_type: str, scope: Optional[Dict[str, Any]]) -> Optional[str]:
+        # Cached answers do not record which documents they were drawn from.
+        if self.semantic_cache is None or scope is not None:
+            return None
+        try:
+            return self.semantic_cache.lookup(query, task_type)
+        except Exception as e:
+            print(f"⚠️  Semantic cache lookup failed, answering afresh: {e}")
+            return None
+    
+    def _execute_prompt_task(self, task_type: str, query: str, scope: Optional[Dict[str, Any]] = None) -> str:
         # Step 1: Retrieve relevant context
-        context = self.execute_context_retrieval(query)
-        
-        # Step 2: Generate explanation
-        explanation_prompt = f"""
-        Based on the provided context, please explain: {query}
-        
-        Your explanation should:
-        1. Be clear and easy to understand
-        2. Use the context information provided
-        3. Include key concepts and definitions
-        4. Provide examples if helpful
-        5. Summarize the main points
-        """
+        prompt, k = self._task_prompt(task_type, query)
+        with span("retrieve", k=k):
+            context, documents = self._retrieve_context(query, k=k, scope=scope)
         
-        return self.execute_llm_generation(explanation_prompt, context)
+        # Step 2: Generate the response
+        return self.execute_llm_generation(prompt, context, task_type=task_type,
+                                           documents=documents, question=query if scope is None else None)
     
-    def execute_comparison_task(self, query: str) -> str:
+    def execute_explanation_task(self, query: str, scope: Optional[Dict[str, Any]] = None) -> str:
+        """Execute explanation sub-tasks."""
+        return self._execute_prompt_task('explain', query, scope)
+    
+    def execute_comparison_task(self, query: str, scope: Optional[Dict[str, Any]] = None) -> str:
         """Execute comparison sub-tasks."""
-        # Step 1: Retrieve context for comparison
-        context = self.execute_context_retrieval(query)
-        
-        # Step 2: Generate comparison
-        comparison_prompt = f"""
-        Based on the provided context, please compare the items mentioned in: {query}
-        
-        Your comparison should:
-        1. Identify the items being compared
-        2. List key characteristics of each
-        3. Highlight similarities and differences
-        4. Present the comparison in a structured format
-        5. Provide a balanced analysis
-        """
-        
-        return self.execute_llm_generation(comparison_prompt, context)
+        return self._execute_prompt_task('compare', query, scope)
     
-    def execute_analysis_task(self, query: str) -> str:
+    def execute_analysis_task(self, query: str, scope: Optional[Dict[str, Any]] = None) -> str:
         """Execute analysis sub-tasks."""
-        # Step 1: Retrieve comprehensive context
-        context = self.execute_context_retrieval(query, k=5)  # More context for analysis
+        return self._execute_prompt_task('analyze', query, scope)
+    
+    def execute_solution_task(self, query: str, scope: Optional[Dict[str, Any]] = None) -> str:
+        """Execute problem-solving sub-tasks."""
+        return self._execute_prompt_task('solve', query, scope)
+    
+    def execute_general_task(self, query: str, scope: Optional[Dict[str, Any]] = None) -> str:
+        """Execute general query tasks."""
+        return self._execute_prompt_task('general', query, scope)
+    
+    def execute_task(self, task_type: str, query: str, scope: Optional[Dict[str, Any]] = None) -> str:
+        """Execute a specific task type, optionally retrieving only within ``scope``."""
+        # A paraphrase of an answered question skips retrieval and the LLM call.
+        with span("semantic_cache"):
+            cached = self._semantic_lookup(query, task_type, scope)
+        if cached is not None:
+            return cached
         
-        # Step 2: Generate analysis
-        analysis_prompt = f"""
-        Based on the provided context, please analyze: {query}
+        if task_type == 'explain':
+            return self.execute_explanation_task(query, scope)
+        elif task_type == 'compare':
+            return self.execute_comparison_task(query, scope)
+        elif task_type == 'analyze':
+            return self.execute_analysis_task(query, scope)
+        elif task_type == 'solve':
+            return self.execute_solution_task(query, scope)
+        else:
+            return self.execute_general_task(query, scope)
+    
+    def _finish_stream(self, run: _StreamRun, status: str, timings: Optional[Dict[str, Any]], full_prompt: str):
+        result = run.timings(status)
+        self.stream_timings.record(run.first_token, result["total_seconds"], status)
+        # The generation yields to its caller, so it is recorded once finished rather than wrapped in a span.
+        record_span("generate", result["total_seconds"], status=status, first_token_seconds=run.first_token,
+                    prompt_tokens=estimate_tokens(full_prompt), response_tokens=estimate_tokens(''.join(run.parts)),
+                    tokens_estimated=True)
+        if timings is not None:
+            timings.update(result)
+    
+    def execute_llm_generation_stream(self, prompt: str, context: str = "", task_type: str = "general",
+                                      documents: Optional[List[str]] = None, question: Optional[str] = None,
+                                      cancel: Optional[threading.Event] = None,
+                                      timings: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """Streaming variant of ``execute_llm_generation`` that yields text as it is generated.
         
-        Your analysis should:
-        1. Break down the subject into components
-        2. Evaluate each component systematically
-        3. Identify patterns, trends, or relationships
-        4. Provide evidence from the context
-        5. Synthesize findings into coherent conclusions
+        Generation stops when ``cancel`` is set or the caller closes the
+        generator. Only complete answers are cached. First-token and total
+        latencies are written into ``timings`` (if given) and aggregated in
+        ``stream_stats()``.
         """
+        if not self.llm:
+            yield "LLM not available. Please check API configuration."
+            return
         
-        return self.execute_llm_generation(analysis_prompt, context)
+        full_prompt = self._full_prompt(prompt, context)
+        cached = self._cached_response(full_prompt, task_type, question)
+        if cached is not None:
+            if timings is not None:
+                timings["status"] = "cached"
+            yield cached
+            return
+        
+        run = _StreamRun()
+        status = "cancelled"
+        try:
+            for chunk in self.llm.generate_content(full_prompt, stream=True):
+                if cancel is not None and cancel.is_set():
+                    break
+                text = run.add(chunk)
+                if text:
+                    yield text
+            else:
+                status = "completed"
+        except Exception as e:
+            status = "failed"
+            yield f"Error generating response: {e}"
+        finally:
+            self._finish_stream(run, status, timings, full_prompt)
+        if status == "completed":
+            self._store_response(full_prompt, task_type, ''.join(run.parts), documents, question)
     
-    def execute_solution_task(self, query: str) -> str:
-        """Execute problem-solving sub-tasks."""
-        # Step 1: Retrieve relevant methods/formulas
-        context = self.execute_context_retrieval(query)
+    def execute_task_stream(self, task_type: str, query: str, cancel: Optional[threading.Event] = None,
+                            timings: Optional[Dict[str, Any]] = None,
+                            scope: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """Streaming variant of ``execute_task``; yields partial answer text."""
+        with span("semantic_cache"):
+            cached = self._semantic_lookup(query, task_type, scope)
+        if cached is not None:
+            yield cached
+            return
         
-        # Step 2: Generate solution
-        solution_prompt = f"""
-        Based on the provided context, please solve: {query}
+        prompt, k = self._task_prompt(task_type, query)
+        with span("retrieve", k=k):
+            context, documents = self._retrieve_context(query, k=k, scope=scope)
+        yield from self.execute_llm_generation_stream(prompt, context, task_type=task_type, documents=documents,
+                                                      question=query if scope is None else None,
+                                                      cancel=cancel, timings=timings)
+    
+    async def _run_blocking(self, func, *args):
+        """Run ``func`` on the executor's bounded thread pool without blocking the event loop."""
+        # The caller's context goes along, so spans opened on the pool join its trace.
+        return await asyncio.get_running_loop().run_in_executor(self._pool, copy_context_call(func, *args))
+    
+    async def execute_llm_generation_async(self, prompt: str, context: str = "", task_type: str = "general",
+                                           documents: Optional[List[str]] = None,
+                                           question: Optional[str] = None) -> str:
+        """Async variant of ``execute_llm_generation`` using the async Gemini client."""
+        if not self.llm:
+            return "LLM not available. Please check API configuration."
         
-        Your solution should:
-        1. Clearly state the problem
-        2. Identify the appropriate method or approach
-        3. Show step-by-step solution process
-        4. Verify the result
-        5. Explain the reasoning behind each step
+        try:
+            full_prompt = self._full_prompt(prompt, context)
+            
+            with span("response_cache"):
+                cached = await self._run_blocking(self._cached_response, full_prompt, task_type, question)
+            if cached is not None:
+                return cached
+            
+            with span("generate") as generation:
+                response = await self.llm.generate_content_async(full_prompt)
+                generation.set(**self._token_counts(full_prompt, response))
+            await self._run_blocking(self._store_response, full_prompt, task_type, response.text,
+                                     documents, question)
+            return response.text
+        except Exception as e:
+            return f"Error generating response: {e}"
+    
+    async def execute_task_async(self, task_type: str, query: str, scope: Optional[Dict[str, Any]] = None) -> str:
+        """Async variant of ``execute_task``.
+        
+        The LLM call is awaited on the event loop; query encoding, FAISS
+        search and cache I/O run on a bounded thread pool, so many
+        questions can be in flight at once.
         """
+        with span("semantic_cache"):
+            cached = await self._run_blocking(self._semantic_lookup, query, task_type, scope)
+        if cached is not None:
+            return cached
         
-        return self.execute_llm_generation(solution_prompt, context)
+        prompt, k = self._task_prompt(task_type, query)
+        with span("retrieve", k=k):
+            context, documents = await self._run_blocking(self._retrieve_context, query, k, scope)
+        return await self.execute_llm_generation_async(prompt, context, task_type=task_type, documents=documents,
+                                                       question=query if scope is None else None)
     
-    def execute_general_task(self, query: str) -> str:
-        """Execute general query tasks."""
-        # Step 1: Retrieve context
-        context = self.execute_context_retrieval(query)
-        
-        # Step 2: Generate response
-        general_prompt = f"""
-        Please answer the following question: {query}
+    async def execute_llm_generation_stream_async(self, prompt: str, context: str = "", task_type: str = "general",
+                                                  documents: Optional[List[str]] = None,
+                                                  question: Optional[str] = None,
+                                                  cancel: Optional[asyncio.Event] = None,
+                                                  timings: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Async streaming generation; cancelling the consuming task also stops generation."""
+        if not self.llm:
+            yield "LLM not available. Please check API configuration."
+            return
         
-        Your response should:
-        1. Be accurate and based on the provided context
-        2. Be comprehensive and well-structured
-        3. Address all aspects of the question
-        4. Be clear and easy to understand
-        """
+        full_prompt = self._full_prompt(prompt, context)
+        cached = await self._run_blocking(self._cached_response, full_prompt, task_type, question)
+        if cached is not None:
+            if timings is not None:
+                timings["status"] = "cached"
+            yield cached
+            return
         
-        return self.execute_llm_generation(general_prompt, context)
+        run = _StreamRun()
+        status = "cancelled"
+        try:
+            response = await self.llm.generate_content_async(full_prompt, stream=True)
+            async for chunk in response:
+                if cancel is not None and cancel.is_set():
+                    break
+                text = run.add(chunk)
+                if text:
+                    yield text
+            else:
+                status = "completed"
+        except Exception as e:
+            status = "failed"
+            yield f"Error generating response: {e}"
+        finally:
+            self._finish_stream(run, status, timings, full_prompt)
+        if status == "completed":
+            await self._run_blocking(self._store_response, full_prompt, task_type, ''.join(run.parts),
+                                     documents, question)
     
-    def execute_task(self, task_type: str, query: str) -> str:
-        """Execute a specific task type."""
-        if task_type == 'explain':
-            return self.execute_explanation_task(query)
-        elif task_type == 'compare':
-            return self.execute_comparison_task(query)
-        elif task_type == 'analyze':
-            return self.execute_analysis_task(query)
-        elif task_type == 'solve':
-            return self.execute_solution_task(query)
-        else:
-            return self.execute_general_task(query)
+    async def execute_task_stream_async(self, task_type: str, query: str, cancel: Optional[asyncio.Event] = None,
+                                        timings: Optional[Dict[str, Any]] = None,
+                                        scope: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Async streaming variant of ``execute_task``; yields partial answer text."""
+        with span("semantic_cache"):
+            cached = await self._run_blocking(self._semantic_lookup, query, task_type, scope)
+        if cached is not None:
+            yield cached
+            return
+        
+        prompt, k = self._task_prompt(task_type, query)
+        with span("retrieve", k=k):
+            context, documents = await self._run_blocking(self._retrieve_context, query, k, scope)
+        async for text in self.execute_llm_generation_stream_async(prompt, context, task_type=task_type,
+                                                                   documents=documents,
+                                                                   question=query if scope is None else None,
+                                                                   cancel=cancel, timings=timings):
+            yield text
 
 # Convenience functions
 def create_executor(api_key: Optional[str] = None, model: str = None) -> TaskExecutor:
@@ -183,3 +556,7 @@ def create_executor(api_key: Optional[str] = None, model: str = None) -> TaskExe
 def execute_user_query(executor: TaskExecutor, task_type: str, query: str) -> str:
     """Execute a user query based on task type."""
     return executor.execute_task(task_type, query)
+
+async def execute_user_query_async(executor: TaskExecutor, task_type: str, query: str) -> str:
+    """Execute a user query based on task type without blocking the event loop."""
+    return await executor.execute_task_async(task_type, query)
@@ -0,0 +1,22 @@
+import os
+import weakref
+from typing import Callable
+
+
+def reinit_after_fork(method: Callable[[], None]):
+    """Call the bound ``method`` in every forked child for as long as its object is alive.
+
+    Objects that own threads, thread pools or SQLite connections use this
+    to rebuild them, since a forked child inherits the objects but not the
+    threads behind them (see prefork_server).
+    """
+    if not hasattr(os, 'register_at_fork'):
+        return
+    ref = weakref.WeakMethod(method)
+
+    def hook():
+        bound = ref()
+        if bound is not None:
+            bound()
+
+    os.register_at_fork(after_in_child=hook)
@@ -0,0 +1,131 @@
+import numpy as np
+from typing import Optional
+
+from .config import get_config
+from .lazy_import import lazy_import
+
+Config = get_config()
+faiss = lazy_import('faiss')
+
+INDEX_TYPES = ('flat', 'ivf_flat', 'ivf_pq', 'hnsw')
+METRICS = ('l2', 'cosine')
+VECTOR_STORAGES = ('float32', 'float16', 'int8')
+
+
+def read_index_mmap(path: str):
+    """Read a FAISS index with mmap flags, falling back to a regular read."""
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    flags |= getattr(faiss, 'IO_FLAG_MMAP_IFC', 0)
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError:
+        # Index types without mmap support in this FAISS build are read normally.
+        return faiss.read_index(path)
+
+
+def _training_sample(vectors: np.ndarray, sample_size: int) -> np.ndarray:
+    if len(vectors) <= sample_size:
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(0)
+    rows = np.sort(rng.choice(len(vectors), size=sample_size, replace=False))
+    return np.ascontiguousarray(vectors[rows], dtype=np.float32)
+
+
+def faiss_metric(metric: str) -> int:
+    """FAISS metric constant for a ``METRICS`` name; cosine is inner product on unit vectors."""
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+    return faiss.METRIC_INNER_PRODUCT if metric == 'cosine' else faiss.METRIC_L2
+
+
+def _scalar_quantizer_type(storage: str) -> Optional[int]:
+    if storage == 'float32':
+        return None
+    if storage == 'float16':
+        return faiss.ScalarQuantizer.QT_fp16
+    if storage == 'int8':
+        return faiss.ScalarQuantizer.QT_8bit
+    raise ValueError(f"Unknown vector storage '{storage}', expected one of {VECTOR_STORAGES}")
+
+
+def create_index(dimension: int, index_type: str, num_vectors: int, metric: str = 'l2',
+                 storage: str = 'float32'):
+    """Create an empty (untrained) FAISS index of the given type.
+
+    ``storage`` other than float32 keeps the vectors of flat, IVF-flat and
+    HNSW indexes as float16 or 8-bit scalar-quantised codes (2x and 4x
+    smaller). IVF-PQ is already compressed and ignores it.
+    """
+    metric_type = faiss_metric(metric)
+    sq_type = _scalar_quantizer_type(storage)
+    if index_type == 'flat':
+        if sq_type is None:
+            return faiss.IndexFlat(dimension, metric_type)
+        return faiss.IndexScalarQuantizer(dimension, sq_type, metric_type)
+    if index_type == 'hnsw':
+        if sq_type is None:
+            index = faiss.IndexHNSWFlat(dimension, Config.HNSW_M, metric_type)
+        else:
+            index = faiss.IndexHNSWSQ(dimension, sq_type, Config.HNSW_M, metric_type)
+        index.hnsw.efConstruction = Config.HNSW_EF_CONSTRUCTION
+        return index
+    # Keep roughly 39 training points per centroid, which is what FAISS asks for.
+    nlist = max(1, min(Config.IVF_NLIST, num_vectors // 39))
+    quantizer = faiss.IndexFlat(dimension, metric_type)
+    if index_type == 'ivf_flat':
+        if sq_type is None:
+            return faiss.IndexIVFFlat(quantizer, dimension, nlist, metric_type)
+        return faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, sq_type, metric_type)
+    if index_type == 'ivf_pq':
+        if dimension % Config.PQ_M != 0:
+            raise ValueError(f"PQ_M={Config.PQ_M} must divide the embedding dimension {dimension}")
+        return faiss.IndexIVFPQ(quantizer, dimension, nlist, Config.PQ_M, Config.PQ_NBITS, metric_type)
+    raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+
+
+def build_index(vectors: np.ndarray, index_type: Optional[str] = None, metric: str = 'l2',
+                storage: Optional[str] = None):
+    """Build and fill an index of ``index_type`` over ``vectors``.
+
+    IVF indexes are trained on a random sample of at most
+    ``Config.INDEX_TRAIN_SAMPLE`` vectors before all vectors are added;
+    8-bit scalar quantisers learn their value ranges the same way.
+    """
+    index_type = index_type or Config.INDEX_TYPE
+    storage = storage or Config.VECTOR_STORAGE
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = create_index(vectors.shape[1], index_type, len(vectors), metric, storage)
+    if not index.is_trained:
+        index.train(_training_sample(vectors, Config.INDEX_TRAIN_SAMPLE))
+    index.add(vectors)
+    return index
+
+
+def index_type_name(index) -> str:
+    """Return the ``INDEX_TYPES`` name that describes a FAISS index instance."""
+    if isinstance(index, faiss.IndexIVFPQ):
+        return 'ivf_pq'
+    if isinstance(index, (faiss.IndexIVFFlat, faiss.IndexIVFScalarQuantizer)):
+        return 'ivf_flat'
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    if isinstance(index, (faiss.IndexFlat, faiss.IndexScalarQuantizer)):
+        return 'flat'
+    return type(index).__name__
+
+
+def search_parameters(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None, selector=None):
+    """Return per-query FAISS search parameters for ``index``, or None for exact indexes.
+
+    ``selector`` is an optional ``faiss.IDSelector``; only ids it accepts
+    are considered during the search. The caller must keep it alive until
+    the search returns.
+    """
+    extra = {"sel": selector} if selector is not None else {}
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(nprobe=nprobe or Config.NPROBE, **extra)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=ef_search or Config.EF_SEARCH, **extra)
+    if selector is not None:
+        return faiss.SearchParameters(**extra)
+    return None
@@ -0,0 +1,316 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .chunker import Chunk, iter_token_chunks
+from .config import get_config
+from .pdf_retriever import iter_pdf_pages
+
+Config = get_config()
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+# A search that ended this recently still counts as load: readers issue the next one right away.
+_QUERY_GRACE_SECONDS = 0.05
+
+
+class QueryLoad:
+    """Tracks the searches in flight so background ingestion can make way for them."""
+
+    def __init__(self):
+        self._active = 0
+        self._last_end = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def query(self):
+        with self._lock:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._last_end = time.monotonic()
+
+    def busy(self) -> bool:
+        """True while a search is running or has just finished."""
+        with self._lock:
+            return self._active > 0 or time.monotonic() - self._last_end < _QUERY_GRACE_SECONDS
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage.
+
+    ``busy`` is time spent doing the stage's own work and ``waiting`` is
+    time blocked on an empty input queue or a full output queue. The stage
+    with the highest busy fraction is the bottleneck.
+    """
+
+    def __init__(self, name: str, unit: str, workers: int = 1):
+        self.name = name
+        self.unit = unit
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.waiting = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items: int = 0, busy: float = 0.0, waiting: float = 0.0):
+        with self._lock:
+            self.items += items
+            self.busy += busy
+            self.waiting += waiting
+
+    def busy_fraction(self, elapsed: float) -> float:
+        """Share of the run this stage's workers spent working, between 0 and 1."""
+        return self.busy / (elapsed * self.workers) if elapsed > 0 else 0.0
+
+    def as_dict(self, elapsed: float) -> Dict[str, float]:
+        return {
+            "items": self.items,
+            "unit": self.unit,
+            "workers": self.workers,
+            "busy_seconds": round(self.busy, 3),
+            "wait_seconds": round(self.waiting, 3),
+            "items_per_second": round(self.items / elapsed, 1) if elapsed > 0 else 0.0,
+            "busy_fraction": round(self.busy_fraction(elapsed), 3),
+        }
+
+
+class _Failed(Exception):
+    """Raised inside a stage when another stage has already failed."""
+
+
+class IngestionPipeline:
+    """Pipelined PDF ingestion: extract -> chunk -> encode -> write.
+
+    Each stage runs in its own thread (extraction additionally fans pages
+    out to a process pool) and stages are connected by bounded queues, so
+    the encoder keeps working while later pages are still being parsed and
+    peak memory is bounded by the queue sizes rather than by the book.
+
+    While ``query_load`` reports searches running, every stage sleeps for
+    ``query_yield`` times as long as its last unit of work took, so
+    ingestion takes at most 1 / (1 + ``query_yield``) of the CPU from the
+    readers and runs at full speed when nobody is searching.
+    """
+
+    def __init__(self, memory, max_tokens: int, overlap_tokens: int = 0,
+                 queue_size: Optional[int] = None, encode_batch_size: Optional[int] = None,
+                 encode_workers: Optional[int] = None, write_batch_size: Optional[int] = None,
+                 extract_workers: Optional[int] = None, query_load: Optional[QueryLoad] = None,
+                 query_yield: Optional[float] = None):
+        self.memory = memory
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.queue_size = queue_size or Config.INGEST_QUEUE_SIZE
+        self.encode_batch_size = encode_batch_size or Config.ENCODE_BATCH_SIZE
+        self.encode_workers = max(1, encode_workers or Config.ENCODE_WORKERS)
+        self.write_batch_size = write_batch_size or Config.WRITE_BATCH_SIZE
+        self.extract_workers = extract_workers
+        self.query_load = query_load
+        self.query_yield = Config.INGEST_QUERY_YIELD if query_yield is None else query_yield
+        self.stats: Dict[str, StageStats] = {}
+        self.elapsed = 0.0
+
+    def _put(self, q: queue.Queue, item, stats: StageStats):
+        start = time.perf_counter()
+        while True:
+            if self._failed.is_set():
+                raise _Failed()
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        stats.add(waiting=time.perf_counter() - start)
+
+    def _get(self, q: queue.Queue, stats: StageStats):
+        start = time.perf_counter()
+        while True:
+            if self._failed.is_set():
+                raise _Failed()
+            try:
+                item = q.get(timeout=_POLL_SECONDS)
+                break
+            except queue.Empty:
+                continue
+        stats.add(waiting=time.perf_counter() - start)
+        return item
+
+    def _yield_to_queries(self, stats: StageStats, busy: float):
+        """Back off for a multiple of ``busy`` while searches are running."""
+        if self.query_load is None or self.query_yield <= 0 or busy <= 0 or not self.query_load.busy():
+            return
+        pause = busy * self.query_yield
+        time.sleep(pause)
+        stats.add(waiting=pause)
+
+    def _run_stage(self, target, *args):
+        try:
+            target(*args)
+        except _Failed:
+            pass
+        except BaseException as e:
+            if self._error is None:
+                self._error = e
+            self._failed.set()
+
+    def _extract(self, pdf_path: str, pages_out: queue.Queue):
+        stats = self.stats["extract"]
+        pages = iter_pdf_pages(pdf_path, workers=self.extract_workers)
+        try:
+            while True:
+                start = time.perf_counter()
+                page = next(pages, _DONE)
+                busy = time.perf_counter() - start
+                stats.add(busy=busy)
+                if page is _DONE:
+                    break
+                self._yield_to_queries(stats, busy)
+                self._put(pages_out, page, stats)
+                stats.add(items=1)
+        finally:
+            # Shuts the extraction process pool down if another stage failed.
+            pages.close()
+        self._put(pages_out, _DONE, stats)
+
+    def _chunk(self, pages_in: queue.Queue, batches_out: queue.Queue):
+        stats = self.stats["chunk"]
+
+        def pages() -> Iterator:
+            while True:
+                page = self._get(pages_in, stats)
+                if page is _DONE:
+                    return
+                yield page
+
+        # Batches are numbered so the writer can restore their order after parallel encoders.
+        batch: List[Chunk] = []
+        sequence = 0
+        start = time.perf_counter()
+        blocked = stats.waiting
+        for chunk in iter_token_chunks(pages(), self.memory.tokenizer, self.max_tokens, self.overlap_tokens):
+            batch.append(chunk)
+            if len(batch) >= self.encode_batch_size:
+                busy = time.perf_counter() - start - (stats.waiting - blocked)
+                stats.add(items=len(batch), busy=busy)
+                self._yield_to_queries(stats, busy)
+                self._put(batches_out, (sequence, batch), stats)
+                batch, sequence = [], sequence + 1
+                start, blocked = time.perf_counter(), stats.waiting
+        stats.add(items=len(batch), busy=time.perf_counter() - start - (stats.waiting - blocked))
+        if batch:
+            self._put(batches_out, (sequence, batch), stats)
+        for _ in range(self.encode_workers):
+            self._put(batches_out, _DONE, stats)
+
+    def _encode(self, batches_in: queue.Queue, encoded_out: queue.Queue):
+        stats = self.stats["encode"]
+        while True:
+            item = self._get(batches_in, stats)
+            if item is _DONE:
+                break
+            sequence, batch = item
+            start = time.perf_counter()
+            embeddings = self.memory.encode([chunk.text for chunk in batch])
+            busy = time.perf_counter() - start
+            stats.add(items=len(batch), busy=busy)
+            self._yield_to_queries(stats, busy)
+            self._put(encoded_out, (sequence, batch, embeddings), stats)
+        self._put(encoded_out, _DONE, stats)
+
+    def _write(self, encoded_in: queue.Queue, doc_id: Optional[str]) -> int:
+        """Append encoded chunks to memory, in document order, in segments of about ``write_batch_size`` rows."""
+        stats = self.stats["write"]
+        pending: List[Chunk] = []
+        pending_vectors: List[np.ndarray] = []
+        # Batches that finished encoding ahead of an earlier one, by sequence number.
+        early: Dict[int, tuple] = {}
+        next_sequence = 0
+        finished, total = 0, 0
+
+        def flush():
+            start = time.perf_counter()
+            self.memory.add_embeddings(
+                [chunk.text for chunk in pending], np.vstack(pending_vectors), doc_id=doc_id,
+                pages=[(chunk.page_start, chunk.page_end) for chunk in pending],
+            )
+            busy = time.perf_counter() - start
+            stats.add(items=len(pending), busy=busy)
+            self._yield_to_queries(stats, busy)
+
+        while finished < self.encode_workers:
+            item = self._get(encoded_in, stats)
+            if item is _DONE:
+                finished += 1
+                continue
+            sequence, batch, embeddings = item
+            early[sequence] = (batch, embeddings)
+            while next_sequence in early:
+                batch, embeddings = early.pop(next_sequence)
+                next_sequence += 1
+                pending.extend(batch)
+                pending_vectors.append(embeddings)
+                total += len(batch)
+                if len(pending) >= self.write_batch_size:
+                    flush()
+                    pending, pending_vectors = [], []
+        if pending:
+            flush()
+        return total
+
+    def run(self, pdf_path: str, doc_id: Optional[str] = None) -> int:
+        """Ingest ``pdf_path`` into memory and return the number of chunks written."""
+        self.stats = {
+            "extract": StageStats("extract", "pages"),
+            "chunk": StageStats("chunk", "chunks"),
+            "encode": StageStats("encode", "chunks", self.encode_workers),
+            "write": StageStats("write", "chunks"),
+        }
+        self._failed = threading.Event()
+        self._error: Optional[BaseException] = None
+        pages = queue.Queue(maxsize=self.queue_size)
+        batches = queue.Queue(maxsize=max(1, self.queue_size // self.encode_batch_size) + self.encode_workers)
+        encoded = queue.Queue(maxsize=max(1, self.queue_size // self.encode_batch_size) + self.encode_workers)
+
+        threads = [
+            threading.Thread(target=self._run_stage, args=(self._extract, pdf_path, pages), daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._chunk, pages, batches), daemon=True),
+        ]
+        threads += [
+            threading.Thread(target=self._run_stage, args=(self._encode, batches, encoded), daemon=True)
+            for _ in range(self.encode_workers)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        total = 0
+        try:
+            total = self._write(encoded, doc_id)
+        except _Failed:
+            pass
+        except BaseException as e:
+            self._error = self._error or e
+            self._failed.set()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - start
+        if self._error is not None:
+            raise self._error
+        return total
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Return per-stage throughput counters for the last run."""
+        return {name: stats.as_dict(self.elapsed) for name, stats in self.stats.items()}
+
+    def bottleneck(self) -> Optional[str]:
+        """Return the name of the stage that was busy for the largest share of the run."""
+        if not self.stats:
+            return None
+        return max(self.stats.values(), key=lambda stats: stats.busy_fraction(self.elapsed)).name
@@ -0,0 +1,37 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    Keeps heavy dependencies (faiss, sentence-transformers, the Gemini SDK)
+    out of ``import src.agent`` so the agent starts quickly; the cost is
+    paid by whichever thread touches the module first, usually warm-up.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+                module = self._module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a proxy for module ``name`` that defers the import until it is used."""
+    return LazyModule(name)
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+# Files written next to each segment, after its vectors and text. ".terms.json" is the
+# JSON term dictionary of older segments, listed so it is removed along with them.
+LEXICAL_SUFFIXES = (".postings.npy", ".lengths.npy", ".term_hashes.npy", ".term_starts.npy", ".lexical.json",
+                    ".terms.json")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into case-folded word tokens; digits are kept, so "H2O" and "m2" survive."""
+    return _TOKEN.findall(text.casefold())
+
+
+def term_hash(term: str) -> int:
+    """Stable 64-bit id of ``term``, the same in every process."""
+    return int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class Postings:
+    """Inverted index over the chunks of one segment.
+
+    Terms are stored by ``term_hash``: ``term_hashes`` is the sorted array
+    of hashes and ``term_starts`` (one entry longer) gives the slice of
+    ``postings`` each one owns, an (n, 2) int32 array of (row, term
+    frequency) pairs sorted by row. ``lengths`` holds the token count of
+    every row. All four arrays are memory-mapped when loaded, so opening a
+    segment reads no term dictionary and a lookup is a binary search plus
+    the postings of the query terms. Two terms of one segment sharing a
+    64-bit hash is not a practical concern.
+    """
+
+    def __init__(self, term_hashes: np.ndarray, term_starts: np.ndarray, postings: np.ndarray,
+                 lengths: np.ndarray, total_length: int):
+        self.term_hashes = term_hashes
+        self.term_starts = term_starts
+        self.postings = postings
+        self.lengths = lengths
+        self.total_length = total_length
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @classmethod
+    def build(cls, texts: Sequence[str]) -> "Postings":
+        rows_by_term: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        lengths = np.zeros(len(texts), dtype=np.int32)
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[row] = sum(counts.values())
+            for term, tf in counts.items():
+                rows_by_term[term].append((row, tf))
+        hashed = sorted((term_hash(term), entries) for term, entries in rows_by_term.items())
+        term_hashes = np.array([h for h, _ in hashed], dtype=np.uint64)
+        term_starts = np.zeros(len(hashed) + 1, dtype=np.int64)
+        term_starts[1:] = np.cumsum([len(entries) for _, entries in hashed])
+        postings = np.array([pair for _, entries in hashed for pair in entries], dtype=np.int32).reshape(-1, 2)
+        return cls(term_hashes, term_starts, postings, lengths, int(lengths.sum()))
+
+    @staticmethod
+    def exists(base_path: str) -> bool:
+        # The summary is written last, so its presence means the arrays are complete.
+        return os.path.exists(base_path + ".lexical.json")
+
+    @classmethod
+    def load(cls, base_path: str) -> "Postings":
+        arrays = [np.load(base_path + suffix, mmap_mode='r')
+                  for suffix in (".term_hashes.npy", ".term_starts.npy", ".postings.npy", ".lengths.npy")]
+        with open(base_path + ".lexical.json", 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return cls(*arrays, meta["total_length"])
+
+    def save(self, base_path: str):
+        """Write the index next to a segment; each file is renamed into place atomically."""
+        tmp = f".{os.getpid()}.tmp"
+
+        def write(suffix: str, dump):
+            path = base_path + suffix
+            with open(path + tmp, 'wb') as f:
+                dump(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + tmp, path)
+
+        for suffix, array in ((".term_hashes.npy", self.term_hashes), (".term_starts.npy", self.term_starts),
+                              (".postings.npy", self.postings), (".lengths.npy", self.lengths)):
+            write(suffix, lambda f: np.save(f, np.ascontiguousarray(array)))
+        write(".lexical.json", lambda f: f.write(json.dumps(
+            {"total_length": self.total_length, "terms": len(self.term_hashes)}).encode('utf-8')))
+
+    def lookup(self, term: str) -> Optional[np.ndarray]:
+        """Return the (row, tf) pairs of ``term``, or None if it does not occur."""
+        key = np.uint64(term_hash(term))
+        i = int(np.searchsorted(self.term_hashes, key))
+        if i == len(self.term_hashes) or self.term_hashes[i] != key:
+            return None
+        return self.postings[int(self.term_starts[i]):int(self.term_starts[i + 1])]
+
+
+def _restrict(pairs: np.ndarray, ranges: List[Tuple[int, int]]) -> np.ndarray:
+    # Postings are sorted by row, so each range is one binary-searched slice.
+    rows = pairs[:, 0]
+    parts = [pairs[np.searchsorted(rows, start):np.searchsorted(rows, end)] for start, end in ranges]
+    return np.concatenate(parts) if parts else pairs[:0]
+
+
+def bm25_search(postings: List[Postings], query: str, k: int, k1: float = 1.2, b: float = 0.75,
+                ranges: Optional[List[Optional[List[Tuple[int, int]]]]] = None) -> List[Tuple[int, int, float]]:
+    """Score chunks against ``query`` with Okapi BM25 across several segments.
+
+    Collection statistics (chunk count, average length, document
+    frequencies) are summed over all segments so scores are comparable
+    between them. ``ranges`` optionally gives, per segment, the [start,
+    end) rows that may be returned (None for all of them). Returns up to
+    ``k`` (segment position, row, score) triples, best first.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    total_chunks = sum(len(p) for p in postings)
+    if not terms or total_chunks == 0:
+        return []
+    avg_length = max(sum(p.total_length for p in postings) / total_chunks, 1e-9)
+
+    matches = [[p.lookup(term) for term in terms] for p in postings]
+    idf = []
+    for t in range(len(terms)):
+        df = sum(len(m[t]) for m in matches if m[t] is not None)
+        idf.append(math.log(1.0 + (total_chunks - df + 0.5) / (df + 0.5)))
+
+    candidates = []
+    for position, (segment_postings, segment_matches) in enumerate(zip(postings, matches)):
+        segment_ranges = ranges[position] if ranges is not None else None
+        rows, scores = [], []
+        for t, pairs in enumerate(segment_matches):
+            if pairs is None:
+                continue
+            if segment_ranges is not None:
+                pairs = _restrict(pairs, segment_ranges)
+            row, tf = pairs[:, 0], pairs[:, 1].astype(np.float64)
+            norm = k1 * (1.0 - b + b * segment_postings.lengths[row] / avg_length)
+            rows.append(row)
+            scores.append(idf[t] * tf * (k1 + 1.0) / (tf + norm))
+        if not rows:
+            continue
+        # Sum the per-term contributions of rows that match several terms.
+        unique_rows, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(scores))
+        top = np.argsort(-totals, kind='stable')[:k]
+        candidates.extend((position, int(unique_rows[i]), float(totals[i])) for i in top)
+
+    candidates.sort(key=lambda candidate: -candidate[2])
+    return candidates[:k]
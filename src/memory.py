@@ -1,64 +1,401 @@
-import faiss
-from sentence_transformers import SentenceTransformer
+import atexit
 import numpy as np
 import os
 import pickle
-from typing import List, Tuple
+import threading
+from typing import Collection, List, NamedTuple, Optional, Sequence, Tuple, Union
 
 from .config import get_config
+from .embedding_cache import EmbeddingCache, QueryEmbeddingCache, encode_queries, encode_with_cache
+from .encoder_service import INGEST, QUERY, EncoderService
+from .index_factory import METRICS, build_index, read_index_mmap
+from .lazy_import import lazy_import
+from .lexical_index import bm25_search
+from .segment_store import Segment, SegmentStore
+from .stub_embedder import STUB_EMBEDDING_MODEL, StubSentenceTransformer
 
 Config = get_config()
+faiss = lazy_import('faiss')
+sentence_transformers = lazy_import('sentence_transformers')
+
+# Document id of chunks imported from a pre-segment index, which did not record their source.
+LEGACY_DOCUMENT = "legacy-index"
+
+
+class SearchHit(NamedTuple):
+    """A search result with the document, pages and position the chunk came from.
+
+    ``vector`` is the chunk's stored embedding (a view of the memory-mapped
+    segment), so callers can compare hits without re-encoding them.
+    """
+    text: str
+    distance: float
+    doc_id: Optional[str]
+    page_start: int
+    page_end: int
+    chunk_index: int = -1
+    vector: Optional[np.ndarray] = None
+    metric: str = 'l2'
+
+
+def hit_similarity(distance: float, metric: str) -> float:
+    """Similarity in (0, 1] for an L2 distance, or the cosine similarity for a cosine-metric distance."""
+    if metric == 'cosine':
+        # Quantised codes can land marginally outside [-1, 1].
+        return min(1.0, max(-1.0, 1.0 - distance))
+    return 1.0 / (1.0 + distance)
+
+
+class ChunkView(Sequence):
+    """Lazy, read-only list of the live chunk texts across all segments (deleted rows are skipped)."""
+
+    def __init__(self, segments: List[Segment]):
+        # Runs of live rows as (segment, first row) pairs, and where each run starts in the view.
+        self._runs: List[Tuple[Segment, int]] = []
+        lengths = []
+        for segment in segments:
+            ranges = segment.allowed_ranges()
+            for start, end in ([(0, len(segment))] if ranges is None else ranges):
+                self._runs.append((segment, start))
+                lengths.append(end - start)
+        self._starts = np.cumsum([0] + lengths)
+
+    def __len__(self) -> int:
+        return int(self._starts[-1])
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("chunk index out of range")
+        run = int(np.searchsorted(self._starts, idx, side='right')) - 1
+        segment, first = self._runs[run]
+        return segment.text(first + idx - int(self._starts[run]))
+
 
 class VectorMemory:
-    def __init__(self, model_name=None, index_path=None, meta_path=None):
+    def __init__(self, model_name=None, index_path=None, meta_path=None, store_dir=None,
+                 encoder: Optional["VectorMemory"] = None):
         # Use config values if not provided
-        self.model_name = model_name or Config.EMBEDDING_MODEL
+        self.model_name = model_name or (encoder.model_name if encoder else Config.EMBEDDING_MODEL)
+        if Config.EMBEDDING_BACKEND == 'stub' and encoder is None:
+            # Stub vectors must never be mistaken for (or cached as) the real model's.
+            self.model_name = STUB_EMBEDDING_MODEL
         self.index_path = index_path or Config.FAISS_INDEX_PATH
         self.meta_path = meta_path or Config.CHUNK_METADATA_PATH
-        self.model = SentenceTransformer(self.model_name)
-        self.chunks = []  # List of text chunks
-        self.index = None
+        self.store_dir = store_dir or Config.MEMORY_STORE_DIR
+        # Memories sharing an ``encoder`` reuse its model and embedding caches.
+        self._encoder = encoder
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.embedding_cache = None
+        self.query_cache = None
+        self.passage_cache = None
+        self.encoder_service = None
+        if encoder is not None:
+            self.embedding_cache = encoder.embedding_cache
+            self.query_cache = encoder.query_cache
+            self.passage_cache = encoder.passage_cache
+            self.encoder_service = encoder.encoder_service
+        else:
+            if Config.ENCODER_BATCHING:
+                # Concurrent encodes (queries and ingestion) share micro-batches on one model.
+                self.encoder_service = EncoderService(lambda: self.model)
+            if Config.QUERY_CACHE_SIZE > 0:
+                # Looked up before the encoder: only cache misses reach the model or its service.
+                self.query_cache = QueryEmbeddingCache(
+                    self.model_name, max_entries=Config.QUERY_CACHE_SIZE, path=Config.QUERY_CACHE_PATH or None
+                )
+                atexit.register(self.query_cache.save)
+                # Sentences embedded while packing context; kept in memory only, never persisted.
+                self.passage_cache = QueryEmbeddingCache(self.model_name, max_entries=Config.QUERY_CACHE_SIZE)
+        if Config.EMBEDDING_CACHE_PATH and encoder is None:
+            self.embedding_cache = EmbeddingCache(
+                Config.EMBEDDING_CACHE_PATH, max_entries=Config.EMBEDDING_CACHE_MAX_ENTRIES
+            )
+        self.store = SegmentStore(
+            self.store_dir,
+            max_segments=Config.MAX_SEGMENTS,
+            merge_factor=Config.SEGMENT_MERGE_FACTOR,
+            index_builder=self._build_segment_index,
+            metric=Config.METRIC,
+        )
         self.dimension = None
         self._load()
 
     def _load(self):
-        if os.path.exists(self.meta_path):
-            with open(self.meta_path, 'rb') as f:
-                self.chunks = pickle.load(f)
-        if os.path.exists(self.index_path):
-            self.index = faiss.read_index(self.index_path)
-            self.dimension = self.index.d
-
-    def _save(self):
-        if self.index is not None:
-            faiss.write_index(self.index, self.index_path)
-        with open(self.meta_path, 'wb') as f:
-            pickle.dump(self.chunks, f)
-
-    def add_chunks(self, chunks: List[str]):
-        embeddings = self.model.encode(chunks, convert_to_numpy=True)
-        if self.index is None:
-            self.dimension = embeddings.shape[1]
-            self.index = faiss.IndexFlatL2(self.dimension)
-        self.index.add(embeddings)
-        self.chunks.extend(chunks)
-        self._save()
-
-    def search(self, query: str, k: int = 3) -> List[Tuple[str, float]]:
-        if self.index is None or len(self.chunks) == 0:
-            return []
-        query_embedding = self.model.encode([query], convert_to_numpy=True)
-        D, I = self.index.search(query_embedding, k)
+        # Segments are memory-mapped on first use, so nothing is read eagerly here.
+        if not self.store.exists():
+            self._import_legacy()
+        self.dimension = self.store.dimension
+        if self.store.exists() and self.metric != Config.METRIC:
+            print(f"Memory store {self.store_dir} uses the {self.metric} metric, not METRIC={Config.METRIC}; "
+                  f"call migrate_index(metric='{Config.METRIC}') to convert it")
+
+    def _import_legacy(self):
+        """Convert a single-file index written by older versions into a segment."""
+        if not (os.path.exists(self.index_path) and os.path.exists(self.meta_path)):
+            return
+        legacy_index = read_index_mmap(self.index_path)
+        with open(self.meta_path, 'rb') as f:
+            legacy_chunks = pickle.load(f)
+        if legacy_index.ntotal == 0 or legacy_index.ntotal != len(legacy_chunks):
+            print(f"Skipping legacy index {self.index_path}: index and chunk metadata do not match")
+            return
+        vectors = legacy_index.reconstruct_n(0, legacy_index.ntotal)
+        # The legacy metadata does not say which PDF a chunk came from; the rows are tagged so
+        # they can be removed, and the next ingest replaces them (see ContextRetriever._load_pdf).
+        self.store.append(self._prepare_vectors(vectors), legacy_chunks, doc_id=LEGACY_DOCUMENT)
+        print(f"Imported {len(legacy_chunks)} chunks from legacy index {self.index_path}")
+
+    @property
+    def metric(self) -> str:
+        """'l2' or 'cosine'; fixed per store when it is first written."""
+        return self.store.metric
+
+    def _prepare_vectors(self, vectors: np.ndarray) -> np.ndarray:
+        # Cosine similarity is inner product between unit-length vectors.
+        vectors = np.array(vectors, dtype=np.float32)
+        if self.metric == 'cosine':
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    @staticmethod
+    def _index_for(vectors: np.ndarray, index_type: str, metric: str, storage: str):
+        # Exact float32 segments need no index: the mmapped vectors are searched directly.
+        if index_type == 'flat' and storage == 'float32':
+            return None
+        return build_index(vectors, index_type, metric=metric, storage=storage)
+
+    def _build_segment_index(self, vectors: np.ndarray, index_type: Optional[str] = None):
+        """Seal merged segments with the configured approximate index and vector storage."""
+        index_type = index_type or Config.INDEX_TYPE
+        if len(vectors) < Config.ANN_MIN_SEGMENT_SIZE:
+            # Too small for an approximate index to pay off; may still be quantised.
+            index_type = 'flat'
+        return self._index_for(vectors, index_type, self.metric, Config.VECTOR_STORAGE)
+
+    def migrate_index(self, index_type: Optional[str] = None, metric: Optional[str] = None,
+                      storage: Optional[str] = None):
+        """Rebuild the whole store as one segment sealed with ``index_type``.
+
+        The exact vectors kept in every segment are the migration source, so
+        a store built with the default flat index can move to IVF or HNSW,
+        to the cosine metric or to float16/int8 storage without re-encoding
+        any chunk.
+        """
+        index_type = index_type or Config.INDEX_TYPE
+        metric = metric or self.metric
+        storage = storage or Config.VECTOR_STORAGE
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+        self.store.rebuild(lambda vectors: self._index_for(vectors, index_type, metric, storage), metric=metric)
+
+    @property
+    def model(self):
+        """The embedding model, loaded on first use."""
+        if self._encoder is not None:
+            return self._encoder.model
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None and Config.EMBEDDING_BACKEND == 'stub':
+                    self._model = StubSentenceTransformer(self.model_name)
+                elif self._model is None:
+                    self._model = sentence_transformers.SentenceTransformer(self.model_name)
+        return self._model
+
+    def warm_up(self):
+        """Load the embedding model and page in every segment so the first query is fast."""
+        vector = self.model.encode(["warm up"], convert_to_numpy=True).astype(np.float32)
+        for segment in self.store.open_segments():
+            segment.search(vector, 1)
+
+    @property
+    def chunks(self) -> ChunkView:
+        return ChunkView(self.store.open_segments())
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    @property
+    def tokenizer(self):
+        """The embedding model's tokenizer, used to size chunks in tokens."""
+        return self.model.tokenizer
+
+    @property
+    def max_tokens(self) -> int:
+        """Number of word-piece tokens the model embeds, excluding [CLS]/[SEP]."""
+        return self.model.max_seq_length - 2
+
+    def _encoder_for(self, priority: str):
+        if self.encoder_service is None:
+            return self.model
+        return self.encoder_service.client(priority)
+
+    def encode(self, chunks: List[str]) -> np.ndarray:
+        """Embed chunks, reading those embedded before (by this model) from the cache."""
+        return encode_with_cache(self._encoder_for(INGEST), self.model_name, chunks, self.embedding_cache)
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Run the model on queries; repeated questions are served from the LRU cache."""
+        return encode_queries(self._encoder_for(QUERY), queries, self.query_cache)
+
+    def embed_passages(self, passages: List[str]) -> np.ndarray:
+        """Embed text needed to answer a query (e.g. sentences of retrieved chunks) at query priority.
+
+        Repeats are served from an in-memory LRU; the persistent embedding
+        cache is left to ingested chunks.
+        """
+        return encode_queries(self._encoder_for(QUERY), passages, self.passage_cache)
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries and prepare them for this store's metric."""
+        return self._prepare_vectors(self.embed_queries(queries))
+
+    def add_embeddings(self, chunks: List[str], embeddings: np.ndarray, doc_id: Optional[str] = None,
+                       pages: Optional[List[Tuple[int, int]]] = None):
+        """Append chunks whose embeddings were computed with ``encode``.
+        
+        Chunks added under a ``doc_id`` are numbered after those the
+        document already has, so a document may be added in batches.
+        """
+        if not chunks:
+            return
+        # Only the new chunks are written to disk; earlier segments are untouched.
+        embeddings = self._prepare_vectors(embeddings)
+        chunk_index = None
+        if doc_id is not None:
+            first = self.store.document_size(doc_id)
+            chunk_index = np.arange(first, first + len(chunks), dtype=np.int32)
+        self.store.append(embeddings, chunks, doc_id=doc_id,
+                          pages=np.asarray(pages, dtype=np.int32) if pages is not None else None,
+                          chunk_index=chunk_index)
+        self.dimension = embeddings.shape[1]
+
+    def add_chunks(self, chunks: List[str], doc_id: Optional[str] = None,
+                   pages: Optional[List[Tuple[int, int]]] = None):
+        if not chunks:
+            return
+        self.add_embeddings(chunks, self.encode(chunks), doc_id=doc_id, pages=pages)
+
+    def staged(self, replaces: Union[str, Sequence[str], None] = None):
+        """Context manager publishing this thread's additions in one atomic swap; see ``SegmentStore.stage``."""
+        return self.store.stage(replaces)
+
+    def remove_document(self, doc_id: str) -> int:
+        """Remove all chunks that were added with ``doc_id``; other documents are not re-embedded."""
+        return self.store.remove_document(doc_id)
+
+    def document_ids(self) -> List[str]:
+        """Return the ids of documents with chunks in memory."""
+        return self.store.document_ids()
+
+    def search(self, query: str, k: int = 3, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+               documents: Optional[Collection[str]] = None) -> List[Tuple[str, float]]:
+        hits = self.search_hits(query, k, nprobe=nprobe, ef_search=ef_search, documents=documents)
+        return [(hit.text, hit.distance) for hit in hits]
+
+    def search_hits(self, query: str, k: int = 3, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                    documents: Optional[Collection[str]] = None) -> List[SearchHit]:
+        """Like ``search``, but each result also carries its document and page span."""
+        return self.search_hits_batch([query], k, nprobe=nprobe, ef_search=ef_search, documents=documents)[0]
+
+    def search_batch(self, queries: List[str], k: int = 3, nprobe: Optional[int] = None,
+                     ef_search: Optional[int] = None,
+                     documents: Optional[Collection[str]] = None) -> List[List[Tuple[str, float]]]:
+        """Search for many queries at once; results are returned in query order."""
+        return [
+            [(hit.text, hit.distance) for hit in hits]
+            for hits in self.search_hits_batch(queries, k, nprobe=nprobe, ef_search=ef_search, documents=documents)
+        ]
+
+    def search_hits_batch(self, queries: List[str], k: int = 3, nprobe: Optional[int] = None,
+                          ef_search: Optional[int] = None,
+                          documents: Optional[Collection[str]] = None) -> List[List[SearchHit]]:
+        """Encode all queries in one model call and search every segment once with the query matrix.
+        
+        ``documents`` limits the results to chunks of those document ids.
+        Segments without them are skipped and the rest only search their
+        rows, so a scoped query costs time proportional to those documents.
+        """
+        if not queries or not len(self.store):
+            return [[] for _ in queries]
+        return self.search_hits_by_embeddings(self.embed_queries(queries), k, nprobe=nprobe,
+                                              ef_search=ef_search, documents=documents)
+
+    def search_hits_by_embeddings(self, embeddings: np.ndarray, k: int = 3, nprobe: Optional[int] = None,
+                                  ef_search: Optional[int] = None,
+                                  documents: Optional[Collection[str]] = None) -> List[List[SearchHit]]:
+        """Search with query vectors from ``embed_queries``, one result list per row."""
+        segments = self.store.open_segments()
+        doc_filter = set(documents) if documents is not None else None
+        selected = [(position, segment, segment.allowed_ranges(doc_filter))
+                    for position, segment in enumerate(segments)]
+        selected = [entry for entry in selected if entry[2] is None or entry[2]]
+        if not selected:
+            return [[] for _ in range(len(embeddings))]
+        query_embeddings = self._prepare_vectors(embeddings)
+        distances, rows, owners = [], [], []
+        for position, segment, ranges in selected:
+            D, I = segment.search(query_embeddings, k, nprobe, ef_search, ranges)
+            distances.append(D)
+            rows.append(I)
+            owners.append(np.full(I.shape, position))
+        D, I, S = np.hstack(distances), np.hstack(rows), np.hstack(owners)
+        D = np.where(I >= 0, D, np.inf)
+        # Merge the per-segment top-k lists of every query in one vectorised sort.
+        order = np.argsort(D, axis=1, kind='stable')[:, :k]
+        D = np.take_along_axis(D, order, axis=1)
+        I = np.take_along_axis(I, order, axis=1)
+        S = np.take_along_axis(S, order, axis=1)
+
         results = []
-        for idx, dist in zip(I[0], D[0]):
-            if idx < len(self.chunks):
-                results.append((self.chunks[idx], dist))
+        for q in range(len(query_embeddings)):
+            hits = []
+            for dist, row, position in zip(D[q], I[q], S[q]):
+                if not np.isfinite(dist):
+                    break
+                # Only the top-k hits are ever decoded from the text blobs.
+                hits.append(self._hit(segments[position], int(row), dist))
+            results.append(hits)
         return results
 
+    def search_hits_lexical(self, query: str, k: int = 3,
+                            documents: Optional[Collection[str]] = None) -> List[SearchHit]:
+        """Rank chunks by BM25 over the segments' inverted indexes.
+
+        Only the postings of the query terms are read. ``distance`` holds
+        the negated BM25 score, so smaller is better as for vector hits.
+        ``documents`` limits the results to chunks of those document ids.
+        """
+        segments = self.store.open_segments()
+        doc_filter = set(documents) if documents is not None else None
+        ranked = bm25_search([segment.postings for segment in segments], query, k,
+                             k1=Config.BM25_K1, b=Config.BM25_B,
+                             ranges=[segment.allowed_ranges(doc_filter) for segment in segments])
+        return [self._hit(segments[position], row, -score) for position, row, score in ranked]
+
+    def _hit(self, segment: Segment, row: int, distance: float) -> SearchHit:
+        return SearchHit(segment.text(row), float(distance), segment.doc_id(row),
+                         int(segment.pages[row][0]), int(segment.pages[row][1]), segment.chunk_position(row),
+                         segment.vectors[row], segment.metric)
+
+    def refresh(self) -> bool:
+        """Pick up segments another process has published to this store; True if any changed."""
+        changed = self.store.refresh()
+        self.dimension = self.store.dimension
+        return changed
+
+    def close(self):
+        """Release the memory-mapped segments; the store can be reopened later."""
+        self.store.close()
+
     def clear(self):
-        self.chunks = []
-        self.index = None
+        self.dimension = None
+        self.store.clear()
         if os.path.exists(self.index_path):
             os.remove(self.index_path)
         if os.path.exists(self.meta_path):
-            os.remove(self.meta_path) 
\ No newline at end of file
+            os.remove(self.meta_path)
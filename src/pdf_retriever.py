@@ -1,16 +1,91 @@
+import multiprocessing
 import os
-from typing import List
-import PyPDF2
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .config import get_config
+from .lazy_import import lazy_import
+
+Config = get_config()
+PyPDF2 = lazy_import('PyPDF2')
+
+# One open reader per (path, mtime) in each extraction worker process, so a
+# worker does not re-parse the PDF's cross-reference table for every batch.
+# None outside the workers: there a reader lives only as long as one
+# iter_pdf_pages call and the parent never keeps a parsed book around.
+_worker_readers: Optional[Dict[Tuple[str, float], "PyPDF2.PdfReader"]] = None
+
+
+def _init_worker():
+    global _worker_readers
+    _worker_readers = {}
+
+
+def _get_reader(pdf_path: str) -> "PyPDF2.PdfReader":
+    if _worker_readers is None:
+        return PyPDF2.PdfReader(pdf_path)
+    key = (os.path.abspath(pdf_path), os.path.getmtime(pdf_path))
+    reader = _worker_readers.get(key)
+    if reader is None:
+        _worker_readers.clear()
+        reader = PyPDF2.PdfReader(pdf_path)
+        _worker_readers[key] = reader
+    return reader
+
+
+def _read_pages(reader: "PyPDF2.PdfReader", start: int, end: int) -> List[Tuple[int, str]]:
+    return [(i + 1, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) and return them as (page_number, text) pairs."""
+    return _read_pages(_get_reader(pdf_path), start, end)
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Return the number of pages in a PDF file."""
+    return len(_get_reader(pdf_path).pages)
+
+
+def iter_pdf_pages(pdf_path: str, workers: Optional[int] = None,
+                   batch_size: int = 8) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, text) for every page of a PDF, in page order.
+
+    With more than one worker, batches of ``batch_size`` pages are extracted
+    in a process pool. At most ``2 * workers`` batches are in flight at a
+    time, so memory stays bounded no matter how long the book is. Workers
+    come from a fork server rather than forking the caller, which by now
+    runs encoder, pipeline and compaction threads and holds caches that
+    PDF parsing does not need.
+    """
+    workers = workers if workers is not None else Config.PDF_EXTRACT_WORKERS
+    reader = PyPDF2.PdfReader(pdf_path)
+    num_pages = len(reader.pages)
+    batches = [(start, min(start + batch_size, num_pages)) for start in range(0, num_pages, batch_size)]
+
+    if workers <= 1 or len(batches) <= 1:
+        for start, end in batches:
+            yield from _read_pages(reader, start, end)
+        return
+    # The workers open their own readers.
+    del reader
+
+    max_pending = 2 * workers
+    with ProcessPoolExecutor(max_workers=min(workers, len(batches)), initializer=_init_worker,
+                             mp_context=multiprocessing.get_context("forkserver")) as pool:
+        pending = deque()
+        for start, end in batches:
+            pending.append(pool.submit(_extract_page_range, pdf_path, start, end))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
 
 
 def extract_text_from_pdf(pdf_path: str) -> str:
     """Extracts all text from a PDF file."""
-    text = ""
-    with open(pdf_path, 'rb') as f:
-        reader = PyPDF2.PdfReader(f)
-        for page in reader.pages:
-            text += page.extract_text() or ""
-    return text
+    return "".join(text for _, text in iter_pdf_pages(pdf_path))
 
 
 def chunk_text(text: str, chunk_size: int = 500) -> List[str]:
@@ -19,12 +94,26 @@ def chunk_text(text: str, chunk_size: int = 500) -> List[str]:
     return [' '.join(words[i:i+chunk_size]) for i in range(0, len(words), chunk_size)]
 
 
+def chunk_pages(pages: Iterable[Tuple[int, str]], chunk_size: int = 500) -> Iterator[str]:
+    """Streaming version of chunk_text over (page_number, text) pairs.
+
+    Only the words of the chunk being built are held in memory.
+    """
+    words: List[str] = []
+    for _, text in pages:
+        words.extend(text.split())
+        while len(words) >= chunk_size:
+            yield ' '.join(words[:chunk_size])
+            del words[:chunk_size]
+    if words:
+        yield ' '.join(words)
+
+
 def search_chunks(chunks: List[str], query: str) -> List[str]:
     """Returns all chunks containing the query string (case-insensitive)."""
     return [chunk for chunk in chunks if query.lower() in chunk.lower()]
 
 
-def load_and_prepare_pdf(pdf_path: str, chunk_size: int = 500) -> List[str]:
-    """Extracts and chunks text from a PDF file."""
-    text = extract_text_from_pdf(pdf_path)
-    return chunk_text(text, chunk_size=chunk_size)
+def load_and_prepare_pdf(pdf_path: str, chunk_size: int = 500, workers: Optional[int] = None) -> List[str]:
+    """Extracts and chunks text from a PDF file, one page at a time."""
+    return list(chunk_pages(iter_pdf_pages(pdf_path, workers=workers), chunk_size=chunk_size))
@@ -0,0 +1,265 @@
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import secrets
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.connection import Client, Listener, wait
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from . import agent
+from .config import get_config
+from .tracing import prometheus_text
+
+Config = get_config()
+
+WRITE_OPERATIONS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "load": agent.load_curriculum_document,
+    "remove": agent.remove_curriculum_document,
+    "clear": agent.clear_memory,
+}
+
+
+def _set_inference_threads(threads: int):
+    """Limit torch and FAISS to ``threads`` threads in this process, if they are loaded."""
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(threads)
+    if 'faiss' in sys.modules:
+        sys.modules['faiss'].omp_set_num_threads(threads)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """JSON endpoints of a worker; ``server.worker`` is the owning ``_Worker``."""
+
+    def _reply(self, status: int, body: Dict[str, Any]):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def do_GET(self):
+        worker = self.server.worker
+        if self.path == "/health":
+            self._reply(200, {"status": "success", "pid": os.getpid(), "generation": worker.sync()})
+        elif self.path == "/documents":
+            worker.sync()
+            self._reply(200, agent.get_loaded_documents())
+        elif self.path == "/metrics":
+            # Each worker keeps its own counters; a scrape sees whichever worker accepted it.
+            payload = prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        else:
+            self._reply(404, {"status": "error", "message": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        worker = self.server.worker
+        try:
+            body = self._body()
+            if self.path == "/ask":
+                worker.sync()
+                self._reply(200, agent.ask_curriculum_question(
+                    body["question"], documents=body.get("documents"), collections=body.get("collections")))
+            elif self.path == "/documents/load":
+                self._reply(200, worker.write("load", filename=body["filename"], collection=body.get("collection")))
+            elif self.path == "/documents/remove":
+                self._reply(200, worker.write("remove", filename=body["filename"], collection=body.get("collection")))
+            elif self.path == "/clear":
+                self._reply(200, worker.write("clear"))
+            else:
+                self._reply(404, {"status": "error", "message": f"Unknown path {self.path}"})
+        except (KeyError, ValueError) as e:
+            self._reply(400, {"status": "error", "message": f"Bad request: {e}"})
+        except Exception as e:
+            self._reply(500, {"status": "error", "message": str(e)})
+
+    def log_message(self, format, *args):
+        # One line per request from every worker would drown the supervisor's output.
+        pass
+
+
+class _Worker:
+    """A forked process answering questions from the shared, read-only index."""
+
+    def __init__(self, server: "PreforkServer"):
+        self.server = server
+        # -1 makes the first request adopt whatever the writer published before this fork.
+        self.seen = -1
+        self._sync_lock = threading.Lock()
+
+    def sync(self) -> int:
+        """Reload the published index if the writer has changed it since the last request."""
+        generation = self.server.generation.value
+        if generation != self.seen:
+            with self._sync_lock:
+                generation = self.server.generation.value
+                if generation != self.seen:
+                    agent.reload_published_documents()
+                    self.seen = generation
+        return generation
+
+    def write(self, operation: str, **kwargs) -> Dict[str, Any]:
+        """Run a write on the writer process and wait for its result."""
+        with Client(self.server.writer_address, authkey=self.server.authkey) as conn:
+            conn.send((operation, kwargs))
+            return conn.recv()
+
+    def run(self):
+        _set_inference_threads(self.server.inference_threads)
+        httpd = ThreadingHTTPServer(self.server.address, _Handler, bind_and_activate=False)
+        httpd.socket = self.server.socket
+        httpd.worker = self
+        httpd.serve_forever()
+
+
+class PreforkServer:
+    """Serve ``ask_curriculum_question`` from several processes sharing one index and model.
+
+    The supervisor loads the embedding model and maps every segment of the
+    index before forking, so workers share the model weights copy-on-write
+    and the segment files through the page cache; each extra worker only
+    costs its own interpreter state. Workers accept HTTP requests on one
+    shared listening socket and answer questions concurrently.
+
+    Loads, removals and clears are forwarded to a single writer process,
+    which runs them one at a time and then bumps a shared generation
+    counter. Workers compare it on every request and, when it changed,
+    re-read the store manifests and document registry the writer published
+    (``agent.reload_published_documents``). The supervisor writes only
+    while preparing, when warm-up (``agent.wait_until_ready``) loads the
+    default curriculum before anything is forked; after that it neither
+    writes nor serves, it only forks and replaces processes that exit.
+
+    Each worker runs inference with ``inference_threads`` threads (one by
+    default), so N workers use N cores without oversubscription. The writer
+    always runs single-threaded: the supervisor has already run the model,
+    and an OpenMP runtime (libgomp) whose thread pool existed before the
+    fork can deadlock when a child asks it for more threads.
+    """
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, workers: Optional[int] = None,
+                 inference_threads: Optional[int] = None):
+        self.address: Tuple[str, int] = (host or Config.PREFORK_HOST,
+                                         Config.PREFORK_PORT if port is None else port)
+        self.workers = max(1, workers or Config.PREFORK_WORKERS or os.cpu_count() or 1)
+        self.inference_threads = max(1, inference_threads or Config.PREFORK_INFERENCE_THREADS)
+        self._context = multiprocessing.get_context('fork')
+        self.generation = self._context.Value('L', 0)
+        self.authkey = secrets.token_bytes(16)
+        self._runtime_dir = tempfile.mkdtemp(prefix="prefork-")
+        self.writer_address = os.path.join(self._runtime_dir, "writer.sock")
+        self.socket: Optional[socket.socket] = None
+        self._processes: Dict[int, Tuple[str, Any]] = {}
+        self._stopping = False
+
+    def _prepare(self):
+        """Load everything workers share, then leave the supervisor idle so forking is safe."""
+        agent.wait_until_ready()
+        retriever = agent.initialize_rag_assistant()['context_retriever']
+        retriever.memory.store.wait_for_compaction()
+        # Objects created so far are shared; keep the collector from touching (and copying) them.
+        gc.collect()
+        gc.freeze()
+
+    def _start(self, role: str) -> int:
+        target = self._run_writer if role == "writer" else _Worker(self).run
+        # Not daemonic: the writer starts its own PDF extraction processes.
+        process = self._context.Process(target=self._child, args=(target,), name=f"prefork-{role}")
+        process.start()
+        self._processes[process.sentinel] = (role, process)
+        return process.pid
+
+    @staticmethod
+    def _child(target: Callable[[], None]):
+        # Ctrl-C reaches the whole process group; the supervisor stops children with SIGTERM.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        target()
+
+    def _run_writer(self):
+        _set_inference_threads(1)
+        # A replacement writer starts from the supervisor's (older) view of the index.
+        agent.reload_published_documents()
+        if os.path.exists(self.writer_address):
+            os.remove(self.writer_address)
+        with Listener(self.writer_address, family='AF_UNIX', authkey=self.authkey) as listener:
+            while True:
+                with listener.accept() as conn:
+                    operation, kwargs = conn.recv()
+                    try:
+                        result = WRITE_OPERATIONS[operation](**kwargs)
+                    except Exception as e:
+                        result = {"status": "error", "message": str(e)}
+                    self._publish()
+                    conn.send(result)
+                # Merged segments are published too, once background compaction settles.
+                retriever = agent.initialize_rag_assistant()['context_retriever']
+                retriever.memory.store.wait_for_compaction()
+                self._publish()
+
+    def _publish(self):
+        with self.generation.get_lock():
+            self.generation.value += 1
+
+    def _stop(self, signum=None, frame=None):
+        self._stopping = True
+
+    def serve_forever(self):
+        """Load, fork the writer and workers, and keep them running until SIGINT or SIGTERM."""
+        self._prepare()
+        self.socket = socket.create_server(self.address, backlog=128)
+        self.address = self.socket.getsockname()[:2]
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+        try:
+            self._start("writer")
+            for _ in range(self.workers):
+                self._start("worker")
+            print(f"✅ Serving on http://{self.address[0]}:{self.address[1]} "
+                  f"with {self.workers} workers (supervisor pid {os.getpid()})")
+            while not self._stopping:
+                for sentinel in wait(list(self._processes), timeout=1.0):
+                    role, process = self._processes.pop(sentinel)
+                    process.join()
+                    if not self._stopping:
+                        print(f"⚠️  {role} {process.pid} exited with {process.exitcode}, restarting it")
+                        self._start(role)
+        finally:
+            for role, process in self._processes.values():
+                process.terminate()
+            for role, process in self._processes.values():
+                process.join()
+            self.socket.close()
+            shutil.rmtree(self._runtime_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the RAG assistant from prefork worker processes.")
+    parser.add_argument('--host', default=Config.PREFORK_HOST)
+    parser.add_argument('--port', type=int, default=Config.PREFORK_PORT)
+    parser.add_argument('--workers', type=int, default=Config.PREFORK_WORKERS or os.cpu_count(),
+                        help='worker processes answering questions')
+    parser.add_argument('--inference-threads', type=int, default=Config.PREFORK_INFERENCE_THREADS,
+                        help='torch/FAISS threads per worker')
+    args = parser.parse_args()
+    PreforkServer(args.host, args.port, args.workers, args.inference_threads).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
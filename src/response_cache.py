@@ -0,0 +1,138 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .forking import reinit_after_fork
+
+
+class ResponseCache:
+    """Disk-backed cache of LLM responses.
+
+    Entries are keyed by a SHA-256 of (model name, task type, full prompt),
+    expire after ``ttl_seconds`` and are evicted least-recently-used first
+    once there are more than ``max_entries``. Each entry remembers which
+    documents supplied its context so it can be invalidated when one of
+    them is reloaded.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 10000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidated = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, task_type TEXT NOT NULL, response TEXT NOT NULL,"
+            " created REAL NOT NULL, last_used REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);"
+            "CREATE TABLE IF NOT EXISTS response_documents (key TEXT NOT NULL, doc_id TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS response_documents_doc ON response_documents (doc_id);"
+            "CREATE INDEX IF NOT EXISTS response_documents_key ON response_documents (key);"
+        )
+        self._conn.commit()
+        reinit_after_fork(self._reconnect)
+
+    def _reconnect(self):
+        # A SQLite connection must not be used across fork.
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    @staticmethod
+    def key(model_name: str, task_type: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{task_type}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def _delete(self, keys: List[str]):
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in keys])
+        self._conn.executemany("DELETE FROM response_documents WHERE key = ?", [(key,) for key in keys])
+
+    def get(self, model_name: str, task_type: str, prompt: str) -> Optional[str]:
+        """Return the cached response, or None if missing or expired."""
+        key = self.key(model_name, task_type, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, created = row
+            if now - created > self.ttl_seconds:
+                self._delete([key])
+                self._conn.commit()
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return response
+
+    def put(self, model_name: str, task_type: str, prompt: str, response: str, documents: List[str] = ()):
+        """Store a response along with the documents its context came from."""
+        key = self.key(model_name, task_type, prompt)
+        now = time.time()
+        with self._lock:
+            self._delete([key])
+            self._conn.execute(
+                "INSERT INTO responses (key, model, task_type, response, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)", (key, model_name, task_type, response, now, now)
+            )
+            self._conn.executemany(
+                "INSERT INTO response_documents (key, doc_id) VALUES (?, ?)",
+                [(key, doc_id) for doc_id in set(documents) if doc_id is not None]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            keys = [row[0] for row in self._conn.execute(
+                "SELECT key FROM responses ORDER BY last_used ASC LIMIT ?", (excess,)
+            )]
+            self._delete(keys)
+
+    def invalidate_document(self, doc_id: str) -> int:
+        """Drop every response whose context came from ``doc_id``."""
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT key FROM response_documents WHERE doc_id = ?", (doc_id,)
+            )]
+            self._delete(keys)
+            self._conn.commit()
+            self.invalidated += len(keys)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("DELETE FROM response_documents")
+            self._conn.commit()
+            self.invalidated += count
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "expired": self.expired,
+            "invalidated": self.invalidated,
+        }
@@ -0,0 +1,777 @@
+import copy
+import json
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Collection, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .index_factory import index_type_name, read_index_mmap, search_parameters
+from .lazy_import import lazy_import
+from .lexical_index import LEXICAL_SUFFIXES, Postings
+
+faiss = lazy_import('faiss')
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 2
+SEGMENT_SUFFIXES = (".npy", ".txt", ".off.npy", ".pages.npy", ".chunk.npy", ".faiss")
+# Filtered searches selecting at most this many rows of a segment scan those rows exactly.
+EXACT_FILTER_MAX_ROWS = 65536
+
+
+def _complement(ranges: List[Tuple[int, int]], count: int) -> List[Tuple[int, int]]:
+    """Return the [start, end) row ranges of ``range(count)`` not covered by ``ranges``."""
+    result, position = [], 0
+    for start, end in sorted(ranges):
+        if start > position:
+            result.append((position, start))
+        position = max(position, end)
+    if position < count:
+        result.append((position, count))
+    return result
+
+
+def _rows(ranges: List[Tuple[int, int]]) -> np.ndarray:
+    if not ranges:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate([np.arange(start, end, dtype=np.int64) for start, end in ranges])
+
+
+def _id_selector(ranges: List[Tuple[int, int]], count: int):
+    """Build a FAISS selector accepting exactly the rows in ``ranges``."""
+    if len(ranges) == 1:
+        return faiss.IDSelectorRange(*ranges[0])
+    selected = sum(end - start for start, end in ranges)
+    if selected <= count // 2:
+        return faiss.IDSelectorBatch(_rows(ranges))
+    # Mostly-live segments: list the few excluded rows instead.
+    return faiss.IDSelectorNot(faiss.IDSelectorBatch(_rows(_complement(ranges, count))))
+
+
+def _code_index(index):
+    """The part of ``index`` holding scalar-quantised codes for every row, or None if it has none."""
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return index
+    if isinstance(index, faiss.IndexHNSW):
+        storage = faiss.downcast_index(index.storage)
+        if isinstance(storage, faiss.IndexScalarQuantizer):
+            return storage
+    return None
+
+
+def _deleted_count(segment: Dict) -> int:
+    return sum(count for _, count in segment.get("deleted", []))
+
+
+class Segment:
+    """Read-only view of one segment on disk.
+
+    Vectors and chunk offsets are memory-mapped ``.npy`` arrays and chunk
+    text lives in a flat UTF-8 blob, so opening a segment costs a few page
+    faults regardless of its size and pages are shared between processes
+    through the OS page cache. Text is only decoded for the rows asked for.
+    Segments sealed with an approximate index also carry a ``.faiss`` file,
+    read with FAISS mmap flags; other segments are searched exactly. The
+    BM25 postings of the chunk text are mapped too; segments written
+    before postings existed, or with the older JSON term dictionary, build
+    them on first lexical search.
+
+    Per-chunk metadata is columnar: ``pages`` and ``chunk_index`` (the
+    chunk's position within its document) are arrays with one entry per
+    row, and document ids are run-length encoded as the manifest's
+    ``docs`` ranges. Rows of removed documents are listed in ``deleted``
+    until the segment is rewritten. With the cosine metric, vectors are unit length and searched by inner
+    product; distances are reported as 1 - cosine similarity so that
+    smaller is better for both metrics.
+    """
+
+    def __init__(self, store_dir: str, name: str, count: int, index_type: Optional[str] = None,
+                 docs: Optional[List[List]] = None, metric: str = 'l2',
+                 deleted: Optional[List[List[int]]] = None):
+        self.name = name
+        self.count = count
+        self.metric = metric
+        self.store_dir = store_dir
+        self._postings: Optional[Postings] = None
+        self._postings_lock = threading.Lock()
+        self.docs = docs or []
+        self.deleted = deleted or []
+        self.index_type = index_type or 'flat'
+        self.index = None
+        if index_type:
+            self.index = read_index_mmap(os.path.join(store_dir, f"{name}.faiss"))
+        # float16/int8 codes, searched in place of the float32 vectors when filtering.
+        self._codes = _code_index(self.index) if self.index is not None else None
+        self.vectors = np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode='r')
+        self.offsets = np.load(os.path.join(store_dir, f"{name}.off.npy"), mmap_mode='r')
+        # (page_start, page_end) per row; 0 where the page is unknown.
+        self.pages = np.load(os.path.join(store_dir, f"{name}.pages.npy"), mmap_mode='r')
+        # Segments written before chunk positions were recorded have none.
+        chunk_path = os.path.join(store_dir, f"{name}.chunk.npy")
+        self.chunk_index = np.load(chunk_path, mmap_mode='r') if os.path.exists(chunk_path) else None
+        blob_path = os.path.join(store_dir, f"{name}.txt")
+        if os.path.getsize(blob_path) > 0:
+            with open(blob_path, 'rb') as f:
+                self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._blob = b""
+        # Mapped now, so a snapshot's segments stay readable after compaction unlinks the files.
+        base_path = os.path.join(store_dir, name)
+        if Postings.exists(base_path):
+            self._postings = Postings.load(base_path)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def text(self, row: int) -> str:
+        """Decode the chunk text stored at ``row``."""
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self._blob[start:end].decode('utf-8')
+
+    def doc_id(self, row: int) -> Optional[str]:
+        """Return the id of the document that ``row`` belongs to, if any."""
+        for doc_id, start, count in self.docs:
+            if start <= row < start + count:
+                return doc_id
+        return None
+
+    def chunk_position(self, row: int) -> int:
+        """Return the position of ``row`` within its document, or -1 if unknown."""
+        return int(self.chunk_index[row]) if self.chunk_index is not None else -1
+
+    def texts(self) -> List[str]:
+        return [self.text(row) for row in range(self.count)]
+
+    def with_entry(self, docs: List[List], deleted: List[List[int]]) -> "Segment":
+        """Return a view sharing this segment's files with updated document ranges."""
+        view = copy.copy(self)
+        view.docs, view.deleted = docs, deleted
+        view._postings_lock = threading.Lock()
+        return view
+
+    def allowed_ranges(self, doc_ids: Optional[Collection[str]] = None) -> Optional[List[Tuple[int, int]]]:
+        """Return the [start, end) row ranges a search may return.
+
+        With ``doc_ids`` these are the rows of those documents, otherwise
+        every row that has not been deleted. None means all rows; an empty
+        list means the segment has nothing to offer and can be skipped.
+        """
+        if doc_ids is not None:
+            return sorted((start, start + count) for doc_id, start, count in self.docs if doc_id in doc_ids)
+        if not self.deleted:
+            return None
+        return _complement([(start, start + count) for start, count in self.deleted], self.count)
+
+    @property
+    def postings(self) -> Postings:
+        """The segment's inverted index, built and saved once for segments written without one."""
+        if self._postings is None:
+            with self._postings_lock:
+                if self._postings is None:
+                    base_path = os.path.join(self.store_dir, self.name)
+                    if not Postings.exists(base_path):
+                        Postings.build(self.texts()).save(base_path)
+                    self._postings = Postings.load(base_path)
+        return self._postings
+
+    def search(self, queries: np.ndarray, k: int, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+               ranges: Optional[List[Tuple[int, int]]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (distances, rows) of the ``k`` nearest vectors for each query.
+
+        ``ranges`` (see ``allowed_ranges``) restricts the search to those
+        rows. Small selections are searched exactly over just their rows,
+        so the cost follows the selection rather than the segment; larger
+        ones are handed to the segment's index as an ID selector, so the
+        filter is applied inside FAISS rather than to its results. In
+        quantised segments the exact search reads the float16/int8 codes,
+        so the float32 vectors are never paged in.
+        """
+        small = ranges is not None and sum(end - start for start, end in ranges) <= EXACT_FILTER_MAX_ROWS
+        if small and self._codes is not None:
+            return self._search_codes(queries, k, ranges)
+        if ranges is not None and (self.index is None or small):
+            return self._search_ranges(queries, k, ranges)
+        k = min(k, self.count)
+        if self.index is None:
+            return self._knn(queries, self.vectors, k)
+        selector = _id_selector(ranges, self.count) if ranges is not None else None
+        distances, rows = self.index.search(queries, k, params=search_parameters(self.index, nprobe, ef_search,
+                                                                                 selector))
+        if self.metric == 'cosine':
+            distances = 1.0 - distances
+        return distances, rows
+
+    def _knn(self, queries: np.ndarray, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self.metric == 'cosine':
+            similarities, rows = faiss.knn(queries, vectors, k, metric=faiss.METRIC_INNER_PRODUCT)
+            return 1.0 - similarities, rows
+        return faiss.knn(queries, vectors, k)
+
+    def _search_codes(self, queries: np.ndarray, k: int,
+                      ranges: List[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, sum(end - start for start, end in ranges))
+        if k == 0:
+            return np.empty((len(queries), 0), dtype=np.float32), np.empty((len(queries), 0), dtype=np.int64)
+        selector = _id_selector(ranges, self.count)
+        # Probing every list makes IVF exhaustive; the selector skips all rows but the selected ones.
+        nprobe = self._codes.nlist if isinstance(self._codes, faiss.IndexIVF) else None
+        distances, rows = self._codes.search(queries, k, params=search_parameters(self._codes, nprobe,
+                                                                                  selector=selector))
+        if self.metric == 'cosine':
+            distances = 1.0 - distances
+        return distances, rows
+
+    def _search_ranges(self, queries: np.ndarray, k: int,
+                       ranges: List[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+        distances, rows = [], []
+        for start, end in ranges:
+            D, I = self._knn(queries, self.vectors[start:end], min(k, end - start))
+            distances.append(D)
+            rows.append(np.where(I >= 0, I + start, -1))
+        if not distances:
+            return np.empty((len(queries), 0), dtype=np.float32), np.empty((len(queries), 0), dtype=np.int64)
+        D, I = np.hstack(distances), np.hstack(rows)
+        D = np.where(I >= 0, D, np.inf)
+        order = np.argsort(D, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+
+class Snapshot:
+    """Immutable, published state of a store: a manifest and its segments.
+
+    Readers take one with ``SegmentStore.snapshot()`` and use it for a whole
+    query. Writers never change a published snapshot; they build the next
+    manifest and swap it in. Segments are opened on first use, and every
+    snapshot is opened before it is replaced, so a reader holding one keeps
+    a consistent view even after compaction unlinks the files behind it.
+    """
+
+    def __init__(self, store: "SegmentStore", manifest: Dict):
+        self.manifest = manifest
+        self._store = store
+        self._segments: Optional[List[Segment]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def entries(self) -> List[Dict]:
+        return self.manifest["segments"]
+
+    def __len__(self) -> int:
+        return sum(entry["count"] - _deleted_count(entry) for entry in self.entries)
+
+    def open(self) -> List[Segment]:
+        """Return memory-mapped views of every segment in manifest order."""
+        if self._segments is None:
+            with self._lock:
+                if self._segments is None:
+                    metric = self.manifest.get("metric", "l2")
+                    self._segments = [self._store.open_segment(entry, metric) for entry in self.entries]
+        return self._segments
+
+
+class StagedWrite:
+    """Segments appended by one thread inside ``SegmentStore.stage`` and not yet published."""
+
+    def __init__(self, replaces: Sequence[str] = ()):
+        self.owner = threading.get_ident()
+        self.replaces = tuple(replaces)
+        self.entries: List[Dict] = []
+        self.dimension: Optional[int] = None
+        # Rows of the ``replaces`` documents removed when the stage was published.
+        self.removed = 0
+
+
+class SegmentStore:
+    """Append-only on-disk store of embedding segments described by a manifest.
+
+    Every call to ``append`` writes one new immutable segment (vectors plus
+    chunk text) and then atomically swaps in a manifest that references it,
+    so the cost of an add is proportional to the new chunks only. Small
+    segments are merged in a background thread once there are more than
+    ``max_segments`` of them. ``index_builder`` is called with the vectors
+    of every merged segment and may return an approximate FAISS index to
+    seal it with; returning None keeps the segment exact. ``metric`` ('l2'
+    or 'cosine') is recorded in the manifest of a new store; an existing
+    store keeps the metric it was built with. Segments in which more than
+    ``purge_fraction`` of the rows belong to removed documents are
+    rewritten without them in the background.
+
+    Readers never lock: each search works on one published ``Snapshot``.
+    Writers serialise on an internal lock only to swap the manifest.
+    """
+
+    def __init__(self, store_dir: str, max_segments: int = 8, merge_factor: int = 4,
+                 index_builder: Optional[Callable[[np.ndarray], Optional[object]]] = None,
+                 metric: str = 'l2', purge_fraction: float = 0.5):
+        self.store_dir = store_dir
+        self.purge_fraction = purge_fraction
+        self._default_metric = metric
+        self.index_builder = index_builder
+        self.max_segments = max_segments
+        self.merge_factor = max(2, merge_factor)
+        self.manifest_path = os.path.join(store_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._stage_lock = threading.Lock()
+        self._stage: Optional[StagedWrite] = None
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._open_segments: Dict[str, Segment] = {}
+        manifest = self._read_manifest()
+        self._next_id = manifest["next_id"]
+        self._snapshot = Snapshot(self, manifest)
+
+    def exists(self) -> bool:
+        """Return True if a manifest has been written for this store."""
+        return os.path.exists(self.manifest_path)
+
+    def snapshot(self) -> Snapshot:
+        """Return the published snapshot; it does not change once taken."""
+        return self._snapshot
+
+    @property
+    def manifest(self) -> Dict:
+        """Manifest of the published snapshot; replaced, never modified in place."""
+        return self._snapshot.manifest
+
+    @property
+    def segments(self) -> List[Dict]:
+        return list(self.manifest["segments"])
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return self.manifest["dimension"]
+
+    @property
+    def metric(self) -> str:
+        # Stores written before metrics were configurable are L2.
+        return self.manifest.get("metric", "l2")
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def _empty_manifest(self) -> Dict:
+        return {"version": MANIFEST_VERSION, "dimension": None, "next_id": 1, "segments": [],
+                "metric": self._default_metric}
+
+    def _read_manifest(self) -> Dict:
+        if not os.path.exists(self.manifest_path):
+            return self._empty_manifest()
+        with open(self.manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(
+                f"Unsupported segment store version {manifest.get('version')} in {self.manifest_path}"
+            )
+        return manifest
+
+    def _publish(self, manifest: Dict):
+        # Readers of the outgoing snapshot must be able to map its segments after their files go.
+        previous, self._snapshot = self._snapshot, Snapshot(self, manifest)
+        previous.open()
+
+    def _write_manifest(self, manifest: Dict):
+        """Write the manifest to a temp file, atomically rename it into place and publish it."""
+        manifest = {**manifest, "next_id": self._next_id}
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+        self._publish(manifest)
+
+    def _new_segment_name(self) -> str:
+        # Called with ``_lock`` held; names are reserved before the segment is published.
+        name = f"seg-{self._next_id:06d}"
+        self._next_id += 1
+        return name
+
+    def _path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.store_dir, f"{name}{suffix}")
+
+    def _write_file(self, path: str, write):
+        with open(path + ".tmp", 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_segment(self, name: str, embeddings: np.ndarray, chunks: List[str],
+                       pages: Optional[np.ndarray] = None, index=None, chunk_index: Optional[np.ndarray] = None):
+        os.makedirs(self.store_dir, exist_ok=True)
+        encoded = [chunk.encode('utf-8') for chunk in chunks]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if pages is None:
+            pages = np.zeros((len(chunks), 2), dtype=np.int32)
+        pages = np.ascontiguousarray(pages, dtype=np.int32).reshape(len(chunks), 2)
+        if chunk_index is None:
+            chunk_index = np.full(len(chunks), -1, dtype=np.int32)
+        chunk_index = np.ascontiguousarray(chunk_index, dtype=np.int32).reshape(len(chunks))
+
+        self._write_file(self._path(name, ".npy"), lambda f: np.save(f, vectors))
+        self._write_file(self._path(name, ".off.npy"), lambda f: np.save(f, offsets))
+        self._write_file(self._path(name, ".pages.npy"), lambda f: np.save(f, pages))
+        self._write_file(self._path(name, ".chunk.npy"), lambda f: np.save(f, chunk_index))
+        self._write_file(self._path(name, ".txt"), lambda f: f.writelines(encoded))
+        suffixes = SEGMENT_SUFFIXES
+        if index is not None:
+            faiss.write_index(index, self._path(name, ".faiss") + ".tmp")
+        else:
+            suffixes = tuple(suffix for suffix in suffixes if suffix != ".faiss")
+        for suffix in suffixes:
+            os.replace(self._path(name, suffix) + ".tmp", self._path(name, suffix))
+        # Lexical postings are built while the chunk text is at hand.
+        Postings.build(chunks).save(self._path(name, ""))
+
+    def _segment_entry(self, name: str, count: int, index, docs: List[List]) -> Dict:
+        entry = {"name": name, "count": count, "docs": docs}
+        if index is not None:
+            entry["index"] = index_type_name(index)
+        return entry
+
+    def open_segment(self, segment: Dict, metric: Optional[str] = None) -> Segment:
+        """Return the memory-mapped view of a manifest entry; files are opened once per segment."""
+        with self._open_lock:
+            opened = self._open_segments.get(segment["name"])
+            if opened is None:
+                opened = Segment(self.store_dir, segment["name"], segment["count"], segment.get("index"),
+                                 segment.get("docs"), metric or self.metric, segment.get("deleted"))
+                self._open_segments[segment["name"]] = opened
+        docs, deleted = segment.get("docs") or [], segment.get("deleted") or []
+        if opened.docs != docs or opened.deleted != deleted:
+            # Removing a document only changes the manifest entry; the files are shared.
+            opened = opened.with_entry(docs, deleted)
+        return opened
+
+    def open_segments(self) -> List[Segment]:
+        """Return memory-mapped views of every segment of the published snapshot."""
+        return self._snapshot.open()
+
+    def _remove_segment_files(self, name: str):
+        # Readers that still hold the mapping keep working after the unlink.
+        with self._open_lock:
+            self._open_segments.pop(name, None)
+        for suffix in SEGMENT_SUFFIXES + LEXICAL_SUFFIXES:
+            path = self._path(name, suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _staged_here(self) -> Optional[StagedWrite]:
+        stage = self._stage
+        return stage if stage is not None and stage.owner == threading.get_ident() else None
+
+    def append(self, embeddings: np.ndarray, chunks: List[str], doc_id: Optional[str] = None,
+               pages: Optional[np.ndarray] = None, chunk_index: Optional[np.ndarray] = None) -> Dict:
+        """Write a new segment and publish it in the manifest.
+
+        Rows are tagged with ``doc_id`` in the manifest as a ``[doc_id, start,
+        count]`` range so that a document can later be removed on its own.
+        ``pages`` optionally gives the (page_start, page_end) of every row and
+        ``chunk_index`` its position within the document. Inside a ``stage``
+        block on this thread the segment is written but published later.
+        """
+        if len(chunks) != len(embeddings):
+            raise ValueError("embeddings and chunks must have the same length")
+        docs = [[doc_id, 0, len(chunks)]] if doc_id is not None else []
+        stage = self._staged_here()
+        if stage is not None:
+            with self._lock:
+                name = self._new_segment_name()
+            self._write_segment(name, embeddings, chunks, pages, chunk_index=chunk_index)
+            segment = self._segment_entry(name, len(chunks), None, docs)
+            stage.entries.append(segment)
+            stage.dimension = int(embeddings.shape[1])
+            return segment
+        with self._lock:
+            manifest = self.manifest
+            name = self._new_segment_name()
+            self._write_segment(name, embeddings, chunks, pages, chunk_index=chunk_index)
+            segment = self._segment_entry(name, len(chunks), None, docs)
+            self._write_manifest({
+                **manifest,
+                "dimension": int(embeddings.shape[1]),
+                "segments": manifest["segments"] + [segment],
+            })
+        self._maybe_compact()
+        return segment
+
+    @contextmanager
+    def stage(self, replaces: Union[str, Sequence[str], None] = None) -> Iterator[StagedWrite]:
+        """Publish every ``append`` this thread makes inside the block in one manifest swap.
+
+        Readers keep seeing the previous snapshot until the block exits, so
+        a document being ingested appears all at once rather than batch by
+        batch. With ``replaces`` (a document id or several), those
+        documents' current rows are removed in the same swap. If the block
+        raises, the staged segments are deleted and nothing is published.
+        Stages run one at a time.
+        """
+        if isinstance(replaces, str):
+            replaces = (replaces,)
+        with self._stage_lock:
+            stage = self._stage = StagedWrite(replaces or ())
+            try:
+                yield stage
+            except BaseException:
+                self._stage = None
+                for entry in stage.entries:
+                    self._remove_segment_files(entry["name"])
+                raise
+            self._stage = None
+            obsolete = []
+            with self._lock:
+                manifest = self.manifest
+                segments = manifest["segments"]
+                for doc_id in stage.replaces:
+                    segments, removed, emptied = self._without_document(segments, doc_id)
+                    stage.removed += removed
+                    obsolete += emptied
+                if stage.entries or stage.removed:
+                    self._write_manifest({
+                        **manifest,
+                        "dimension": stage.dimension or manifest["dimension"],
+                        "segments": segments + stage.entries,
+                    })
+            for name in obsolete:
+                self._remove_segment_files(name)
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        if len(self.manifest["segments"]) <= self.max_segments and self._purge_candidate() is None:
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self._compact_until_within_limit, daemon=True)
+        self._compaction_thread.start()
+
+    def _compact_until_within_limit(self):
+        # Appends that arrive while a merge runs do not start their own thread.
+        while len(self.manifest["segments"]) > self.max_segments:
+            if not self.compact():
+                break
+        # Segments left mostly deleted by document removals are rewritten on their own.
+        snapshot = self.snapshot()
+        position = self._purge_candidate(snapshot)
+        while position is not None:
+            if not self._replace_run(snapshot, position, position + 1):
+                break
+            snapshot = self.snapshot()
+            position = self._purge_candidate(snapshot)
+
+    def _purge_candidate(self, snapshot: Optional[Snapshot] = None) -> Optional[int]:
+        for position, segment in enumerate((snapshot or self.snapshot()).entries):
+            if _deleted_count(segment) > self.purge_fraction * segment["count"]:
+                return position
+        return None
+
+    def wait_for_compaction(self):
+        """Block until any running background compaction has finished."""
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+
+    def _pick_compaction_run(self, segments: List[Dict]) -> Tuple[int, int]:
+        """Pick the contiguous run of segments with the fewest rows to merge."""
+        width = min(self.merge_factor, len(segments))
+        best_start, best_total = 0, None
+        for start in range(len(segments) - width + 1):
+            total = sum(s["count"] for s in segments[start:start + width])
+            if best_total is None or total < best_total:
+                best_start, best_total = start, total
+        return best_start, best_start + width
+
+    def _merge_segments(self, run: List[Segment]) -> Tuple[np.ndarray, List[str], np.ndarray, np.ndarray, List[List]]:
+        """Concatenate the live rows of ``run``; rows of removed documents are dropped."""
+        vectors, chunks, pages, chunk_index, docs = [], [], [], [], []
+        for opened in run:
+            rows = _rows(opened.allowed_ranges() or [(0, opened.count)])
+            # Document ranges move down past the deleted rows before them.
+            docs.extend([doc_id, len(chunks) + int(np.searchsorted(rows, start)), count]
+                        for doc_id, start, count in opened.docs)
+            positions = opened.chunk_index if opened.chunk_index is not None else np.full(opened.count, -1)
+            if opened.deleted:
+                vectors.append(np.asarray(opened.vectors)[rows])
+                pages.append(np.asarray(opened.pages)[rows])
+                chunk_index.append(np.asarray(positions)[rows])
+                chunks.extend(opened.text(int(row)) for row in rows)
+            else:
+                vectors.append(opened.vectors)
+                pages.append(opened.pages)
+                chunk_index.append(positions)
+                chunks.extend(opened.texts())
+        return np.concatenate(vectors), chunks, np.concatenate(pages), np.concatenate(chunk_index), docs
+
+    def compact(self) -> bool:
+        """Merge a run of adjacent segments into one and swap the manifest.
+
+        Only contiguous runs are merged so that row order, and therefore
+        index positions, stay the same before and after compaction.
+        """
+        snapshot = self.snapshot()
+        if len(snapshot.entries) < 2:
+            return False
+        start, end = self._pick_compaction_run(snapshot.entries)
+        return self._replace_run(snapshot, start, end)
+
+    def _replace_run(self, snapshot: Snapshot, start: int, end: int) -> bool:
+        """Rewrite the entries ``start:end`` of ``snapshot`` as one segment, if they are still current."""
+        run = snapshot.entries[start:end]
+        with self._lock:
+            name = self._new_segment_name()
+
+        # The expensive part runs without the lock so appends are not blocked.
+        vectors, chunks, pages, chunk_index, docs = self._merge_segments(snapshot.open()[start:end])
+        index = self.index_builder(vectors) if self.index_builder else None
+        self._write_segment(name, vectors, chunks, pages, index, chunk_index)
+
+        with self._lock:
+            current = self.manifest["segments"]
+            if current[start:end] != run:
+                # The store was cleared, rewritten or had a document removed while we were merging.
+                self._remove_segment_files(name)
+                return False
+            merged = self._segment_entry(name, len(chunks), index, docs)
+            self._write_manifest({
+                **self.manifest,
+                "segments": current[:start] + [merged] + current[end:],
+            })
+        for segment in run:
+            self._remove_segment_files(segment["name"])
+        return True
+
+    def rebuild(self, index_builder: Optional[Callable[[np.ndarray], Optional[object]]] = None,
+                metric: Optional[str] = None) -> bool:
+        """Merge every segment into one, sealed with ``index_builder`` if given.
+
+        This is how an existing exact store is migrated to an approximate
+        index type: the raw vectors kept in each segment are the source.
+        Switching ``metric`` to 'cosine' normalises the stored vectors.
+        """
+        self.wait_for_compaction()
+        if index_builder is not None:
+            self.index_builder = index_builder
+        with self._lock:
+            snapshot = self.snapshot()
+            run = snapshot.entries
+            if not run:
+                return False
+            vectors, chunks, pages, chunk_index, docs = self._merge_segments(snapshot.open())
+            metric = metric or self.metric
+            if metric == 'cosine':
+                vectors = np.ascontiguousarray(vectors, dtype=np.float32).copy()
+                faiss.normalize_L2(vectors)
+            index = self.index_builder(vectors) if self.index_builder else None
+            name = self._new_segment_name()
+            self._write_segment(name, vectors, chunks, pages, index, chunk_index)
+            self._write_manifest({
+                **self.manifest,
+                "metric": metric,
+                "segments": [self._segment_entry(name, len(chunks), index, docs)],
+            })
+        for segment in run:
+            self._remove_segment_files(segment["name"])
+        return True
+
+    def document_ids(self) -> List[str]:
+        """Return the ids of all documents that have rows in the store."""
+        seen = {}
+        for segment in self.manifest["segments"]:
+            for doc_id, _, _ in segment.get("docs", []):
+                seen[doc_id] = True
+        return list(seen)
+
+    def document_size(self, doc_id: str) -> int:
+        """Return the number of rows tagged with ``doc_id``, counting this thread's staged rows."""
+        stage = self._staged_here()
+        entries = list(self.manifest["segments"])
+        if stage is not None:
+            if doc_id in stage.replaces:
+                entries = []
+            entries += stage.entries
+        return sum(count for segment in entries for other, _, count in segment.get("docs", []) if other == doc_id)
+
+    @staticmethod
+    def _without_document(segments: List[Dict], doc_id: str) -> Tuple[List[Dict], int, List[str]]:
+        """Return ``segments`` with ``doc_id``'s rows marked deleted, the rows removed and emptied segments."""
+        kept, removed, obsolete = [], 0, []
+        for segment in segments:
+            ranges = [[start, count] for other, start, count in segment.get("docs", []) if other == doc_id]
+            if not ranges:
+                kept.append(segment)
+                continue
+            removed += sum(count for _, count in ranges)
+            deleted = segment.get("deleted", []) + ranges
+            if sum(count for _, count in deleted) >= segment["count"]:
+                obsolete.append(segment["name"])
+                continue
+            docs = [entry for entry in segment["docs"] if entry[0] != doc_id]
+            kept.append({**segment, "docs": docs, "deleted": deleted})
+        return kept, removed, obsolete
+
+    def remove_document(self, doc_id: str) -> int:
+        """Remove every row tagged with ``doc_id`` and return how many were removed.
+
+        Only the manifest is rewritten: the document's ranges move from
+        ``docs`` to the segment's ``deleted`` list, and searches exclude
+        those rows, so the cost does not depend on the size of the segments
+        the document shares. Segments left without live rows are dropped;
+        the others are reclaimed by compaction.
+        """
+        with self._lock:
+            segments, removed, obsolete = self._without_document(self.manifest["segments"], doc_id)
+            if not removed:
+                return 0
+            self._write_manifest({**self.manifest, "segments": segments})
+        for name in obsolete:
+            self._remove_segment_files(name)
+        self._maybe_compact()
+        return removed
+
+    def refresh(self) -> bool:
+        """Publish the manifest last written to disk if it differs; returns True if it did.
+
+        For processes that only read a store written by another process (see
+        prefork_server). The new snapshot's segments are opened before it is
+        published; if compaction removed some of them in the meantime, the
+        newer manifest is read instead.
+        """
+        for _ in range(3):
+            manifest = self._read_manifest()
+            if manifest == self.manifest:
+                return False
+            snapshot = Snapshot(self, manifest)
+            try:
+                snapshot.open()
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self._next_id = manifest["next_id"]
+                self._snapshot = snapshot
+            live = {entry["name"] for entry in manifest["segments"]}
+            with self._open_lock:
+                for name in [name for name in self._open_segments if name not in live]:
+                    del self._open_segments[name]
+            return True
+        return False
+
+    def close(self):
+        """Forget the opened segments; their mappings are released once no reader holds them."""
+        self.wait_for_compaction()
+        with self._lock:
+            self._snapshot = Snapshot(self, self.manifest)
+            with self._open_lock:
+                self._open_segments.clear()
+
+    def clear(self):
+        """Remove all segments and the manifest."""
+        self.wait_for_compaction()
+        with self._lock:
+            run = self.manifest["segments"]
+            if os.path.exists(self.manifest_path):
+                os.remove(self.manifest_path)
+            self._publish(self._empty_manifest())
+            for segment in run:
+                self._remove_segment_files(segment["name"])
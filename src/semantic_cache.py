@@ -0,0 +1,91 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .lazy_import import lazy_import
+
+faiss = lazy_import('faiss')
+
+
+class SemanticCache:
+    """Answer cache that also matches paraphrased questions.
+
+    Past questions are embedded with the retrieval model and kept in a small
+    inner-product index per task type. A new question whose cosine
+    similarity to a cached one is at least ``threshold`` reuses its answer,
+    skipping both retrieval and the LLM call. The cache does not look at the
+    retrieved context, so it must be cleared whenever documents change.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], threshold: float = 0.92,
+                 max_entries: int = 5000):
+        self.encode = encode
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, "faiss.IndexFlatIP"] = {}
+        self._answers: Dict[str, List[str]] = {}
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.array(self.encode([question]), dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def lookup(self, question: str, task_type: str) -> Optional[str]:
+        """Return the answer to a cached question similar enough to ``question``."""
+        with self._lock:
+            index = self._indexes.get(task_type)
+            if index is None or index.ntotal == 0:
+                self.misses += 1
+                return None
+        vector = self._embed(question)
+        with self._lock:
+            index = self._indexes.get(task_type)
+            if index is None or index.ntotal == 0:
+                self.misses += 1
+                return None
+            similarity, position = index.search(vector, 1)
+            if position[0][0] < 0 or similarity[0][0] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._answers[task_type][int(position[0][0])]
+
+    def store(self, question: str, task_type: str, answer: str):
+        """Remember ``answer`` for ``question`` under ``task_type``."""
+        vector = self._embed(question)
+        with self._lock:
+            index = self._indexes.get(task_type)
+            if index is None:
+                index = self._indexes[task_type] = faiss.IndexFlatIP(vector.shape[1])
+                self._answers[task_type] = []
+            if index.ntotal >= self.max_entries:
+                # Drop the oldest half rather than rebuilding on every insert.
+                keep = self.max_entries // 2
+                vectors = index.reconstruct_n(index.ntotal - keep, keep)
+                index.reset()
+                index.add(vectors)
+                self._answers[task_type] = self._answers[task_type][-keep:]
+            index.add(vector)
+            self._answers[task_type].append(answer)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._answers.clear()
+
+    def __len__(self) -> int:
+        return sum(len(answers) for answers in self._answers.values())
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "llm_calls_saved": self.hits,
+        }
@@ -39,6 +39,7 @@ GEMINI_API_KEY={api_key}
 
 # Model Configuration
 GEMINI_MODEL=gemini-2.0-flash
+# LLM_BACKEND=stub  # uncomment to run offline with deterministic answers
 
 # PDF Configuration
 PDF_FOLDER=src/books
@@ -48,6 +49,8 @@ DEFAULT_CHUNK_SIZE=500
 FAISS_INDEX_PATH=src/faiss_index.faiss
 CHUNK_METADATA_PATH=src/chunk_metadata.pkl
 EMBEDDING_MODEL=all-MiniLM-L6-v2
+MEMORY_STORE_DIR=src/memory_store
+COLLECTIONS_DIR=src/collections
 
 # Logging Configuration
 LOG_LEVEL=INFO
@@ -0,0 +1,253 @@
+import heapq
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Collection, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .config import get_config
+from .forking import reinit_after_fork
+from .memory import SearchHit, VectorMemory, hit_similarity
+from .tracing import span
+
+Config = get_config()
+
+DEFAULT_COLLECTION = "default"
+# A shard to search: an open collection, or the name of one opened only for that search.
+Shard = Union[VectorMemory, str]
+_COLLECTION_NAME = re.compile(r"^[\w.-]+$")
+
+
+class ShardedMemory:
+    """Named collections of chunks, each a ``VectorMemory`` with its own store.
+
+    The default collection is the existing memory store; every other
+    collection lives in its own directory under ``root_dir`` and is opened
+    on first use. At most ``max_open`` collections named by searches or
+    writes stay open: the least recently used is closed when another is
+    opened, and collections idle for ``idle_seconds`` are closed on the
+    next search or open, so memory follows the set of hot shards rather
+    than the whole library. Searches over all collections fill free slots
+    with the shards they open, as least recently used; once the limit is
+    reached, further shards are opened by the search worker and closed when
+    their search returns, so hot shards are never evicted by unscoped
+    queries. Empty collections are skipped from a cached reading of their
+    manifests without being opened. All collections share the default
+    collection's embedding model and caches.
+
+    Searches encode the queries once, fan out to the selected collections
+    on a thread pool (FAISS releases the GIL) and merge the per-collection
+    top-k lists with a heap, by similarity under each collection's own
+    metric. BM25 scores use each collection's own statistics.
+    """
+
+    def __init__(self, default: VectorMemory, root_dir: Optional[str] = None, max_open: Optional[int] = None,
+                 idle_seconds: Optional[float] = None, workers: Optional[int] = None):
+        self.default = default
+        self.root_dir = root_dir or Config.COLLECTIONS_DIR
+        self.max_open = max(1, max_open or Config.MAX_OPEN_COLLECTIONS)
+        self.idle_seconds = Config.COLLECTION_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self._lock = threading.Lock()
+        # Open collections, least recently used first, with their last use time.
+        self._open: "OrderedDict[str, VectorMemory]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        # name -> (manifest mtime_ns, live rows), so empty collections are skipped without opening them.
+        self._sizes: Dict[str, Tuple[int, int]] = {}
+        self._workers = max(1, workers or Config.SHARD_SEARCH_WORKERS)
+        self._pool = self._new_pool()
+        reinit_after_fork(self._after_fork)
+
+    def _new_pool(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="shard-search")
+
+    def _after_fork(self):
+        # Pool threads do not survive a fork.
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _path(self, name: str) -> str:
+        if not _COLLECTION_NAME.match(name):
+            raise ValueError(f"Invalid collection name {name!r}: use letters, digits, '.', '-' or '_'")
+        return os.path.join(self.root_dir, name)
+
+    def names(self) -> List[str]:
+        """Return the default collection and every collection written to disk."""
+        names = [DEFAULT_COLLECTION]
+        if os.path.isdir(self.root_dir):
+            names.extend(sorted(
+                name for name in os.listdir(self.root_dir)
+                if _COLLECTION_NAME.match(name) and name != DEFAULT_COLLECTION
+                and os.path.exists(os.path.join(self.root_dir, name, "manifest.json"))
+            ))
+        return names
+
+    def exists(self, name: Optional[str]) -> bool:
+        """Return True if collection ``name`` has been written to disk."""
+        return name in (None, DEFAULT_COLLECTION) or name in self.names()
+
+    def open_collections(self) -> List[str]:
+        """Return the names of the collections currently held open (besides the default)."""
+        with self._lock:
+            return list(self._open)
+
+    def _new_memory(self, name: str) -> VectorMemory:
+        path = self._path(name)
+        # Legacy single-file indexes are only imported into the default collection.
+        return VectorMemory(store_dir=path, encoder=self.default,
+                            index_path=os.path.join(path, "legacy.faiss"),
+                            meta_path=os.path.join(path, "legacy.pkl"))
+
+    def get(self, name: Optional[str] = None) -> VectorMemory:
+        """Return the memory of collection ``name``, opening it if needed."""
+        if name in (None, DEFAULT_COLLECTION):
+            return self.default
+        self._path(name)
+        with self._lock:
+            memory = self._open.get(name)
+            if memory is None:
+                memory = self._new_memory(name)
+            self._open[name] = memory
+            self._open.move_to_end(name)
+            self._last_used[name] = time.monotonic()
+            evicted = self._pop_evictable(keep=name)
+        for old in evicted:
+            old.close()
+        return memory
+
+    def _pop_evictable(self, keep: Optional[str] = None) -> List[VectorMemory]:
+        now = time.monotonic()
+        evicted = []
+        for name in list(self._open):
+            over_limit = len(self._open) > self.max_open
+            idle = self.idle_seconds > 0 and now - self._last_used[name] > self.idle_seconds
+            if name != keep and (over_limit or idle):
+                evicted.append(self._open.pop(name))
+                del self._last_used[name]
+        return evicted
+
+    def evict_idle(self) -> int:
+        """Close collections idle for longer than ``idle_seconds``; returns how many were closed."""
+        with self._lock:
+            evicted = self._pop_evictable()
+        for memory in evicted:
+            memory.close()
+        return len(evicted)
+
+    def _rows_on_disk(self, name: str) -> int:
+        """Live rows of a collection from its manifest, re-read only when the manifest changes."""
+        manifest_path = os.path.join(self._path(name), "manifest.json")
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+        cached = self._sizes.get(name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(manifest_path, 'r') as f:
+            segments = json.load(f)["segments"]
+        rows = sum(segment["count"] - sum(count for _, count in segment.get("deleted", [])) for segment in segments)
+        self._sizes[name] = (mtime, rows)
+        return rows
+
+    def _for_fan_out(self, name: str) -> Optional[VectorMemory]:
+        """Return ``name`` for a search over every collection if it is open or a slot is free, else None."""
+        with self._lock:
+            memory = self._open.get(name)
+            if memory is None and len(self._open) < self.max_open:
+                # Least recently used, so shards named by scoped searches displace it first.
+                memory = self._open[name] = self._new_memory(name)
+                self._open.move_to_end(name, last=False)
+            if memory is not None:
+                self._last_used[name] = time.monotonic()
+        return memory
+
+    def _select(self, collections: Optional[Collection[str]]) -> List[Shard]:
+        """The non-empty shards to search: open memories, or names of shards to open for one search."""
+        if collections is not None:
+            names = [name for name in collections if self.exists(name)]
+            return [memory for memory in (self.get(name) for name in dict.fromkeys(names)) if len(memory)]
+        self.evict_idle()
+        shards: List[Shard] = [self.default] if len(self.default) else []
+        for name in self.names()[1:]:
+            with self._lock:
+                memory = self._open.get(name)
+            # Open collections know their size; closed ones are only opened if they hold rows.
+            if memory is None and not self._rows_on_disk(name):
+                continue
+            if memory is None:
+                memory = self._for_fan_out(name)
+            if memory is None:
+                shards.append(name)
+            elif len(memory):
+                shards.append(memory)
+        return shards
+
+    def _search_shard(self, shard: Shard, search: Callable[[VectorMemory], List[List[SearchHit]]]):
+        if not isinstance(shard, str):
+            return search(shard)
+        # A shard beyond ``max_open`` is open only while this worker searches it.
+        memory = self._new_memory(shard)
+        try:
+            return search(memory)
+        finally:
+            memory.close()
+
+    def _fan_out(self, shards: List[Shard], search: Callable[[VectorMemory], List[List[SearchHit]]]):
+        if len(shards) == 1:
+            return [self._search_shard(shards[0], search)]
+        futures = [self._pool.submit(self._search_shard, shard, search) for shard in shards]
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def _merge(per_shard: List[List[SearchHit]], k: int,
+               key: Callable[[SearchHit], float] = lambda hit: hit.distance) -> List[SearchHit]:
+        # Each shard's list is already sorted, so a k-way heap merge suffices.
+        return list(itertools.islice(heapq.merge(*per_shard, key=key), k))
+
+    def search_hits_batch(self, queries: List[str], k: int = 3, documents: Optional[Collection[str]] = None,
+                          collections: Optional[Collection[str]] = None, nprobe: Optional[int] = None,
+                          ef_search: Optional[int] = None) -> List[List[SearchHit]]:
+        """Vector search over ``collections`` (default: all of them), merged into one top-k per query."""
+        shards = self._select(collections)
+        if not shards or not queries:
+            return [[] for _ in queries]
+        with span("encode_query", queries=len(queries)):
+            embeddings: np.ndarray = self.default.embed_queries(queries)
+        with span("vector_search", collections=len(shards)):
+            per_shard = self._fan_out(shards, lambda shard: shard.search_hits_by_embeddings(
+                embeddings, k, nprobe=nprobe, ef_search=ef_search, documents=documents))
+        # Similarity, not raw distance, so collections built with different metrics merge correctly.
+        by_similarity = lambda hit: -hit_similarity(hit.distance, hit.metric)  # noqa: E731
+        return [self._merge([hits[q] for hits in per_shard], k, by_similarity) for q in range(len(queries))]
+
+    def search_hits_lexical(self, query: str, k: int = 3, documents: Optional[Collection[str]] = None,
+                            collections: Optional[Collection[str]] = None) -> List[SearchHit]:
+        """BM25 search over ``collections`` (default: all of them), merged into one top-k."""
+        shards = self._select(collections)
+        if not shards:
+            return []
+        per_shard = self._fan_out(shards, lambda shard: [shard.search_hits_lexical(query, k, documents=documents)])
+        return self._merge([hits[0] for hits in per_shard], k)
+
+    def refresh(self) -> bool:
+        """Pick up what another process has published to the open collections; True if any changed."""
+        with self._lock:
+            memories = [self.default, *self._open.values()]
+        return any([memory.refresh() for memory in memories])
+
+    def clear(self):
+        """Clear every collection, including those not currently open."""
+        for name in self.names():
+            self.get(name).clear()
+        with self._lock:
+            evicted = list(self._open.values())
+            self._open.clear()
+            self._last_used.clear()
+        for memory in evicted:
+            memory.close()
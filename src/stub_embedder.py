@@ -0,0 +1,57 @@
+import hashlib
+import re
+from typing import List, Union
+
+import numpy as np
+
+STUB_EMBEDDING_MODEL = "stub-hashing-384"
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+class StubTokenizer:
+    """Word-level tokenizer with the two methods the chunker uses."""
+
+    def tokenize(self, text: str) -> List[str]:
+        return _TOKEN.findall(text.lower())
+
+    def convert_tokens_to_string(self, tokens: List[str]) -> str:
+        return " ".join(tokens)
+
+
+class StubSentenceTransformer:
+    """Deterministic, offline replacement for ``SentenceTransformer``.
+
+    Each text is embedded as a hashed bag of words: every token adds a
+    signed count to one of ``dimension`` buckets chosen by its hash, and the
+    vector is L2-normalised. Texts sharing words land close together, so
+    retrieval quality is meaningful enough for benchmarks and tests, and
+    nothing needs to be downloaded.
+    """
+
+    def __init__(self, model_name: str = STUB_EMBEDDING_MODEL, dimension: int = 384,
+                 max_seq_length: int = 256):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_seq_length = max_seq_length
+        self.tokenizer = StubTokenizer()
+        self.calls = 0
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in self.tokenizer.tokenize(text)[:self.max_seq_length]:
+            digest = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+            vector[digest % self.dimension] += 1.0 if digest >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts: Union[str, List[str]], convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        self.calls += 1
+        if isinstance(texts, str):
+            return self._embed(texts)
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.vstack([self._embed(text) for text in texts])
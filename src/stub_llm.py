@@ -0,0 +1,72 @@
+import asyncio
+import hashlib
+import re
+import time
+from typing import AsyncIterator, Iterator, List
+
+_CONTEXT_BLOCK = re.compile(r'Context Information:\s*(.*?)\s*Task:', re.S)
+
+
+class StubResponse:
+    """Minimal stand-in for a Gemini response: just ``text``."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubGenerativeModel:
+    """Deterministic, offline replacement for ``genai.GenerativeModel``.
+
+    The answer is derived from the prompt alone (the first sentence of the
+    retrieved context plus a short digest), so the same prompt always gets
+    the same response. ``latency`` simulates the round trip to the API,
+    which makes the stub useful for concurrency and load testing.
+    """
+
+    def __init__(self, model_name: str = "stub", latency: float = 0.0):
+        self.model_name = model_name
+        self.latency = latency
+        self.calls = 0
+
+    def _answer(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+        match = _CONTEXT_BLOCK.search(prompt)
+        context = ' '.join(match.group(1).split()) if match else ''
+        first_sentence = re.split(r'(?<=[.!?])\s', context, maxsplit=1)[0][:300]
+        return f"[stub {digest}] {first_sentence or 'No context was provided.'}"
+
+    def _pieces(self, prompt: str) -> List[StubResponse]:
+        words = self._answer(prompt).split(' ')
+        return [StubResponse(' '.join(words[i:i + 4]) + (' ' if i + 4 < len(words) else ''))
+                for i in range(0, len(words), 4)]
+
+    def _stream(self, prompt: str) -> Iterator[StubResponse]:
+        # Half the latency before the first piece, the rest spread over the others.
+        pieces = self._pieces(prompt)
+        for i, piece in enumerate(pieces):
+            if self.latency:
+                time.sleep(self.latency / 2 / (1 if i == 0 else max(1, len(pieces) - 1)))
+            yield piece
+
+    async def _stream_async(self, prompt: str) -> AsyncIterator[StubResponse]:
+        pieces = self._pieces(prompt)
+        for i, piece in enumerate(pieces):
+            if self.latency:
+                await asyncio.sleep(self.latency / 2 / (1 if i == 0 else max(1, len(pieces) - 1)))
+            yield piece
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        self.calls += 1
+        if stream:
+            return self._stream(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        return StubResponse(self._answer(prompt))
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        self.calls += 1
+        if stream:
+            return self._stream_async(prompt)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return StubResponse(self._answer(prompt))
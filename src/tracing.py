@@ -0,0 +1,281 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .config import get_config
+
+Config = get_config()
+
+EXPORTERS = ('log', 'ring', 'prometheus')
+
+# Upper bounds (seconds) of the Prometheus histogram buckets.
+_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("rag_trace_span", default=None)
+
+
+class Span:
+    """One timed stage. Spans opened inside another become its children.
+
+    A span with no parent is the root of a trace and is handed to the
+    exporters when it closes. Numeric attributes ending in ``_tokens`` are
+    summed over the whole trace by ``timings``.
+    """
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+        self.children: List["Span"] = []
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self._token = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Closed from another context (e.g. an async generator finalised elsewhere).
+            pass
+        self._finish()
+        return False
+
+    def _finish(self):
+        if self.parent is None:
+            self.tracer.export(self)
+        else:
+            self.parent.children.append(self)
+
+    def walk(self, depth: int = 0) -> Iterator[Tuple[int, "Span"]]:
+        yield depth, self
+        for child in list(self.children):
+            yield from child.walk(depth + 1)
+
+    def timings(self) -> Dict[str, Any]:
+        """Total time, time per stage (summed by name) and token counts of this span's subtree."""
+        stages: Dict[str, float] = {}
+        tokens: Dict[str, int] = {}
+        for depth, span in self.walk():
+            if depth:
+                stages[span.name] = round(stages.get(span.name, 0.0) + span.duration, 6)
+            for key, value in span.attributes.items():
+                if key.endswith("_tokens") and isinstance(value, (int, float)):
+                    tokens[key] = tokens.get(key, 0) + value
+        return {"total_seconds": round(self.duration, 6), "stages": stages, **tokens}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "seconds": round(self.duration, 6), "attributes": dict(self.attributes),
+                "children": [child.as_dict() for child in list(self.children)]}
+
+
+class _NoopSpan:
+    """Returned while tracing is disabled, so instrumented code costs almost nothing."""
+
+    def set(self, **attributes):
+        pass
+
+    def timings(self) -> None:
+        return None
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class LogExporter:
+    """Prints one line per finished trace with the time of every stage."""
+
+    def __init__(self, write: Callable[[str], None] = print):
+        self.write = write
+
+    def export(self, root: Span):
+        stages = " ".join(f"{'.' * depth}{span.name}={span.duration * 1000:.1f}ms"
+                          for depth, span in root.walk() if depth)
+        tokens = " ".join(f"{key}={value}" for key, value in root.timings().items() if key.endswith("_tokens"))
+        self.write(f"⏱️  trace {root.name} {root.duration * 1000:.1f}ms {stages} {tokens}".rstrip())
+
+
+class RingBufferExporter:
+    """Keeps the last ``size`` traces in memory for inspection."""
+
+    def __init__(self, size: int = 1000):
+        self._traces: deque = deque(maxlen=max(1, size))
+        self._lock = threading.Lock()
+
+    def export(self, root: Span):
+        with self._lock:
+            self._traces.append(root.as_dict())
+
+    def traces(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return the most recent traces, oldest first."""
+        with self._lock:
+            traces = list(self._traces)
+        return traces[-limit:] if limit else traces
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+
+class PrometheusExporter:
+    """Aggregates span durations into histograms and token counts into counters.
+
+    ``render`` returns them in the Prometheus text exposition format, with
+    spans labelled by their own name and the name of their trace's root.
+    """
+
+    def __init__(self, prefix: str = "rag"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        # (root, span) -> [count per bucket..., count above the last bucket, total count, sum]
+        self._histograms: Dict[Tuple[str, str], List[float]] = {}
+        self._tokens: Dict[Tuple[str, str], float] = {}
+
+    def export(self, root: Span):
+        with self._lock:
+            for _, span in root.walk():
+                stats = self._histograms.setdefault((root.name, span.name), [0] * (len(_BUCKETS) + 3))
+                duration = span.duration
+                stats[bisect.bisect_left(_BUCKETS, duration)] += 1
+                stats[-2] += 1
+                stats[-1] += duration
+                for key, value in span.attributes.items():
+                    if key.endswith("_tokens") and isinstance(value, (int, float)):
+                        kind = key[:-len("_tokens")]
+                        self._tokens[(root.name, kind)] = self._tokens.get((root.name, kind), 0) + value
+
+    def render(self) -> str:
+        name = f"{self.prefix}_span_seconds"
+        lines = [f"# HELP {name} Time spent in each traced stage.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for (root, span), stats in sorted(self._histograms.items()):
+                labels = f'trace="{root}",span="{span}"'
+                cumulative = 0
+                for bound, count in zip(_BUCKETS, stats):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {int(stats[-2])}')
+                lines.append(f"{name}_sum{{{labels}}} {stats[-1]:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {int(stats[-2])}")
+            tokens = f"{self.prefix}_tokens_total"
+            lines += [f"# HELP {tokens} Tokens by kind (prompt, response, context, context_saved).", f"# TYPE {tokens} counter"]
+            for (root, kind), value in sorted(self._tokens.items()):
+                lines.append(f'{tokens}{{trace="{root}",kind="{kind}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+class Tracer:
+    """Creates spans and hands finished traces to the exporters."""
+
+    def __init__(self, enabled: bool = False, exporters: Optional[List[Any]] = None):
+        self.enabled = enabled
+        self.exporters = list(exporters or [])
+
+    def span(self, name: str, **attributes):
+        """Context manager timing one stage; a no-op while tracing is disabled."""
+        if not self.enabled:
+            return _NOOP
+        return Span(self, name, _current.get(), attributes)
+
+    def record(self, name: str, seconds: float, **attributes):
+        """Add an already finished stage of ``seconds`` under the current span.
+
+        For stages that cannot be wrapped in a ``with`` block, such as a
+        streamed generation that yields to its caller.
+        """
+        parent = _current.get()
+        if not self.enabled or parent is None:
+            return
+        span = Span(self, name, parent, attributes)
+        span.end = time.perf_counter()
+        span.start = span.end - seconds
+        span._finish()
+
+    def current(self):
+        """The innermost open span, or a no-op span outside any trace."""
+        return (_current.get() if self.enabled else None) or _NOOP
+
+    def export(self, root: Span):
+        for exporter in self.exporters:
+            try:
+                exporter.export(root)
+            except Exception as e:
+                print(f"⚠️  Trace exporter {type(exporter).__name__} failed: {e}")
+
+    def exporter(self, kind: type):
+        """Return the configured exporter of class ``kind``, or None."""
+        return next((exporter for exporter in self.exporters if isinstance(exporter, kind)), None)
+
+
+def build_exporters(names: str, ring_size: int = 1000) -> List[Any]:
+    """Exporters from a comma-separated list of 'log', 'ring' and 'prometheus'."""
+    factories = {'log': LogExporter, 'ring': lambda: RingBufferExporter(ring_size), 'prometheus': PrometheusExporter}
+    exporters = []
+    for name in filter(None, (part.strip() for part in names.split(','))):
+        if name not in factories:
+            raise ValueError(f"Unknown trace exporter {name!r}; expected some of {EXPORTERS}")
+        exporters.append(factories[name]())
+    return exporters
+
+
+tracer = Tracer(Config.TRACING_ENABLED, build_exporters(Config.TRACE_EXPORTERS, Config.TRACE_RING_SIZE))
+
+
+def span(name: str, **attributes):
+    """Time a stage with the global tracer: ``with span("plan"): ...``."""
+    return tracer.span(name, **attributes)
+
+
+def record(name: str, seconds: float, **attributes):
+    tracer.record(name, seconds, **attributes)
+
+
+def current_span():
+    return tracer.current()
+
+
+def copy_context_call(func: Callable, *args, **kwargs) -> Callable[[], Any]:
+    """Bind ``func`` to the caller's context, so spans it opens on a pool thread join the caller's trace."""
+    context = contextvars.copy_context()
+    return lambda: context.run(func, *args, **kwargs)
+
+
+def recent_traces(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Traces kept by the ring-buffer exporter (empty if it is not configured)."""
+    ring = tracer.exporter(RingBufferExporter)
+    return ring.traces(limit) if ring is not None else []
+
+
+def prometheus_text() -> str:
+    """Metrics of the Prometheus exporter (empty if it is not configured)."""
+    prometheus = tracer.exporter(PrometheusExporter)
+    return prometheus.render() if prometheus is not None else ""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) when the LLM reports none."""
+    return (len(text) + 3) // 4
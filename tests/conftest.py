@@ -0,0 +1,57 @@
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+# Config is read when src is first imported: run offline, with the hashing stub
+# embedder and LLM, and keep every default path out of the source tree.
+_scratch = tempfile.mkdtemp(prefix="rag-tests-")
+os.environ.update({
+    "EMBEDDING_BACKEND": "stub",
+    "LLM_BACKEND": "stub",
+    "WARM_UP_ON_START": "false",
+    "EMBEDDING_CACHE_PATH": "",
+    "QUERY_CACHE_PATH": "",
+    "RESPONSE_CACHE_PATH": "",
+    "MEMORY_STORE_DIR": os.path.join(_scratch, "store"),
+    "COLLECTIONS_DIR": os.path.join(_scratch, "collections"),
+    "DOCUMENT_REGISTRY_PATH": os.path.join(_scratch, "registry.json"),
+    "FAISS_INDEX_PATH": os.path.join(_scratch, "legacy.faiss"),
+    "CHUNK_METADATA_PATH": os.path.join(_scratch, "legacy.pkl"),
+})
+
+
+@pytest.fixture
+def random_vectors():
+    """Returns a function making ``count`` reproducible float32 vectors."""
+    def make(count: int, dimension: int = 16, seed: int = 0) -> np.ndarray:
+        return np.random.default_rng(seed).standard_normal((count, dimension)).astype(np.float32)
+    return make
+
+
+@pytest.fixture
+def memory(tmp_path):
+    """An empty VectorMemory on the stub embedder, stored under ``tmp_path``."""
+    from src.memory import VectorMemory
+    memory = VectorMemory(store_dir=str(tmp_path / "store"), index_path=str(tmp_path / "legacy.faiss"),
+                          meta_path=str(tmp_path / "legacy.pkl"))
+    yield memory
+    memory.store.wait_for_compaction()
+    if memory.encoder_service is not None:
+        memory.encoder_service.close()
+
+
+@pytest.fixture
+def retriever(tmp_path, monkeypatch):
+    """A ContextRetriever with its store, collections and registry under ``tmp_path``."""
+    from src.config import Config
+    from src.context_retriever import ContextRetriever
+    monkeypatch.setattr(Config, "MEMORY_STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.setattr(Config, "COLLECTIONS_DIR", str(tmp_path / "collections"))
+    monkeypatch.setattr(Config, "DOCUMENT_REGISTRY_PATH", str(tmp_path / "registry.json"))
+    retriever = ContextRetriever(pdf_folder=str(tmp_path))
+    yield retriever
+    retriever.memory.store.wait_for_compaction()
+    if retriever.memory.encoder_service is not None:
+        retriever.memory.encoder_service.close()
@@ -0,0 +1,61 @@
+import pytest
+
+from src.chunker import iter_token_chunks
+from src.stub_embedder import StubTokenizer
+
+tokenizer = StubTokenizer()
+
+
+def sentence(word: str, length: int = 5) -> str:
+    # The stub tokenizer counts the full stop, so this is ``length`` + 1 tokens.
+    return " ".join([word] * length) + "."
+
+
+def token_count(text: str) -> int:
+    return len(tokenizer.tokenize(text))
+
+
+def test_chunks_fit_the_token_limit_and_keep_whole_sentences():
+    text = " ".join(sentence(f"w{i}") for i in range(20))
+    chunks = list(iter_token_chunks([(1, text)], tokenizer, max_tokens=12))
+
+    assert all(token_count(chunk.text) <= 12 for chunk in chunks)
+    # Two six-token sentences fit in twelve tokens, a third does not.
+    assert [chunk.text for chunk in chunks[:2]] == [f"{sentence('w0')} {sentence('w1')}",
+                                                    f"{sentence('w2')} {sentence('w3')}"]
+    assert " ".join(chunk.text for chunk in chunks) == text
+
+
+def test_overlap_repeats_the_previous_chunks_last_sentences():
+    text = " ".join(sentence(f"w{i}") for i in range(6))
+    chunks = list(iter_token_chunks([(1, text)], tokenizer, max_tokens=15, overlap_tokens=6))
+
+    assert chunks[0].text.endswith(sentence("w1"))
+    assert chunks[1].text.startswith(sentence("w1"))
+
+
+def test_long_sentences_are_split_into_token_windows():
+    chunks = list(iter_token_chunks([(1, sentence("long", 25))], tokenizer, max_tokens=10))
+
+    assert [token_count(chunk.text) for chunk in chunks] == [10, 10, 6]
+
+
+def test_sentence_across_a_page_break_spans_both_pages():
+    pages = [(1, f"{sentence('first')} The second sentence starts here"),
+             (2, "and ends on the next page. " + sentence("third"))]
+    chunks = list(iter_token_chunks(pages, tokenizer, max_tokens=12))
+
+    spanning = [chunk for chunk in chunks if "starts here and ends" in chunk.text]
+    assert len(spanning) == 1
+    assert (spanning[0].page_start, spanning[0].page_end) == (1, 2)
+    assert chunks[0].page_start == 1 and chunks[-1].page_end == 2
+
+
+def test_hyphenated_line_breaks_are_joined():
+    (chunk,) = iter_token_chunks([(1, "Photo-\nsynthesis makes sugar.")], tokenizer, max_tokens=20)
+    assert chunk.text == "Photosynthesis makes sugar."
+
+
+def test_overlap_must_be_smaller_than_the_chunk():
+    with pytest.raises(ValueError):
+        list(iter_token_chunks([(1, "text.")], tokenizer, max_tokens=8, overlap_tokens=8))
@@ -0,0 +1,78 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.context_packer import ContextPacker, context_tokens
+
+
+class FixedEncoder:
+    """Encodes known texts to fixed vectors and counts the texts it was asked for."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return np.array([self.vectors[text] for text in texts], dtype=np.float32)
+
+
+def candidate(content, embedding=None):
+    return {"content": content, "relevance_score": 1.0, "document": "book.pdf", "embedding": embedding}
+
+
+@pytest.fixture
+def query():
+    return FixedEncoder({"what is energy": [1.0, 0.0, 0.0]})
+
+
+def test_near_duplicates_are_dropped_and_relevance_order_kept(query):
+    candidates = [
+        candidate("Energy is conserved.", [0.9, 0.1, 0.0]),
+        candidate("Energy is conserved!", [0.9, 0.11, 0.0]),
+        candidate("Forces cause acceleration.", [0.5, 0.0, 0.8]),
+        candidate("Cells divide.", [0.0, 1.0, 0.0]),
+    ]
+    passages = FixedEncoder({})
+    packer = ContextPacker(query, passages, token_budget=1000, dedup_threshold=0.99)
+
+    results, report = packer.pack("what is energy", candidates, k=2)
+
+    assert [result["content"] for result in results] == ["Energy is conserved.", "Forces cause acceleration."]
+    assert report["duplicates_dropped"] == 1 and report["chunks_trimmed"] == 0
+    # The stored embeddings were used; no passage was encoded on the query path.
+    assert passages.texts == []
+
+
+def test_over_budget_chunks_keep_their_best_sentences_in_order(query):
+    passages = FixedEncoder({
+        "Energy is conserved. The sky is blue. Energy changes form.": [0.8, 0.6, 0.0],
+        "Energy is conserved.": [1.0, 0.0, 0.0],
+        "The sky is blue.": [0.0, 1.0, 0.0],
+        "Energy changes form.": [0.9, 0.0, 0.1],
+        "Birds sing.": [0.0, 0.0, 1.0],
+    })
+    candidates = [candidate("Energy is conserved. The sky is blue. Energy changes form."),
+                  candidate("Birds sing.")]
+    packer = ContextPacker(query, passages, token_budget=24, dedup_threshold=0.99, mmr_lambda=1.0)
+
+    results, report = packer.pack("what is energy", candidates, k=2)
+
+    assert [result["content"] for result in results] == ["Energy is conserved. ... Energy changes form."]
+    assert results[0]["trimmed"]
+    assert context_tokens(results) <= 24
+    assert report["chunks_trimmed"] == 2
+    assert report["context_saved_tokens"] == context_tokens(candidates) - context_tokens(results)
+    assert packer.stats()["requests"] == 1
+
+
+def test_search_results_carry_no_vectors(retriever):
+    retriever.memory.add_chunks(["Energy is conserved.", "Forces cause acceleration."], doc_id="physics.pdf")
+
+    results = retriever.search_context("energy", k=2)
+    context, documents = retriever.get_context_with_sources("energy", k=1)
+
+    assert results and all("embedding" not in result for result in results)
+    json.dumps(results)
+    assert documents == ["physics.pdf"] and "Context 1" in context
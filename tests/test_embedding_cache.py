@@ -0,0 +1,55 @@
+import time
+
+import numpy as np
+
+from src.embedding_cache import EmbeddingCache, encode_with_cache
+from src.stub_embedder import StubSentenceTransformer
+
+
+class CountingModel(StubSentenceTransformer):
+    """The stub embedder, remembering which texts reached it."""
+
+    def __init__(self):
+        super().__init__()
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return super().encode(texts, **kwargs)
+
+
+def test_unchanged_text_is_not_encoded_again(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    model = CountingModel()
+    first = encode_with_cache(model, "stub", ["alpha", "beta"], cache)
+    second = encode_with_cache(model, "stub", ["beta", "gamma", "alpha"], cache)
+
+    assert model.encoded == ["alpha", "beta", "gamma"]
+    np.testing.assert_array_equal(second[0], first[1])
+    np.testing.assert_array_equal(second[2], first[0])
+    assert cache.stats() == {"entries": 3, "hits": 2, "misses": 3}
+
+
+def test_entries_are_keyed_by_model_and_survive_a_restart(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    vectors = StubSentenceTransformer().encode(["alpha"])
+    EmbeddingCache(path).put_many("model-a", ["alpha"], vectors)
+
+    reopened = EmbeddingCache(path)
+    np.testing.assert_array_equal(reopened.get_many("model-a", ["alpha"])[0], vectors[0])
+    assert reopened.get_many("model-b", ["alpha"]) == [None]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"), max_entries=2)
+    model = StubSentenceTransformer()
+    for step in (lambda: cache.put_many("stub", ["old"], model.encode(["old"])),
+                 lambda: cache.put_many("stub", ["used"], model.encode(["used"])),
+                 lambda: cache.get_many("stub", ["old"]),
+                 lambda: cache.put_many("stub", ["new"], model.encode(["new"]))):
+        step()
+        time.sleep(0.01)  # distinct last_used stamps
+
+    assert len(cache) == 2
+    assert cache.get_many("stub", ["used"]) == [None]
+    assert all(vector is not None for vector in cache.get_many("stub", ["old", "new"]))
@@ -0,0 +1,117 @@
+import threading
+
+import numpy as np
+import pytest
+
+from src.embedding_cache import QueryEmbeddingCache
+from src.encoder_service import INGEST, QUERY, EncoderService
+from src.stub_embedder import StubSentenceTransformer
+
+
+class RecordingModel(StubSentenceTransformer):
+    """The stub embedder, recording the texts of every batch and optionally held at a gate."""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+
+    def encode(self, texts, **kwargs):
+        self.batches.append(list(texts))
+        self.entered.set()
+        self.gate.wait(5)
+        return super().encode(texts, **kwargs)
+
+
+@pytest.fixture
+def model():
+    return RecordingModel()
+
+
+@pytest.fixture
+def service(model):
+    service = EncoderService(lambda: model, max_batch=8, max_wait_ms=50)
+    yield service
+    model.gate.set()
+    service.close()
+
+
+def test_results_match_the_model_row_for_row(service, model):
+    texts = [f"text number {i}" for i in range(20)]
+    vectors = service.encode(texts, INGEST)
+
+    assert vectors.dtype == np.float32
+    np.testing.assert_allclose(vectors, StubSentenceTransformer().encode(texts), rtol=1e-6)
+    # Large requests are split into batch-sized pieces and put back together in order.
+    assert [len(batch) for batch in model.batches] == [8, 8, 4]
+
+
+def test_concurrent_queries_share_model_calls(service, model):
+    # Hold the model on a first batch so the next requests queue up behind it.
+    model.gate.clear()
+    first = service.submit(["warm up"])
+    assert model.entered.wait(5)
+    futures = [service.submit([f"question {i}"]) for i in range(6)]
+    model.gate.set()
+
+    for i, future in enumerate(futures):
+        np.testing.assert_allclose(future.result(5)[0], StubSentenceTransformer().encode([f"question {i}"])[0],
+                                   rtol=1e-6)
+    first.result(5)
+    assert model.batches[1] == [f"question {i}" for i in range(6)]
+    assert service.stats()["batches"] == 2
+
+
+def test_queries_go_before_queued_ingestion(service, model):
+    model.gate.clear()
+    running = service.submit([f"chunk {i}" for i in range(8)], INGEST)
+    assert model.entered.wait(5)
+    ingest = service.submit([f"chunk {i}" for i in range(8, 24)], INGEST)
+    query = service.submit(["a question"], QUERY)
+    model.gate.set()
+
+    running.result(5), ingest.result(5), query.result(5)
+    # The query waits for the batch already running, never for the ingestion queued before it.
+    assert model.batches[1] == ["a question"]
+    assert all(text.startswith("chunk") for batch in model.batches[2:] for text in batch)
+
+
+def test_model_errors_reach_the_caller(model):
+    def broken():
+        raise RuntimeError("model failed to load")
+
+    service = EncoderService(broken, max_batch=8, max_wait_ms=0)
+    try:
+        with pytest.raises(RuntimeError, match="failed to load"):
+            service.encode(["text"])
+    finally:
+        service.close()
+
+
+def test_unknown_priority_is_rejected(service):
+    with pytest.raises(ValueError):
+        service.submit(["text"], "urgent")
+
+
+def test_query_cache_normalises_questions_and_evicts_least_recently_used():
+    cache = QueryEmbeddingCache("stub", max_entries=2)
+    cache.put("What is a prime?", np.ones(4))
+    cache.put("what is a composite?", np.zeros(4))
+    assert cache.get("  WHAT is a   prime? ") is not None
+    cache.put("what is a factor?", np.full(4, 2.0))
+
+    assert cache.get("what is a composite?") is None
+    assert cache.get("what is a prime?") is not None
+
+
+def test_memory_keeps_its_query_cache_with_batching_on(memory):
+    assert memory.encoder_service is not None and memory.query_cache is not None
+    first = memory.embed_queries(["What is a prime?"])
+    batches = memory.encoder_service.stats()["batches"]
+
+    again = memory.embed_queries(["what is a  prime?"])
+
+    np.testing.assert_array_equal(again, first)
+    assert memory.encoder_service.stats()["batches"] == batches
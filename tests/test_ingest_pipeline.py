@@ -0,0 +1,98 @@
+import random
+import time
+
+import pytest
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from src import ingest_pipeline
+from src.ingest_pipeline import IngestionPipeline, QueryLoad
+
+
+@pytest.fixture
+def book(tmp_path):
+    path = str(tmp_path / "book.pdf")
+    write_synthetic_pdf(path, 12, words_per_page=150, seed=3)
+    return path
+
+
+def pipeline(memory, **kwargs):
+    options = dict(encode_batch_size=4, write_batch_size=16, extract_workers=1, query_yield=0)
+    options.update(kwargs)
+    return IngestionPipeline(memory, max_tokens=48, overlap_tokens=8, **options)
+
+
+def stored_pages(memory):
+    return [(int(segment.pages[row][0]), segment.text(row))
+            for segment in memory.store.open_segments() for row in range(len(segment))]
+
+
+def test_run_writes_every_chunk_in_page_order(memory, book):
+    run = pipeline(memory)
+    count = run.run(book, doc_id="book.pdf")
+
+    assert count == len(memory) > 12
+    assert memory.document_ids() == ["book.pdf"]
+    pages = [page for page, _ in stored_pages(memory)]
+    assert pages == sorted(pages) and pages[0] == 1 and pages[-1] == 12
+    report = run.report()
+    assert report["encode"]["items"] == report["write"]["items"] == count
+    assert report["extract"]["items"] == 12
+    assert run.bottleneck() in report
+
+
+def test_parallel_encoders_keep_document_order(memory, book, tmp_path):
+    from src.memory import VectorMemory
+    reference = VectorMemory(store_dir=str(tmp_path / "reference"))
+    pipeline(reference).run(book, doc_id="book.pdf")
+
+    encode = memory.encode
+    rng = random.Random(1)
+
+    def uneven_encode(texts):
+        # Later batches often finish first.
+        time.sleep(rng.random() * 0.01)
+        return encode(texts)
+
+    memory.encode = uneven_encode
+    pipeline(memory, encode_workers=3).run(book, doc_id="book.pdf")
+
+    assert stored_pages(memory) == stored_pages(reference)
+
+
+def test_failed_reindex_leaves_the_old_version_in_place(memory, book):
+    pipeline(memory).run(book, doc_id="book.pdf")
+    before = stored_pages(memory)
+    calls = []
+    encode = memory.encode
+
+    def failing_encode(texts):
+        calls.append(len(texts))
+        if len(calls) == 3:
+            raise RuntimeError("encoder crashed")
+        return encode(texts)
+
+    memory.encode = failing_encode
+    with pytest.raises(RuntimeError, match="encoder crashed"):
+        with memory.staged(replaces="book.pdf"):
+            pipeline(memory).run(book, doc_id="book.pdf")
+
+    assert stored_pages(memory) == before
+    assert memory.document_ids() == ["book.pdf"]
+
+
+def test_stages_back_off_only_while_queries_run(memory, book, monkeypatch):
+    pauses = []
+    monkeypatch.setattr(ingest_pipeline.time, "sleep", pauses.append)
+    load = QueryLoad()
+
+    pipeline(memory, query_load=load, query_yield=3).run(book, doc_id="quiet.pdf")
+    assert not load.busy()
+    assert pauses == []
+
+    with load.query():
+        assert load.busy()
+        run = pipeline(memory, query_load=load, query_yield=3)
+        run.run(book, doc_id="busy.pdf")
+    assert pauses and all(pause > 0 for pause in pauses)
+    # Every pause is also counted as time the stage spent waiting.
+    assert sum(stats.waiting for stats in run.stats.values()) >= sum(pauses)
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+
+from src.lexical_index import Postings, bm25_search, tokenize
+
+TEXTS = [
+    "The mitochondria is the powerhouse of the cell.",
+    "Photosynthesis turns light into chemical energy in the chloroplast.",
+    "The cell membrane controls what enters the cell.",
+    "H2O is water; m2 is square metres.",
+]
+
+
+def test_tokens_are_case_folded_words_with_digits():
+    assert tokenize("H2O and m2, THE Cell") == ["h2o", "and", "m2", "the", "cell"]
+
+
+def test_saved_postings_are_mapped_back_without_a_term_dictionary(tmp_path):
+    base = str(tmp_path / "seg-1")
+    built = Postings.build(TEXTS)
+    built.save(base)
+    loaded = Postings.load(base)
+
+    assert Postings.exists(base)
+    assert not os.path.exists(base + ".terms.json")
+    assert isinstance(loaded.term_hashes, np.memmap)
+    assert loaded.total_length == built.total_length == sum(len(tokenize(text)) for text in TEXTS)
+    assert loaded.lookup("cell").tolist() == [[0, 1], [2, 2]]
+    assert loaded.lookup("h2o").tolist() == [[3, 1]]
+    assert loaded.lookup("absent") is None
+
+
+def test_bm25_prefers_rare_terms_and_respects_ranges():
+    segments = [Postings.build(TEXTS[:2]), Postings.build(TEXTS[2:])]
+
+    ranked = bm25_search(segments, "cell chloroplast", k=3)
+    assert [(position, row) for position, row, _ in ranked] == [(0, 1), (1, 0), (0, 0)]
+    assert ranked[0][2] > ranked[1][2] > ranked[2][2] > 0
+
+    restricted = bm25_search(segments, "cell chloroplast", k=3, ranges=[[(0, 1)], []])
+    assert [(position, row) for position, row, _ in restricted] == [(0, 0)]
+    assert bm25_search(segments, "nothing matches", k=3) == []
+
+
+def test_hybrid_relevance_is_scaled_to_the_best_possible_fusion(retriever):
+    retriever.memory.add_chunks(TEXTS, doc_id="biology.pdf")
+
+    lexical = retriever.search_context("chloroplast", k=2, mode="lexical")
+    hybrid = retriever.search_context("chloroplast", k=2, mode="hybrid")
+
+    assert lexical[0]["content"] == TEXTS[1]
+    assert {hit["content"] for hit in hybrid} <= set(TEXTS)
+    assert all(0.0 < hit["relevance_score"] <= 1.0 for hit in hybrid)
+    assert hybrid[0]["relevance_score"] >= hybrid[1]["relevance_score"]
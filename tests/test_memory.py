@@ -0,0 +1,28 @@
+def test_removed_document_is_not_searched_or_listed(memory):
+    memory.add_chunks(["energy is conserved", "forces cause acceleration"], doc_id="physics.pdf")
+    memory.add_chunks(["cells divide by mitosis", "membranes let water through"], doc_id="biology.pdf")
+    memory.add_chunks(["atoms bond into molecules"], doc_id="chemistry.pdf")
+    memory.store.compact()
+    memory.store.compact()
+    assert len(memory.store.segments) == 1
+
+    assert memory.remove_document("biology.pdf") == 2
+    hits = memory.search_hits("cells divide by mitosis", k=5)
+    assert "biology.pdf" not in [hit.doc_id for hit in hits]
+    assert {hit.doc_id for hit in hits} == {"physics.pdf", "chemistry.pdf"}
+    assert list(memory.chunks) == ["energy is conserved", "forces cause acceleration", "atoms bond into molecules"]
+    assert len(memory.chunks) == len(memory) == 3
+
+
+def test_staged_reindex_swaps_the_document_at_once(memory):
+    memory.add_chunks(["old page one", "old page two"], doc_id="book.pdf")
+    memory.add_chunks(["an unrelated handout"], doc_id="handout.pdf")
+
+    with memory.staged(replaces="book.pdf") as stage:
+        memory.add_chunks(["new page one"], doc_id="book.pdf")
+        memory.add_chunks(["new page two", "new page three"], doc_id="book.pdf")
+        assert "old page one" in memory.chunks
+
+    assert stage.removed == 2
+    assert sorted(memory.chunks) == ["an unrelated handout", "new page one", "new page three", "new page two"]
+    assert memory.search_hits("new page three", k=1)[0].text == "new page three"
@@ -0,0 +1,32 @@
+import pytest
+
+from benchmarks.synthetic_pdf import synthetic_page_text, write_synthetic_pdf
+from src import pdf_retriever
+
+
+@pytest.fixture
+def book(tmp_path):
+    path = str(tmp_path / "book.pdf")
+    write_synthetic_pdf(path, 20, words_per_page=60, seed=4)
+    return path
+
+
+def words(text: str):
+    return text.split()
+
+
+def test_pages_stream_in_order_with_their_text(book):
+    pages = list(pdf_retriever.iter_pdf_pages(book, workers=1, batch_size=3))
+
+    assert [number for number, _ in pages] == list(range(1, 21))
+    assert words(pages[6][1]) == words(synthetic_page_text(7, 60, seed=4))
+    assert pdf_retriever.count_pdf_pages(book) == 20
+
+
+def test_worker_pool_matches_serial_extraction(book):
+    serial = list(pdf_retriever.iter_pdf_pages(book, workers=1, batch_size=3))
+    pooled = list(pdf_retriever.iter_pdf_pages(book, workers=2, batch_size=3))
+
+    assert pooled == serial
+    # Readers are cached only inside the pool's workers, never in the calling process.
+    assert pdf_retriever._worker_readers is None
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from src.index_factory import build_index
+from src.segment_store import SegmentStore
+
+
+@pytest.fixture
+def store(tmp_path, random_vectors):
+    """Two documents of 200 rows each, merged into one segment by ``rebuild``."""
+    store = SegmentStore(str(tmp_path), max_segments=8)
+    store.append(random_vectors(200, seed=0), [f"a {i}" for i in range(200)], doc_id="a")
+    store.append(random_vectors(200, seed=1), [f"b {i}" for i in range(200)], doc_id="b")
+    return store
+
+
+@pytest.mark.parametrize("index_type,storage", [("flat", "int8"), ("hnsw", "float16"), ("ivf_flat", "int8")])
+def test_filtered_search_of_a_quantised_segment_reads_only_codes(store, random_vectors, index_type, storage):
+    store.rebuild(lambda vectors: build_index(vectors, index_type, storage=storage))
+    segment = store.open_segments()[0]
+    queries = random_vectors(3, seed=1)
+    expected = segment.search(queries, 5, ranges=[(200, 400)])
+
+    # The float32 copy is the migration source only; a filtered search must not touch it.
+    segment.vectors = None
+    distances, rows = segment.search(queries, 5, ranges=[(200, 400)])
+
+    assert ((rows >= 200) & (rows < 400)).all()
+    np.testing.assert_array_equal(rows, expected[1])
+    # Each query is a row of document b, so the nearest code is its own.
+    assert rows[:, 0].tolist() == [200, 201, 202]
+    assert (distances[:, 0] <= distances[:, 1]).all()
+
+
+def test_cosine_store_reports_one_minus_similarity(store, random_vectors):
+    store.rebuild(lambda vectors: build_index(vectors, "flat", metric="cosine", storage="float16"), metric="cosine")
+    segment = store.open_segments()[0]
+    query = random_vectors(1, seed=1)[:1]
+    query /= np.linalg.norm(query)
+
+    distances, rows = segment.search(query, 3)
+    filtered, filtered_rows = segment.search(query, 3, ranges=[(0, 200)])
+
+    assert store.metric == "cosine"
+    assert rows[0, 0] == 200 and distances[0, 0] == pytest.approx(0.0, abs=1e-2)
+    assert ((0.0 - 1e-2 <= distances) & (distances <= 2.0)).all()
+    assert (filtered_rows < 200).all() and (filtered[0] > distances[0, 0]).all()
@@ -0,0 +1,88 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from src.executor import TaskExecutor
+from src.response_cache import ResponseCache
+
+
+class LockedCache:
+    """A response cache whose SQLite file is always locked by another process."""
+
+    def get(self, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+    def put(self, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "responses.sqlite"), max_entries=2)
+
+
+@pytest.fixture
+def executor(cache):
+    executor = TaskExecutor()
+    executor.response_cache = cache
+    return executor
+
+
+def test_entries_are_keyed_by_model_task_and_prompt(cache):
+    cache.put("m", "general", "prompt", "answer")
+
+    assert cache.get("m", "general", "prompt") == "answer"
+    assert cache.get("other", "general", "prompt") is None
+    assert cache.get("m", "analysis", "prompt") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_reloading_a_document_invalidates_only_its_answers(cache):
+    cache.put("m", "general", "p1", "from a", documents=["a"])
+    cache.put("m", "general", "p2", "from b", documents=["b"])
+
+    assert cache.invalidate_document("a") == 1
+    assert cache.get("m", "general", "p1") is None
+    assert cache.get("m", "general", "p2") == "from b"
+
+
+def test_expired_and_least_recently_used_entries_are_dropped(tmp_path, cache):
+    cache.put("m", "general", "p1", "one")
+    time.sleep(0.01)
+    cache.put("m", "general", "p2", "two")
+    time.sleep(0.01)
+    cache.get("m", "general", "p1")
+    cache.put("m", "general", "p3", "three")
+
+    assert len(cache) == 2
+    assert cache.get("m", "general", "p2") is None
+
+    expiring = ResponseCache(str(tmp_path / "expiring.sqlite"), ttl_seconds=0)
+    expiring.put("m", "general", "p", "stale")
+    time.sleep(0.01)
+    assert expiring.get("m", "general", "p") is None
+    assert expiring.stats()["expired"] == 1
+
+
+def test_repeated_prompt_is_answered_from_the_cache(executor):
+    first = executor.execute_llm_generation("What is a prime?", context="A prime has two divisors.")
+    second = executor.execute_llm_generation("What is a prime?", context="A prime has two divisors.")
+
+    assert second == first
+    assert executor.llm.calls == 1
+
+
+def test_a_failing_cache_still_returns_the_answer(executor):
+    executor.response_cache = LockedCache()
+
+    answer = executor.execute_llm_generation("What is a prime?", context="A prime has two divisors.")
+    streamed = ''.join(executor.execute_llm_generation_stream("What is a prime?", context="A prime has two divisors."))
+    asynced = asyncio.run(executor.execute_llm_generation_async("What is a prime?",
+                                                                context="A prime has two divisors."))
+
+    assert answer.startswith("[stub ")
+    assert streamed == answer
+    assert asynced == answer
+    assert executor.llm.calls == 3
@@ -0,0 +1,224 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from src.segment_store import SegmentStore
+
+
+@pytest.fixture
+def append_document(random_vectors):
+    """Append ``count`` chunks of ``doc_id`` as one segment and return their texts."""
+    def append(store: SegmentStore, doc_id: str, count: int, seed: int = 0):
+        texts = [f"{doc_id} chunk {i}" for i in range(count)]
+        store.append(random_vectors(count, seed=seed), texts, doc_id=doc_id)
+        return texts
+    return append
+
+
+def document_texts(store: SegmentStore, snapshot=None):
+    """Live texts per document id, in row order, read through the published snapshot."""
+    snapshot = snapshot or store.snapshot()
+    texts = {}
+    for segment in snapshot.open():
+        for doc_id, start, count in segment.docs:
+            texts.setdefault(doc_id, []).extend(segment.text(row) for row in range(start, start + count))
+    return texts
+
+
+def segment_files(store: SegmentStore):
+    return sorted(name for name in os.listdir(store.store_dir) if name.startswith("seg-"))
+
+
+def test_append_publishes_one_segment_per_call(tmp_path, append_document):
+    store = SegmentStore(str(tmp_path), max_segments=8)
+    a = append_document(store, "a", 3)
+    b = append_document(store, "b", 2, seed=1)
+
+    assert len(store) == 5
+    assert len(store.segments) == 2
+    assert document_texts(store) == {"a": a, "b": b}
+    assert SegmentStore(str(tmp_path)).document_ids() == ["a", "b"]
+
+
+def test_stage_publishes_every_append_in_one_swap(tmp_path, append_document):
+    store = SegmentStore(str(tmp_path), max_segments=8)
+    append_document(store, "intro", 2)
+    before = store.snapshot()
+
+    with store.stage() as stage:
+        first = append_document(store, "book", 4, seed=1)
+        second = append_document(store, "book", 3, seed=2)
+        # Readers keep the old snapshot; the writing thread sees its own staged rows.
+        assert store.snapshot() is before
+        assert len(store) == 2
+        assert store.document_size("book") == 7
+        assert len(stage.entries) == 2
+
+    assert len(store) == 9
+    assert document_texts(store)["book"] == first + second
+    assert document_texts(store, before) == {"intro": ["intro chunk 0", "intro chunk 1"]}
+
+
+def test_stage_rollback_publishes_nothing_and_deletes_staged_files(tmp_path, append_document):
+    store = SegmentStore(str(tmp_path), max_segments=8)
+    append_document(store, "intro", 2)
+    files = segment_files(store)
+    manifest = store.manifest
+
+    with pytest.raises(RuntimeError):
+        with store.stage():
+            append_document(store, "book", 4, seed=1)
+            raise RuntimeError("extraction failed")
+
+    assert store.manifest is manifest
+    assert segment_files(store) == files
+    assert SegmentStore(str(tmp_path)).document_ids() == ["intro"]
+    # The store stays writable after a failed stage.
+    with store.stage():
+        append_document(store, "book", 1)
+    assert store.document_ids() == ["intro", "book"]
+
+
+def test_stage_replaces_documents_in_the_same_swap(tmp_path, append_document, random_vectors):
+    store = SegmentStore(str(tmp_path), max_segments=8)
+    append_document(store, "book", 5)
+    append_document(store, "legacy-index", 2, seed=1)
+    old = store.snapshot()
+
+    with store.stage(replaces=["book", "legacy-index"]) as stage:
+        new = [f"new {text}" for text in append_document(store, "new-book", 3, seed=2)]
+        store.append(random_vectors(3, seed=3), new, doc_id="book")
+        assert store.document_size("book") == 3
+        assert len(document_texts(store, old)["book"]) == 5
+
+    assert stage.removed == 7
+    texts = document_texts(store)
+    assert texts["book"] == new
+    assert "legacy-index" not in texts
+    assert len(store) == 6
+
+
+def test_remove_document_marks_rows_deleted_then_merge_drops_them(tmp_path, append_document):
+    store = SegmentStore(str(tmp_path), max_segments=8, merge_factor=4)
+    a = append_document(store, "a", 4)
+    append_document(store, "b", 3, seed=1)
+    c = append_document(store, "c", 5, seed=2)
+    assert store.compact()
+    assert len(store.segments) == 1
+    merged = store.snapshot().open()[0]
+
+    assert store.remove_document("b") == 3
+    segment = store.snapshot().open()[0]
+    # Only the manifest changed: the rows are still in the segment but excluded from searches.
+    assert segment.name == merged.name
+    assert segment.deleted == [[4, 3]]
+    assert segment.allowed_ranges() == [(0, 4), (7, 12)]
+    _, rows = segment.search(np.asarray(segment.vectors[4:7]), 12, ranges=segment.allowed_ranges())
+    assert not set(rows.ravel().tolist()) & {4, 5, 6}
+    assert len(store) == 9
+
+    # A single mostly-live segment is merged on request; the merge rewrites it without the deleted rows.
+    append_document(store, "d", 1, seed=3)
+    assert store.compact()
+    (entry,) = store.segments
+    assert "deleted" not in entry or not entry["deleted"]
+    assert entry["docs"] == [["a", 0, 4], ["c", 4, 5], ["d", 9, 1]]
+    assert document_texts(store) == {"a": a, "c": c, "d": ["d chunk 0"]}
+    assert merged.name + ".npy" not in os.listdir(str(tmp_path))
+
+
+def test_remove_document_drops_segments_left_empty(tmp_path, append_document):
+    store = SegmentStore(str(tmp_path), max_segments=8)
+    append_document(store, "a", 2)
+    append_document(store, "b", 2, seed=1)
+    name = store.segments[1]["name"]
+
+    assert store.remove_document("b") == 2
+    assert store.remove_document("b") == 0
+    assert [entry["name"] for entry in store.segments] == [store.segments[0]["name"]]
+    assert not [f for f in os.listdir(str(tmp_path)) if f.startswith(name)]
+
+
+def test_mostly_deleted_segment_is_purged_in_the_background(tmp_path, append_document):
+    store = SegmentStore(str(tmp_path), max_segments=8, purge_fraction=0.5)
+    append_document(store, "a", 2)
+    append_document(store, "b", 6, seed=1)
+    store.compact()
+
+    store.remove_document("b")
+    store.wait_for_compaction()
+    (entry,) = store.segments
+    assert entry["count"] == 2 and not entry.get("deleted")
+    assert document_texts(store) == {"a": ["a chunk 0", "a chunk 1"]}
+
+
+def test_replace_run_gives_up_when_the_run_changed(tmp_path, append_document):
+    store = SegmentStore(str(tmp_path), max_segments=8)
+    append_document(store, "a", 2)
+    append_document(store, "b", 2, seed=1)
+    append_document(store, "c", 2, seed=2)
+    snapshot = store.snapshot()
+    assert store.compact()
+    files = segment_files(store)
+
+    assert not store._replace_run(snapshot, 0, 2)
+    # The merged segment written for the stale run is removed again; the first merge stands.
+    assert segment_files(store) == files
+    assert document_texts(store) == {doc: [f"{doc} chunk 0", f"{doc} chunk 1"] for doc in "abc"}
+
+
+def test_compaction_under_concurrent_appends_keeps_every_row(tmp_path, append_document):
+    store = SegmentStore(str(tmp_path), max_segments=3, merge_factor=2)
+    expected = {}
+    errors = []
+    readers_done = threading.Event()
+
+    def read():
+        # Every published snapshot must be readable and hold only whole appends.
+        while not readers_done.is_set():
+            try:
+                for doc_id, texts in document_texts(store).items():
+                    assert texts == [f"{doc_id} chunk {i}" for i in range(len(texts))]
+                    assert len(texts) == int(doc_id[3:]) % 5 + 1
+            except Exception as e:
+                errors.append(e)
+                return
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for i in range(40):
+            doc_id = f"doc{i}"
+            expected[doc_id] = append_document(store, doc_id, i % 5 + 1, seed=i)
+    finally:
+        readers_done.set()
+        reader.join()
+    store.wait_for_compaction()
+    store.compact()
+    store.wait_for_compaction()
+
+    assert not errors
+    assert document_texts(store) == expected
+    assert len(store) == sum(len(texts) for texts in expected.values())
+    assert len(store.segments) <= 3
+    # Merged-away segments leave no files behind.
+    live = {entry["name"] for entry in store.segments}
+    assert {name.split(".")[0] for name in segment_files(store)} == live
+
+
+def test_refresh_adopts_another_writers_manifest(tmp_path, append_document):
+    writer = SegmentStore(str(tmp_path), max_segments=8)
+    append_document(writer, "a", 2)
+    reader = SegmentStore(str(tmp_path), max_segments=8)
+    held = reader.snapshot()
+
+    append_document(writer, "b", 3, seed=1)
+    assert reader.document_ids() == ["a"]
+    assert reader.refresh()
+    assert not reader.refresh()
+    assert reader.document_ids() == ["a", "b"]
+    assert len(reader) == 5
+    # A snapshot taken before the refresh still reads the old state.
+    assert document_texts(reader, held) == {"a": ["a chunk 0", "a chunk 1"]}
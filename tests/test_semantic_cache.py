@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from src.config import Config
+from src.executor import TaskExecutor
+from src.semantic_cache import SemanticCache
+
+
+class FixedEncoder:
+    """Encodes each known question to a fixed vector, counting calls."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = 0
+
+    def __call__(self, questions):
+        self.calls += 1
+        return np.array([self.vectors[question] for question in questions], dtype=np.float32)
+
+
+@pytest.fixture
+def encoder():
+    return FixedEncoder({
+        "what is a prime": [1.0, 0.0, 0.0],
+        "what's a prime number": [0.96, 0.28, 0.0],  # cosine 0.96
+        "what is a composite": [0.6, 0.8, 0.0],      # cosine 0.6
+    })
+
+
+def test_paraphrase_above_the_threshold_reuses_the_answer(encoder):
+    cache = SemanticCache(encoder, threshold=0.92)
+    cache.store("what is a prime", "general", "two divisors")
+
+    assert cache.lookup("what's a prime number", "general") == "two divisors"
+    assert cache.lookup("what is a composite", "general") is None
+    assert cache.lookup("what's a prime number", "analysis") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_threshold_is_respected(encoder):
+    cache = SemanticCache(encoder, threshold=0.97)
+    cache.store("what is a prime", "general", "two divisors")
+
+    assert cache.lookup("what's a prime number", "general") is None
+
+
+def test_oldest_half_is_dropped_when_full(encoder):
+    cache = SemanticCache(encoder, threshold=0.99, max_entries=2)
+    cache.store("what is a prime", "general", "first")
+    cache.store("what is a composite", "general", "second")
+    cache.store("what's a prime number", "general", "third")
+
+    assert len(cache) == 2
+    assert cache.lookup("what is a prime", "general") is None
+    assert cache.lookup("what is a composite", "general") == "second"
+
+
+def test_empty_cache_does_not_embed_the_question(encoder):
+    cache = SemanticCache(encoder)
+
+    assert cache.lookup("what is a prime", "general") is None
+    assert encoder.calls == 0
+
+
+def test_semantic_cache_is_off_by_default():
+    assert not Config.SEMANTIC_CACHE_ENABLED
+
+
+def test_semantic_cache_is_cleared_when_a_document_changes(encoder):
+    executor = TaskExecutor()
+    executor.semantic_cache = SemanticCache(encoder)
+    executor.semantic_cache.store("what is a prime", "general", "two divisors")
+
+    executor._on_document_changed("book")
+
+    assert len(executor.semantic_cache) == 0
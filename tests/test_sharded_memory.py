@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from src.sharded_memory import ShardedMemory
+
+SUBJECTS = ["algebra", "biology", "chemistry", "geometry", "history", "physics"]
+
+
+@pytest.fixture
+def library(memory, tmp_path):
+    """Six one-document collections and an emptied one, written through a separate view."""
+    writer = ShardedMemory(memory, root_dir=str(tmp_path / "collections"), max_open=len(SUBJECTS) + 1)
+    for name in SUBJECTS:
+        writer.get(name).add_chunks([f"{name} lesson one", f"{name} lesson two"], doc_id=f"{name}.pdf")
+    writer.get("empty").add_chunks(["gone"], doc_id="gone.pdf")
+    writer.get("empty").remove_document("gone.pdf")
+    for name in writer.open_collections():
+        writer.get(name).store.wait_for_compaction()
+    return str(tmp_path / "collections")
+
+
+def counting(shards: ShardedMemory):
+    """Record the name of every collection ``shards`` opens."""
+    opened = []
+    new_memory = shards._new_memory
+    shards._new_memory = lambda name: (opened.append(name), new_memory(name))[1]
+    return opened
+
+
+def test_unscoped_searches_keep_at_most_max_open_collections_open(memory, library):
+    shards = ShardedMemory(memory, root_dir=library, max_open=2, idle_seconds=0, workers=3)
+    opened = counting(shards)
+    shards.search_hits_batch(["physics lesson one"], k=1, collections=["physics"])
+
+    for _ in range(3):
+        hits = shards.search_hits_batch(["lesson one"], k=len(SUBJECTS) * 2)[0]
+        assert {hit.text.split()[0] for hit in hits} == set(SUBJECTS)
+        assert len(shards.open_collections()) <= 2
+
+    # The shard named by a scoped search is still open; the free slot went to the first unscoped one.
+    assert shards.open_collections() == ["algebra", "physics"]
+    assert "empty" not in opened
+
+
+def test_idle_collections_are_closed_by_the_next_search(memory, library):
+    shards = ShardedMemory(memory, root_dir=library, max_open=2, idle_seconds=0.05)
+    shards.search_hits_batch(["biology"], k=1, collections=["biology"])
+    shards.search_hits_batch(["chemistry"], k=1, collections=["chemistry"])
+    assert shards.open_collections() == ["biology", "chemistry"]
+
+    time.sleep(0.1)
+    shards.search_hits_batch(["lesson"], k=1)
+
+    # Both went idle and were closed; the unscoped search filled the slots in collection order.
+    assert sorted(shards.open_collections()) == ["algebra", "biology"]
@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.tracing import (PrometheusExporter, RingBufferExporter, Tracer, build_exporters, copy_context_call,
+                         estimate_tokens)
+
+
+class BrokenExporter:
+    def export(self, root):
+        raise RuntimeError("collector unreachable")
+
+
+@pytest.fixture
+def ring():
+    return RingBufferExporter(size=2)
+
+
+@pytest.fixture
+def tracer(ring):
+    return Tracer(enabled=True, exporters=[BrokenExporter(), ring, PrometheusExporter()])
+
+
+def test_nested_spans_form_one_trace_with_stage_and_token_totals(tracer, ring):
+    with tracer.span("ask", question="q") as root:
+        with tracer.span("retrieve", k=3):
+            with tracer.span("encode_query"):
+                pass
+        with tracer.span("generate") as generation:
+            generation.set(prompt_tokens=120, response_tokens=30)
+        with tracer.span("generate", response_tokens=5):
+            pass
+        timings = root.timings()
+
+    (trace,) = ring.traces()
+    assert trace["name"] == "ask" and trace["attributes"] == {"question": "q"}
+    assert [child["name"] for child in trace["children"]] == ["retrieve", "generate", "generate"]
+    assert trace["children"][0]["children"][0]["name"] == "encode_query"
+    assert set(timings["stages"]) == {"retrieve", "encode_query", "generate"}
+    assert timings["prompt_tokens"] == 120 and timings["response_tokens"] == 35
+
+
+def test_spans_opened_on_pool_threads_join_the_callers_trace(tracer, ring):
+    def search():
+        with tracer.span("lexical_search"):
+            pass
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with tracer.span("ask"):
+            pool.submit(copy_context_call(search)).result()
+            tracer.record("stream", 0.25, response_tokens=7)
+        with tracer.span("unrelated"):
+            pass
+
+    ask, unrelated = ring.traces()
+    assert [child["name"] for child in ask["children"]] == ["lexical_search", "stream"]
+    assert ask["children"][1]["seconds"] == pytest.approx(0.25)
+    assert unrelated["children"] == []
+
+
+def test_disabled_tracer_records_nothing(ring):
+    tracer = Tracer(enabled=False, exporters=[ring])
+    with tracer.span("ask") as root:
+        root.set(prompt_tokens=10)
+        tracer.record("stream", 1.0)
+
+    assert root.timings() is None
+    assert ring.traces() == []
+
+
+def test_prometheus_exporter_renders_histograms_and_token_counters(tracer):
+    for _ in range(3):
+        with tracer.span("ask"):
+            with tracer.span("generate", prompt_tokens=10):
+                pass
+
+    text = tracer.exporter(PrometheusExporter).render()
+    assert 'rag_span_seconds_count{trace="ask",span="generate"} 3' in text
+    assert 'rag_span_seconds_bucket{trace="ask",span="ask",le="+Inf"} 3' in text
+    assert 'rag_tokens_total{trace="ask",kind="prompt"} 30' in text
+
+
+def test_exporters_are_built_from_their_names():
+    kinds = [type(exporter).__name__ for exporter in build_exporters("log, ring,prometheus")]
+
+    assert kinds == ["LogExporter", "RingBufferExporter", "PrometheusExporter"]
+    assert build_exporters("") == []
+    with pytest.raises(ValueError):
+        build_exporters("jaeger")
+    assert estimate_tokens("") == 0 and estimate_tokens("four") == 1